@@ -18,6 +18,23 @@
 
 #include "ff.h"
 
+// Number of work contexts the host can queue, and the size of each context's buffer.
+// Published in the comm header so the host can adapt; the defaults match the
+// original fixed 2x 256KB layout.
+#ifndef GNWMANAGER_N_CONTEXTS
+#define GNWMANAGER_N_CONTEXTS 2
+#endif
+
+#ifndef GNWMANAGER_CONTEXT_BUFFER_SIZE
+#define GNWMANAGER_CONTEXT_BUFFER_SIZE ((512u << 10) / GNWMANAGER_N_CONTEXTS)
+#endif
+
+// Size of the .gnwmanager_comm region the host maps (``_comm["flashapp_comm"]``).
+#define GNWMANAGER_COMM_SIZE 0xC4000
+
+_Static_assert(GNWMANAGER_N_CONTEXTS >= 1, "At least one work context is required.");
+_Static_assert(GNWMANAGER_N_CONTEXTS <= UINT8_MAX, "Contexts are indexed with uint8_t.");
+_Static_assert(GNWMANAGER_CONTEXT_BUFFER_SIZE % 4 == 0, "Context buffers must be word-aligned.");
 
 typedef enum {  // For the gnwmanager state machine
     GNWMANAGER_IDLE                   ,
@@ -44,6 +61,17 @@ enum gnwmanager_action {
     GNWMANAGER_ACTION_LIST_SD_DIR = 3,
     GNWMANAGER_ACTION_DELETE_FILE_FROM_SD = 4,
     GNWMANAGER_ACTION_READ_FILE_FROM_SD = 5,
+    // 6 is unused; directories are created with GNWMANAGER_ACTION_BATCH_SD.
+    GNWMANAGER_ACTION_HASH_SD_FILE = 7,
+    GNWMANAGER_ACTION_SCAN_SD_DIR = 8,
+    GNWMANAGER_ACTION_BATCH_SD = 9,
+};
+
+enum gnwmanager_sd_batch_op {
+    GNWMANAGER_SD_BATCH_UNLINK = 0,
+    GNWMANAGER_SD_BATCH_MKDIR = 1,
+    GNWMANAGER_SD_BATCH_STAT = 2,
+    GNWMANAGER_SD_BATCH_RENAME = 3,
 };
 
 
@@ -144,6 +172,15 @@ struct gnwmanager_comm {  // Values are read or written by the debugger
             uint32_t failed_context_idx;  // output: which comm.buffer[i] needs re-transmit
             uint32_t retry_request;       // input: host increments to request a retry
             uint32_t retry_ack;           // output: device echoes after consuming retry_request
+
+            uint32_t context_count;        // output: number of entries in contexts/buffer
+            uint32_t context_buffer_size;  // output: size of each buffer in bytes
+
+            // The device carries on with queued commands after an error, clearing
+            // the BAD_* status, so the first failure is also recorded here until
+            // the host zeroes failed_context_counter.
+            uint32_t failed_context_counter;  // output: ``ready`` value of the failed command
+            uint32_t failed_status;           // output: status it failed with
         };
         struct {
             // Force spacing, allowing for backward-compatible additional variables
@@ -151,15 +188,18 @@ struct gnwmanager_comm {  // Values are read or written by the debugger
         };
     };
 
-    volatile work_context_t contexts[2];
+    volatile work_context_t contexts[GNWMANAGER_N_CONTEXTS];
 
     work_context_t active_context;  // Working copy of context we are working on.
 
-    volatile unsigned char buffer[2][256 << 10];
+    volatile unsigned char buffer[GNWMANAGER_N_CONTEXTS][GNWMANAGER_CONTEXT_BUFFER_SIZE];
 
-    unsigned char decompress_buffer[256 << 10];
+    unsigned char decompress_buffer[GNWMANAGER_CONTEXT_BUFFER_SIZE];
 };
 
+_Static_assert(sizeof(struct gnwmanager_comm) <= GNWMANAGER_COMM_SIZE,
+               "Contexts and buffers do not fit in the comm region; lower GNWMANAGER_CONTEXT_BUFFER_SIZE.");
+
 static struct gnwmanager_comm comm __attribute__((section (".gnwmanager_comm")));
 
 static FATFS FatFs;  // Fatfs handle
@@ -254,7 +294,7 @@ static uint32_t context_counter = 1;
 
 
 static work_context_t *get_context(){
-    for(uint8_t i=0; i < 2; i++){
+    for(uint8_t i=0; i < GNWMANAGER_N_CONTEXTS; i++){
         if(comm.contexts[i].ready == context_counter){
             comm.contexts[i].buffer = comm.buffer[i];
             return &comm.contexts[i];
@@ -267,10 +307,18 @@ static void release_context(work_context_t *context){
     memset((void *)context, 0, sizeof(work_context_t));
 }
 
+static bool any_context_ready(void){
+    for(uint8_t i=0; i < GNWMANAGER_N_CONTEXTS; i++){
+        if(comm.contexts[i].ready){
+            return true;
+        }
+    }
+    return false;
+}
+
 bool gnwmanager_is_idle(void){
     return comm.status == GNWMANAGER_STATUS_IDLE
-        && comm.contexts[0].ready == 0
-        && comm.contexts[1].ready == 0
+        && !any_context_ready()
         && !comm.upload_in_progress
         && !comm.download_in_progress;
 }
@@ -285,11 +333,13 @@ void gnwmanager_set_status(gnwmanager_status_t status){
 }
 
 /**
- * Compute sha256 hashes of 256KB chunks.
+ * Compute sha256 hashes of chunks of external flash.
+ *
+ * ``context->block`` holds the chunk size; 0 defaults to 256KB.
  */
 static void gnwmanager_action_hash(work_context_t *context){
     OSPI_EnableMemoryMappedMode();
-    const uint32_t chunk_size = 256 << 10;
+    const uint32_t chunk_size = context->block ? context->block : (256 << 10);
     uint8_t *response_buffer = (uint8_t *) context->buffer;
     uint32_t offset_end = context->offset + context->size;
     for(uint32_t offset=context->offset; offset < offset_end; offset += chunk_size){
@@ -309,7 +359,7 @@ static void gnwmanager_action_list_sd_dir(work_context_t *context){
     DIR dir;
     FILINFO fno;
     uint8_t *out = (uint8_t *)context->buffer;
-    const uint32_t cap = 256u << 10;
+    const uint32_t cap = GNWMANAGER_CONTEXT_BUFFER_SIZE;
     uint32_t used = 0;
 
     if (sdcard_hw == GNWMANAGER_SDCARD_HW_UNDETECTED) {
@@ -393,6 +443,293 @@ static void gnwmanager_action_delete_sd_file(work_context_t *context){
     context->response_ready = 1;
 }
 
+/**
+ * Binary, resumable directory listing.
+ *
+ * Skips the first ``context->offset`` entries, then packs as many entries as
+ * fit in the context buffer. Each entry is a little-endian header followed by
+ * the UTF-8 name (not NUL-terminated):
+ *
+ *     uint64_t size; uint16_t fdate; uint16_t ftime; uint8_t fattrib; uint8_t reserved; uint16_t name_len;
+ *
+ * On return ``context->size`` holds the number of bytes used and
+ * ``context->offset`` the cursor to resume from, or 0 once the directory is exhausted.
+ */
+#define SCAN_SD_DIR_HEADER_SIZE 16
+static void gnwmanager_action_scan_sd_dir(work_context_t *context){
+    FRESULT res;
+    DIR dir;
+    FILINFO fno;
+    uint8_t *out = (uint8_t *)context->buffer;
+    const uint32_t cap = GNWMANAGER_CONTEXT_BUFFER_SIZE;
+    const uint32_t start = context->offset;
+    uint32_t index = 0;
+    uint32_t used = 0;
+
+    context->offset = 0;
+
+    if (sdcard_hw == GNWMANAGER_SDCARD_HW_UNDETECTED) {
+        sdcard_hw_detect();
+    }
+    if (sdcard_hw < GNWMANAGER_SDCARD_HW_1) {
+        gnwmanager_set_status(GNWMANAGER_STATUS_BAD_SD_FS_MOUNT);
+        context->size = 0;
+        context->response_ready = 1;
+        return;
+    }
+
+    f_mount(&FatFs, (const TCHAR *)"", 1);
+    res = f_opendir(&dir, (const TCHAR *)context->file_path);
+    if (res != FR_OK) {
+        gnwmanager_set_status(GNWMANAGER_STATUS_BAD_SD_DIR);
+        f_mount(NULL, "", 0);
+        context->size = 0;
+        context->response_ready = 1;
+        return;
+    }
+
+    for (;;) {
+        res = f_readdir(&dir, &fno);
+        if (res != FR_OK || fno.fname[0] == 0) {
+            break;
+        }
+        const char *name = fno.fname;
+        if (name[0] == '.' && name[1] == 0) {
+            continue;
+        }
+        if (name[0] == '.' && name[1] == '.' && name[2] == 0) {
+            continue;
+        }
+        if (index++ < start) {
+            continue;
+        }
+        const uint32_t name_len = (uint32_t)strlen(name);
+        if (SCAN_SD_DIR_HEADER_SIZE + name_len > cap - used) {
+            // Buffer full; the host resumes from this entry.
+            context->offset = index - 1;
+            break;
+        }
+        const uint64_t fsize = (uint64_t)fno.fsize;
+        uint8_t *header = out + used;
+        memcpy(header, &fsize, 8);
+        memcpy(header + 8, &fno.fdate, 2);
+        memcpy(header + 10, &fno.ftime, 2);
+        header[12] = fno.fattrib;
+        header[13] = 0;
+        header[14] = (uint8_t)(name_len & 0xFF);
+        header[15] = (uint8_t)(name_len >> 8);
+        memcpy(header + SCAN_SD_DIR_HEADER_SIZE, name, name_len);
+        used += SCAN_SD_DIR_HEADER_SIZE + name_len;
+    }
+
+    f_closedir(&dir);
+    f_mount(NULL, "", 0);
+    if (res != FR_OK) {
+        gnwmanager_set_status(GNWMANAGER_STATUS_BAD_SD_DIR);
+        context->offset = 0;
+    } else {
+        gnwmanager_set_status(GNWMANAGER_STATUS_IDLE);
+    }
+    context->size = used;
+    context->response_ready = 1;
+}
+
+/**
+ * Run ``context->block`` filesystem operations packed by the host into the buffer.
+ *
+ * Requests occupy the first ``context->size`` bytes; each is a 6-byte header
+ * followed by its (not NUL-terminated) paths:
+ *
+ *     uint8_t op; uint8_t reserved; uint16_t path_len; uint16_t dest_len;
+ *
+ * ``dest_len`` is only non-zero for RENAME. One 20-byte result per request is
+ * written starting at ``context->offset`` (chosen by the host past the requests):
+ *
+ *     uint32_t fresult; uint64_t size; uint16_t fdate; uint16_t ftime; uint8_t fattrib; uint8_t reserved[3];
+ *
+ * Failures are reported per operation; the action itself only fails if the
+ * card can't be mounted or the request is malformed.
+ */
+#define SD_BATCH_REQUEST_HEADER_SIZE 6
+#define SD_BATCH_RESULT_SIZE 20
+static void gnwmanager_action_batch_sd(work_context_t *context){
+    static char path[256];
+    static char dest[256];
+    uint8_t *buffer = (uint8_t *)context->buffer;
+    const uint32_t request_size = context->size;
+    const uint32_t n_ops = context->block;
+    uint8_t *results = buffer + context->offset;
+    uint32_t pos = 0;
+    FILINFO fno;
+
+    if (context->offset < request_size
+            || context->offset > GNWMANAGER_CONTEXT_BUFFER_SIZE
+            || n_ops > (GNWMANAGER_CONTEXT_BUFFER_SIZE - context->offset) / SD_BATCH_RESULT_SIZE) {
+        gnwmanager_set_status(GNWMANAGER_STATUS_BAD_SD_BATCH);
+        context->response_ready = 1;
+        return;
+    }
+
+    if (sdcard_hw == GNWMANAGER_SDCARD_HW_UNDETECTED) {
+        sdcard_hw_detect();
+    }
+    if (sdcard_hw < GNWMANAGER_SDCARD_HW_1) {
+        gnwmanager_set_status(GNWMANAGER_STATUS_BAD_SD_FS_MOUNT);
+        context->response_ready = 1;
+        return;
+    }
+
+    f_mount(&FatFs, (const TCHAR *)"", 1);
+    for (uint32_t i = 0; i < n_ops; i++) {
+        wdog_refresh();
+        if (request_size - pos < SD_BATCH_REQUEST_HEADER_SIZE) {
+            break;
+        }
+        const uint8_t op = buffer[pos];
+        const uint32_t path_len = buffer[pos + 2] | (buffer[pos + 3] << 8);
+        const uint32_t dest_len = buffer[pos + 4] | (buffer[pos + 5] << 8);
+        pos += SD_BATCH_REQUEST_HEADER_SIZE;
+        if (path_len >= sizeof(path) || dest_len >= sizeof(dest)
+                || path_len + dest_len > request_size - pos) {
+            break;
+        }
+        memcpy(path, buffer + pos, path_len);
+        path[path_len] = 0;
+        pos += path_len;
+        memcpy(dest, buffer + pos, dest_len);
+        dest[dest_len] = 0;
+        pos += dest_len;
+
+        uint8_t *result = results + i * SD_BATCH_RESULT_SIZE;
+        uint32_t res;
+        memset(result, 0, SD_BATCH_RESULT_SIZE);
+        switch (op) {
+            case GNWMANAGER_SD_BATCH_UNLINK:
+                res = f_unlink((const TCHAR *)path);
+                break;
+            case GNWMANAGER_SD_BATCH_MKDIR:
+                res = f_mkdir((const TCHAR *)path);
+                break;
+            case GNWMANAGER_SD_BATCH_STAT:
+                res = f_stat((const TCHAR *)path, &fno);
+                if (res == FR_OK) {
+                    const uint64_t fsize = (uint64_t)fno.fsize;
+                    memcpy(result + 4, &fsize, 8);
+                    memcpy(result + 12, &fno.fdate, 2);
+                    memcpy(result + 14, &fno.ftime, 2);
+                    result[16] = fno.fattrib;
+                }
+                break;
+            case GNWMANAGER_SD_BATCH_RENAME:
+                res = f_rename((const TCHAR *)path, (const TCHAR *)dest);
+                break;
+            default:
+                res = FR_INVALID_PARAMETER;
+                break;
+        }
+        memcpy(result, &res, 4);
+    }
+    f_mount(NULL, "", 0);
+
+    if (pos != request_size) {
+        gnwmanager_set_status(GNWMANAGER_STATUS_BAD_SD_BATCH);
+    } else {
+        gnwmanager_set_status(GNWMANAGER_STATUS_IDLE);
+    }
+    context->response_ready = 1;
+}
+
+/**
+ * SHA256 ``context->size`` bytes (0 for "until EOF") of an SD file starting at ``context->offset``.
+ *
+ * The file is streamed through the context buffer; the digest is returned in
+ * the first 32 bytes of it and the number of hashed bytes in ``context->size``.
+ */
+static void gnwmanager_action_hash_sd_file(work_context_t *context){
+    static const uint8_t empty_sha256[32] = {
+        0xe3, 0xb0, 0xc4, 0x42, 0x98, 0xfc, 0x1c, 0x14, 0x9a, 0xfb, 0xf4, 0xc8, 0x99, 0x6f, 0xb9, 0x24,
+        0x27, 0xae, 0x41, 0xe4, 0x64, 0x9b, 0x93, 0x4c, 0xa4, 0x95, 0x99, 0x1b, 0x78, 0x52, 0xb8, 0x55,
+    };
+    uint8_t *buffer = (uint8_t *)context->buffer;
+    FRESULT res;
+    UINT br;
+
+    if (sdcard_hw == GNWMANAGER_SDCARD_HW_UNDETECTED) {
+        sdcard_hw_detect();
+    }
+    if (sdcard_hw < GNWMANAGER_SDCARD_HW_1) {
+        gnwmanager_set_status(GNWMANAGER_STATUS_BAD_SD_FS_MOUNT);
+        context->size = 0;
+        context->response_ready = 1;
+        return;
+    }
+
+    f_mount(&FatFs, (const TCHAR *)"", 1);
+    res = f_open(&file, (const TCHAR *)context->file_path, FA_READ);
+    if (res != FR_OK) {
+        gnwmanager_set_status(GNWMANAGER_STATUS_BAD_SD_OPEN);
+        f_mount(NULL, "", 0);
+        context->size = 0;
+        context->response_ready = 1;
+        return;
+    }
+
+    FSIZE_t fsz = f_size(&file);
+    if ((FSIZE_t)context->offset > fsz
+            || (context->offset && (f_lseek(&file, (FSIZE_t)context->offset) != FR_OK))) {
+        gnwmanager_set_status(GNWMANAGER_STATUS_BAD_SD_READ);
+        f_close(&file);
+        f_mount(NULL, "", 0);
+        context->size = 0;
+        context->response_ready = 1;
+        return;
+    }
+
+    FSIZE_t available = fsz - (FSIZE_t)context->offset;
+    uint32_t remaining = (context->size == 0 || (FSIZE_t)context->size > available)
+                       ? (uint32_t)available : context->size;
+    const uint32_t total = remaining;
+
+    if (remaining == 0) {
+        memcpy(buffer, empty_sha256, 32);
+    }
+    while (remaining) {
+        wdog_refresh();
+        gnwmanager_gui_draw();
+        uint32_t want = remaining < GNWMANAGER_CONTEXT_BUFFER_SIZE ? remaining : GNWMANAGER_CONTEXT_BUFFER_SIZE;
+        res = f_read(&file, buffer, want, &br);
+        if (res != FR_OK || br != want) {
+            if (remaining != total) {
+                // Finish the accumulation so the HASH peripheral is ready for the next user.
+                HAL_HASHEx_SHA256_Accmlt_End(&hhash, buffer, 0, buffer, HAL_MAX_DELAY);
+            }
+            gnwmanager_set_status(GNWMANAGER_STATUS_BAD_SD_READ);
+            f_close(&file);
+            f_mount(NULL, "", 0);
+            context->size = 0;
+            context->response_ready = 1;
+            return;
+        }
+        remaining -= want;
+        // All but the last block are a multiple of 4 bytes, as required by Accmlt.
+        if (remaining) {
+            if (HAL_HASHEx_SHA256_Accmlt(&hhash, buffer, want)) {
+                Error_Handler();
+            }
+        } else {
+            if (HAL_HASHEx_SHA256_Accmlt_End(&hhash, buffer, want, buffer, HAL_MAX_DELAY)) {
+                Error_Handler();
+            }
+        }
+    }
+
+    f_close(&file);
+    f_mount(NULL, "", 0);
+    gnwmanager_set_status(GNWMANAGER_STATUS_IDLE);
+    context->size = total;
+    context->response_ready = 1;
+}
+
 static void gnwmanager_action_read_sd_file(work_context_t *context){
     FRESULT res;
     UINT br = 0;
@@ -438,8 +775,8 @@ static void gnwmanager_action_read_sd_file(work_context_t *context){
     }
 
     want = context->size;
-    if (want > (256u << 10)) {
-        want = 256u << 10;
+    if (want > GNWMANAGER_CONTEXT_BUFFER_SIZE) {
+        want = GNWMANAGER_CONTEXT_BUFFER_SIZE;
     }
 
     if (context->offset) {
@@ -514,9 +851,8 @@ static void gnwmanager_run(void)
              * context (e.g. LIST_SD_DIR / DELETE_FILE_FROM_SD / HASH returned early);
              * otherwise the next loop would set IDLE before the host reads the error. */
             uint32_t st = comm.status;
-            uint8_t any_ready = (comm.contexts[0].ready != 0) || (comm.contexts[1].ready != 0);
             if ((st & 0xffff0000u) == 0xbad00000u) {
-                if (!any_ready) {
+                if (!any_context_ready()) {
                     gnwmanager_set_status(GNWMANAGER_STATUS_IDLE);
                 }
             } else {
@@ -543,6 +879,14 @@ static void gnwmanager_run(void)
                 gnwmanager_set_status(GNWMANAGER_STATUS_PROG);
                 gnwmanager_action_list_sd_dir(source_context);
                 return;
+            case GNWMANAGER_ACTION_SCAN_SD_DIR:
+                gnwmanager_set_status(GNWMANAGER_STATUS_PROG);
+                gnwmanager_action_scan_sd_dir(source_context);
+                return;
+            case GNWMANAGER_ACTION_BATCH_SD:
+                gnwmanager_set_status(GNWMANAGER_STATUS_PROG);
+                gnwmanager_action_batch_sd(source_context);
+                return;
             case GNWMANAGER_ACTION_DELETE_FILE_FROM_SD:
                 gnwmanager_set_status(GNWMANAGER_STATUS_PROG);
                 gnwmanager_action_delete_sd_file(source_context);
@@ -551,6 +895,10 @@ static void gnwmanager_run(void)
                 gnwmanager_set_status(GNWMANAGER_STATUS_PROG);
                 gnwmanager_action_read_sd_file(source_context);
                 return;
+            case GNWMANAGER_ACTION_HASH_SD_FILE:
+                gnwmanager_set_status(GNWMANAGER_STATUS_HASH);
+                gnwmanager_action_hash_sd_file(source_context);
+                return;
             case GNWMANAGER_ACTION_WRITE_FILE_TO_SD:
                 state = GNWMANAGER_IDLE_SD;
                 if (sdcard_hw == GNWMANAGER_SDCARD_HW_UNDETECTED) {
@@ -842,8 +1190,13 @@ static void gnwmanager_run(void)
         }
         break;
     case GNWMANAGER_ERROR:
+        /* context_counter was incremented when the failed command was fetched. */
+        if (!comm.failed_context_counter) {
+            comm.failed_context_counter = context_counter - 1;
+            comm.failed_status = comm.status;
+        }
         /* Allow a new host command after release_context() cleared ready bits. */
-        if (comm.contexts[0].ready || comm.contexts[1].ready) {
+        if (any_context_ready()) {
             state = GNWMANAGER_IDLE;
         }
         break;
@@ -856,6 +1209,8 @@ void gnwmanager_main(gnwmanager_status_t status)
     uint8_t reset_was_pressed = ((buttons_get() & (B_POWER | B_B)) != 0);
 
     memset((void *)&comm, 0, sizeof(comm));
+    comm.context_count = GNWMANAGER_N_CONTEXTS;
+    comm.context_buffer_size = GNWMANAGER_CONTEXT_BUFFER_SIZE;
     comm.status = status;
 
     gui.status = &comm.status;
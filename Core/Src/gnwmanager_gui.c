@@ -178,6 +178,8 @@ void gnwmanager_gui_draw(){
             || (*gui.status == GNWMANAGER_STATUS_BAD_SD_DIR)
             || (*gui.status == GNWMANAGER_STATUS_BAD_SD_LIST_TRUNC)
             || (*gui.status == GNWMANAGER_STATUS_BAD_SD_READ)
+            || (*gui.status == GNWMANAGER_STATUS_BAD_SD_MKDIR)
+            || (*gui.status == GNWMANAGER_STATUS_BAD_SD_BATCH)
     );
 
     const glyph_t* run[] = {
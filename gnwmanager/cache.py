@@ -0,0 +1,105 @@
+from collections import OrderedDict
+from typing import Optional
+
+DEFAULT_BLOCK_CACHE_SIZE = 8 << 20
+
+
+class BlockCache:
+    """LRU cache of external flash blocks, bounded by a byte budget.
+
+    Entries are keyed by their offset into external flash, so every filesystem
+    on a device shares one coherent cache. Writes and erases issued through
+    ``GnW`` are applied to (or invalidate) overlapping entries.
+
+    Parameters
+    ----------
+    max_bytes: int
+        Total size of cached blocks to keep. ``0`` disables caching.
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_BLOCK_CACHE_SIZE):
+        if max_bytes < 0:
+            raise ValueError("max_bytes must be >= 0.")
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._blocks: OrderedDict[int, bytearray] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._blocks)
+
+    def __contains__(self, offset: int) -> bool:
+        return offset in self._blocks
+
+    def get(self, offset: int) -> Optional[bytearray]:
+        """Return the cached block starting at ``offset``, marking it most-recently used."""
+        try:
+            block = self._blocks[offset]
+        except KeyError:
+            self.misses += 1
+            return None
+        self._blocks.move_to_end(offset)
+        self.hits += 1
+        return block
+
+    def put(self, offset: int, data) -> None:
+        """Cache ``data`` as the block starting at ``offset``, evicting LRU blocks to stay in budget."""
+        self.discard(offset)
+        if len(data) > self.max_bytes:
+            return
+        self._blocks[offset] = bytearray(data)
+        self.nbytes += len(data)
+        while self.nbytes > self.max_bytes:
+            _, evicted = self._blocks.popitem(last=False)
+            self.nbytes -= len(evicted)
+            self.evictions += 1
+
+    def discard(self, offset: int) -> None:
+        block = self._blocks.pop(offset, None)
+        if block is not None:
+            self.nbytes -= len(block)
+
+    def clear(self) -> None:
+        self._blocks.clear()
+        self.nbytes = 0
+
+    def _overlapping(self, offset: int, size: int) -> list[int]:
+        end = offset + size
+        return [start for start, block in self._blocks.items() if start < end and offset < start + len(block)]
+
+    def program(self, offset: int, data: bytes) -> None:
+        """Apply a flash program (without erase) of ``data`` at ``offset`` to cached blocks.
+
+        NOR programming can only clear bits, so cached bytes are ANDed with ``data``.
+        """
+        end = offset + len(data)
+        for start in self._overlapping(offset, len(data)):
+            block = self._blocks[start]
+            lo, hi = max(start, offset), min(start + len(block), end)
+            old = int.from_bytes(block[lo - start : hi - start], "little")
+            new = int.from_bytes(data[lo - offset : hi - offset], "little")
+            block[lo - start : hi - start] = (old & new).to_bytes(hi - lo, "little")
+
+    def erase(self, offset: int, size: int) -> None:
+        """Apply a flash erase to cached blocks.
+
+        Fully erased blocks become 0xFF; partially covered ones are dropped since
+        the device rounds erases up to whole sectors.
+        """
+        end = offset + size
+        for start in self._overlapping(offset, size):
+            block = self._blocks[start]
+            if offset <= start and start + len(block) <= end:
+                block[:] = b"\xff" * len(block)
+            else:
+                self.discard(start)
+
+    def summary(self) -> str:
+        lookups = self.hits + self.misses
+        hit_rate = self.hits / lookups if lookups else 0.0
+        return (
+            f"Block cache: {self.hits}/{lookups} hits ({hit_rate:.0%}), {self.evictions} evictions, "
+            f"{self.nbytes >> 10}/{self.max_bytes >> 10} KiB used."
+        )
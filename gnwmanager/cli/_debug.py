@@ -3,14 +3,15 @@ import signal
 import subprocess
 import sys
 from pathlib import Path
-from time import time
+from time import sleep, time
 from typing import Optional
 
 from cyclopts import App
 from littlefs import LittleFSError
 
-from gnwmanager.cli._parsers import GnWType, OffsetType
+from gnwmanager.cli._parsers import GnWType, JobsType, OffsetType
 from gnwmanager.cli.main import app
+from gnwmanager.pipeline import CompressionStats, prepare_chunks, resolve_jobs
 
 app.command(debug := App(name="debug", group="Developer", help="GnWManager internal debugging tools."))
 
@@ -65,6 +66,104 @@ def hash(
     print(f"Hashed {len(device_hashes)} 256KB chunks in {t_delta:.3f}s ({kbs:.1f} KB/s).")
 
 
+@debug.command
+def transfer(
+    size: int = 256 << 10,
+    repeat: int = 5,
+    *,
+    gnw: GnWType,
+):
+    """Evaluates host<->device memory transfer performance.
+
+    For backends with multiple transfer modes (e.g. OpenOCD's ``file`` and ``tcl``),
+    every mode is benchmarked.
+
+    Parameters
+    ----------
+    size: int
+        Number of bytes per transfer. Must fit into a context buffer.
+    repeat: int
+        Number of transfers per direction.
+    """
+    gnw.start_gnwmanager()
+
+    buffer = gnw.contexts[0]["buffer"]
+    if size > buffer.size:
+        raise ValueError(f"size must be <= {buffer.size}.")
+    data = os.urandom(size)
+
+    backend = gnw.backend
+    original_mode = getattr(backend, "transfer_mode", None)
+    modes = ("file", "tcl") if original_mode is not None else (None,)
+
+    try:
+        for mode in modes:
+            if mode is not None:
+                try:
+                    backend.transfer_mode = mode  # pyright: ignore[reportAttributeAccessIssue]
+                except ValueError as e:
+                    print(f"{mode:>7}: unavailable ({e})")
+                    continue
+
+            t_start = time()
+            for _ in range(repeat):
+                backend.write_memory(buffer.address, data)
+            t_write = time() - t_start
+
+            t_start = time()
+            for _ in range(repeat):
+                readback = backend.read_memory(buffer.address, size)
+            t_read = time() - t_start
+
+            assert readback == data
+
+            total_kb = size * repeat / 1024
+            label = mode or "default"
+            print(
+                f"{label:>7}: write {total_kb / t_write:8.1f} KB/s ({t_write / repeat * 1000:.1f}ms/transfer), "
+                f"read {total_kb / t_read:8.1f} KB/s ({t_read / repeat * 1000:.1f}ms/transfer)"
+            )
+    finally:
+        if original_mode is not None:
+            backend.transfer_mode = original_mode  # pyright: ignore[reportAttributeAccessIssue]
+
+
+@debug.command
+def compression(
+    file: Optional[Path] = None,
+    io_delay: float = 0.05,
+    jobs: JobsType = 0,
+):
+    """Evaluates overlap of host-side chunk compression with (simulated) probe I/O.
+
+    Compares preparing chunks inline against preparing them in a process pool
+    while the main thread is busy with a per-chunk transfer delay.
+
+    Parameters
+    ----------
+    file: Optional[Path]
+        Data to compress. Defaults to 4MB of partially-compressible random data.
+    io_delay: float
+        Seconds of simulated probe transfer per 256KB chunk.
+    jobs: int
+        Number of worker processes for the pooled run. Defaults to one per CPU.
+    """
+    if file is None:
+        data = b"".join(os.urandom(64) * (i % 8 + 1) for i in range(4 << 20 >> 8))[: 4 << 20]
+    else:
+        data = file.read_bytes()
+    chunks = [data[i : i + (256 << 10)] for i in range(0, len(data), 256 << 10)]
+
+    for n_jobs in (1, resolve_jobs(jobs)):
+        stats = CompressionStats()
+        t_start = time()
+        for _ in prepare_chunks(chunks, jobs=n_jobs, stats=stats):
+            sleep(io_delay)
+        t_delta = time() - t_start
+        print(f"jobs={n_jobs:<3} {len(chunks)} chunks in {t_delta:.3f}s ({len(data) / 1024 / t_delta:.1f} KB/s).")
+    print(stats.summary())
+
+
 @debug.command
 def gdb(
     elf: Optional[Path] = None,
@@ -9,6 +9,7 @@ from littlefs.errors import LittleFSError
 
 from gnwmanager.cli._parsers import GnWType, OffsetType
 from gnwmanager.cli.main import app
+from gnwmanager.filesystem import get_gnw_timestamp
 from gnwmanager.utils import Color, colored
 
 log = logging.getLogger(__name__)
@@ -32,10 +33,13 @@ def _tree(fs: LittleFS, path: str, depth: int, max_depth: int, prefix: str = "")
 
             fullpath = f"{path}/{element.name}"
             try:
-                time_val = int.from_bytes(fs.getattr(fullpath, "t"), byteorder="little")
-                time_str = datetime.fromtimestamp(time_val, timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+                time_val = get_gnw_timestamp(fs, fullpath)
             except LittleFSError:
+                time_val = None
+            if time_val is None:
                 time_str = " " * 19
+            else:
+                time_str = datetime.fromtimestamp(time_val, timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
 
             is_last_element = idx == (len(elements) - 1)
             indent = prefix
@@ -62,6 +66,7 @@ def tree(
     depth: Annotated[int, Parameter(validator=validators.Number(gte=0))] = 2,
     offset: OffsetType = 0,
     *,
+    image: Annotated[bool, Parameter(negative="")] = False,
     gnw: GnWType,
 ):
     """List contents of device directory and its descendants.
@@ -74,9 +79,12 @@ def tree(
         Maximum depth of the directory tree.
     offset
         Distance in bytes from the END of the filesystem, to the END of flash.
+    image
+        Read the whole filesystem from the device in one transfer and browse it locally.
+        Faster for large directory trees.
     """
     gnw.start_gnwmanager()
-    fs = gnw.filesystem(offset=offset)
+    fs = gnw.filesystem(offset=offset, image=image)
     _tree(fs, path.as_posix(), 0, depth)
 
 
@@ -139,6 +147,7 @@ def format(
             log.info(f"Growing filesystem {existing_block_count * block_size} -> {block_count * block_size}.")
             fs = gnw.filesystem(offset=offset, block_count=0, mount=False)
             fs.fs_grow(block_count)
+            gnw.wait_for_all_contexts_complete()
             return
 
     if block_count == 0:
@@ -152,6 +161,7 @@ def format(
     fs = gnw.filesystem(offset=offset, block_count=block_count, mount=False)
     log.info(f"Formatting filesystem {block_count=} {block_size=} {offset=}.")
     fs.format()
+    gnw.wait_for_all_contexts_complete()
 
 
 def _ls(fs: LittleFS, path: str):
@@ -166,10 +176,13 @@ def _ls(fs: LittleFS, path: str):
 
             fullpath = f"{path}/{element.name}"
             try:
-                time_val = int.from_bytes(fs.getattr(fullpath, "t"), byteorder="little")
-                time_str = datetime.fromtimestamp(time_val, timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+                time_val = get_gnw_timestamp(fs, fullpath)
             except LittleFSError:
+                time_val = None
+            if time_val is None:
                 time_str = " " * 19
+            else:
+                time_str = datetime.fromtimestamp(time_val, timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
 
             print(f"{element.size:7}B {typ} {time_str} {element.name}")
     except LittleFSError as e:
@@ -218,6 +231,7 @@ def mkdir(
     gnw.start_gnwmanager()
     fs = gnw.filesystem(offset=offset)
     fs.makedirs(path.as_posix(), exist_ok=True)
+    gnw.wait_for_all_contexts_complete()
 
 
 @app.command(group="Filesystem")
@@ -242,6 +256,7 @@ def mv(
     gnw.start_gnwmanager()
     fs = gnw.filesystem(offset=offset)
     fs.rename(src.as_posix(), dst.as_posix())
+    gnw.wait_for_all_contexts_complete()
 
 
 @app.command(group="Filesystem")
@@ -269,3 +284,4 @@ def rm(
     gnw.start_gnwmanager()
     fs = gnw.filesystem(offset=offset)
     fs.remove(path.as_posix(), recursive=recursive)
+    gnw.wait_for_all_contexts_complete()
@@ -4,7 +4,7 @@ from typing import Annotated
 
 from cyclopts import Parameter, validators
 
-from gnwmanager.cli._parsers import GnWType, OffsetType, convert_location, validate_flash_range
+from gnwmanager.cli._parsers import GnWType, JobsType, OffsetType, convert_location, validate_flash_range
 from gnwmanager.cli.main import app
 
 log = logging.getLogger(__name__)
@@ -22,6 +22,8 @@ def flash(
     file: Annotated[Path, Parameter(validator=validators.Path(exists=True, dir_okay=False))],
     offset: OffsetType = 0,
     *,
+    jobs: JobsType = 0,
+    delta: bool = False,
     gnw: GnWType,
 ):
     """Flash firmware to device.
@@ -34,6 +36,12 @@ def flash(
         Binary file to flash.
     offset: int
         Offset into flash.
+    jobs: int
+        Number of worker processes compressing data ahead of the transfer.
+        Defaults to one per CPU.
+    delta: bool
+        Compare external flash per erase-sector and only erase/program the
+        sectors that differ. Faster for small changes to a large image.
     """
     gnw.start_gnwmanager()
     data = file.read_bytes()
@@ -56,4 +64,4 @@ def flash(
         raise ValueError("Unsupported destination address.")
 
     log.info(f"Flashing {len(data)} bytes to {'bank ' + str(bank) if bank else 'ext'} with relative-offset {offset}.")
-    gnw.flash(bank, offset, data, progress=progress, desc=file.name)
+    gnw.flash(bank, offset, data, progress=progress, desc=file.name, jobs=jobs, delta=delta)
@@ -46,6 +46,7 @@ def int_parser(type_, tokens):
 
 OffsetType = Annotated[int, Parameter(validator=validators.Number(gte=0), converter=int_parser)]
 GnWType = Annotated[GnW, Parameter(parse=False)]
+JobsType = Annotated[int, Parameter(validator=validators.Number(gte=0))]
 
 
 def convert_location(type_, tokens) -> int:
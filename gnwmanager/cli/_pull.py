@@ -1,6 +1,11 @@
 import logging
+import queue
+import threading
 from pathlib import Path
+from typing import Annotated, BinaryIO, Optional
 
+from cyclopts import Parameter
+from littlefs import LittleFS
 from littlefs.errors import LittleFSError
 
 from gnwmanager.cli._parsers import GnWType, OffsetType
@@ -8,6 +13,69 @@ from gnwmanager.cli.main import app
 
 log = logging.getLogger(__name__)
 
+_CHUNK_SIZE = 256 << 10
+_MAX_PENDING_CHUNKS = 16
+
+
+class _LocalWriter:
+    """Writes pulled files to local disk on a background thread.
+
+    Reading the next chunk from the device overlaps with writing the previous
+    ones to disk. At most ``max_pending`` chunks are buffered; beyond that,
+    ``write_file`` blocks until the disk catches up. Errors raised by the
+    writer thread are re-raised by the next ``write_file`` or ``close``.
+    """
+
+    def __init__(self, chunk_size: int = _CHUNK_SIZE, max_pending: int = _MAX_PENDING_CHUNKS):
+        self.chunk_size = chunk_size
+        self._queue: queue.Queue = queue.Queue(maxsize=max_pending)
+        self._error: Optional[BaseException] = None
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        f = None
+        while (item := self._queue.get()) is not None:
+            if self._error is not None:
+                continue  # Drain the queue so the producer never blocks.
+            try:
+                if isinstance(item, Path):
+                    item.parent.mkdir(exist_ok=True, parents=True)
+                    f = item.open("wb")
+                elif item:
+                    f.write(item)  # pyright: ignore[reportOptionalMemberAccess]
+                else:
+                    f.close()  # pyright: ignore[reportOptionalMemberAccess]
+                    f = None
+            except BaseException as e:  # noqa: BLE001
+                self._error = e
+        if f is not None:
+            f.close()
+
+    def _raise_error(self):
+        if self._error is not None:
+            raise self._error
+
+    def write_file(self, path: Path, src: BinaryIO):
+        """Stream ``src`` into the local file ``path``, one chunk at a time."""
+        self._raise_error()
+        self._queue.put(path)
+        while chunk := src.read(self.chunk_size):
+            self._queue.put(chunk)
+        self._queue.put(b"")  # End of file.
+
+    def close(self):
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join()
+        self._raise_error()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
 
 @app.command(group="Filesystem")
 def pull(
@@ -15,6 +83,7 @@ def pull(
     local_path: Path,
     offset: OffsetType = 0,
     *,
+    image: Annotated[bool, Parameter(negative="")] = False,
     gnw: GnWType,
 ):
     """Pull a file or folder from device.
@@ -27,10 +96,13 @@ def pull(
         Local file or folder to copy data to.
     offset: int
         Distance from the END of the filesystem, to the END of flash.
+    image: bool
+        Read the whole filesystem from the device in one transfer and browse it locally.
+        Faster for large directory trees.
     """
     gnw.start_gnwmanager()
 
-    fs = gnw.filesystem(offset=offset)
+    fs = gnw.filesystem(offset=offset, image=image)
 
     try:
         stat = fs.stat(gnw_path.as_posix())
@@ -45,33 +117,32 @@ def pull(
             local_path = local_path / gnw_path.name
         log.info(f"Pulling FILE {gnw_path.as_posix()}  ->  {str(local_path)}.")
 
-        with fs.open(gnw_path.as_posix(), "rb") as f:
-            data = f.read()
-
-        local_path.write_bytes(data)
+        with _LocalWriter() as writer, fs.open(gnw_path.as_posix(), "rb") as f:
+            writer.write_file(local_path, f)
     elif stat.type == 2:  # dir
         log.info(f"Pulling DIR {gnw_path.as_posix()}.")
         if local_path.is_file():
             raise ValueError(f'Cannot backup directory "{gnw_path.as_posix()}" to file "{local_path}"')
 
         strip_root = not local_path.exists()
-        for root, _, files in fs.walk(gnw_path.as_posix()):
-            root = Path(root.lstrip("/"))
-            for file in files:
-                full_src_path = root / file
+        with _LocalWriter() as writer:
+            _pull_dir(fs, gnw_path, local_path, strip_root, writer)
+    else:
+        raise NotImplementedError(f"Unknown type: {stat.type}")
 
-                if strip_root:
-                    full_dst_path = local_path / Path(*full_src_path.parts[1:])
-                else:
-                    full_dst_path = local_path / full_src_path
 
-                full_dst_path.parent.mkdir(exist_ok=True, parents=True)
+def _pull_dir(fs: LittleFS, gnw_path: Path, local_path: Path, strip_root: bool, writer: _LocalWriter):
+    for root, _, files in fs.walk(gnw_path.as_posix()):
+        root = Path(root.lstrip("/"))
+        for file in files:
+            full_src_path = root / file
 
-                log.info(f"Pulling FILE {gnw_path.as_posix()}  ->  {str(full_dst_path)}.")
+            if strip_root:
+                full_dst_path = local_path / Path(*full_src_path.parts[1:])
+            else:
+                full_dst_path = local_path / full_src_path
 
-                with fs.open(full_src_path.as_posix(), "rb") as f:
-                    data = f.read()
+            log.info(f"Pulling FILE {gnw_path.as_posix()}  ->  {str(full_dst_path)}.")
 
-                full_dst_path.write_bytes(data)
-    else:
-        raise NotImplementedError(f"Unknown type: {stat.type}")
+            with fs.open(full_src_path.as_posix(), "rb") as f:
+                writer.write_file(full_dst_path, f)
@@ -1,41 +1,27 @@
+import contextlib
 import logging
-import re
+import shutil
 from pathlib import Path
-from typing import Annotated, List
+from typing import Annotated, List, NamedTuple
 
 from cyclopts import Parameter
+from littlefs import LittleFS
 
 from gnwmanager.cli._parsers import GnWType, OffsetType
 from gnwmanager.cli.main import app
-from gnwmanager.filesystem import gnw_sha256, is_existing_gnw_dir
+from gnwmanager.filesystem import (
+    GnWTree,
+    flash_filesystem_image,
+    get_gnw_sha256,
+    gnw_file_matches,
+    set_gnw_sha256,
+    walk_gnw,
+)
 from gnwmanager.time import timestamp_now
-from gnwmanager.utils import sha256
+from gnwmanager.utils import sha256_file, should_ignore
 
 log = logging.getLogger(__name__)
 
-_ignore_patterns = [
-    r"\.DS_Store",  # macOS folder settings
-    r"Thumbs\.db",  # Windows thumbnail cache
-    r"\.Spotlight-V100",  # macOS indexing file
-    r"\.Trashes",  # macOS trash directory
-    r"ehthumbs\.db",  # Windows Media Center Thumbs
-    r"ehthumbs_vista\.db",  # Alternate Windows Media Center Thumbs
-    r"[Dd]esktop\.ini",  # Windows desktop layout
-    r"\$RECYCLE\.BIN/",  # Windows recycle bin
-    r"\.Trash-.*",  # Linux trash directory
-    r"\.fuse_hidden.*",  # Hidden files created by FUSE
-    r"\.directory",  # KDE directory settings
-    r"\.nfs.*",  # Network File System related file
-]
-
-# Compile the regular expressions
-ignore_regexes = [re.compile(pattern) for pattern in _ignore_patterns]
-
-
-# Function to check if a file should be ignored
-def _should_ignore(file_name):
-    return any(regex.search(file_name) for regex in ignore_regexes)
-
 
 def _expand_glob(local_paths: list[Path]) -> list[Path]:
     """Expand glob patterns in paths.
@@ -56,12 +42,94 @@ def _expand_glob(local_paths: list[Path]) -> list[Path]:
     return expanded
 
 
+class _PushItem(NamedTuple):
+    local: Path
+    dst: str
+    size: int
+    digest: bytes
+
+
+class _PushPlan(NamedTuple):
+    mkdirs: list[str]  # Parents before children.
+    write: list[_PushItem]
+    skip: list[_PushItem]
+    record: list[_PushItem]  # Skipped files whose hash record is missing or stale.
+
+
+def _resolve_sources(local_paths: list[Path], gnw_path: Path, gnw_path_is_dir: bool) -> list[tuple[Path, Path]]:
+    """Pair every local file to push with its destination on the device."""
+    sources = []
+    for local_path in local_paths:
+        if not local_path.exists():
+            raise ValueError(f'Local "{local_path}" does not exist.')
+
+        if local_path.is_file():
+            dst = gnw_path / local_path.name if gnw_path_is_dir else gnw_path
+            sources.append((local_path, dst))
+        else:
+            all_local_files = [
+                file for file in local_path.rglob("*") if not should_ignore(file.name) and not file.is_dir()
+            ]
+            for file in all_local_files:
+                subpath = file.relative_to(local_path.parent)
+                dst = gnw_path / Path(*subpath.parts[1:]) if not gnw_path_is_dir else gnw_path / subpath
+                sources.append((file, dst))
+    return sources
+
+
+def _plan_push(
+    fs: LittleFS, sources: list[tuple[Path, Path]], remote: GnWTree, trust_records: bool = False
+) -> _PushPlan:
+    """Decide which files need writing, given the remote tree under the destination.
+
+    Files missing remotely, or of a different size, are written without
+    consulting the device further; otherwise they are compared with
+    ``gnw_file_matches``.
+    """
+    mkdirs, write, skip, record = set(), [], [], []
+    for local, dst in sources:
+        item = _PushItem(local, dst.as_posix(), local.stat().st_size, sha256_file(local))
+        if remote.files.get(item.dst) == item.size and gnw_file_matches(fs, item.dst, item.digest, trust_records):
+            skip.append(item)
+            if get_gnw_sha256(fs, item.dst) != item.digest:
+                record.append(item)
+            continue
+        write.append(item)
+        for parent in dst.parents:
+            directory = parent.as_posix()
+            if directory in ("/", ".") or directory in remote.dirs:
+                break
+            mkdirs.add(directory)
+    return _PushPlan(sorted(mkdirs), write, skip, record)
+
+
+def _execute_push(fs: LittleFS, plan: _PushPlan):
+    for directory in plan.mkdirs:
+        # May be an existing ancestor of the destination, outside of the scanned tree.
+        with contextlib.suppress(FileExistsError):
+            fs.mkdir(directory)
+
+    for item in plan.write:
+        log.info(f"Writing {item.size} bytes to {item.dst}.")
+        with item.local.open("rb") as src, fs.open(item.dst, "wb") as dst:
+            shutil.copyfileobj(src, dst)
+    for item in plan.skip:
+        log.info(f"No data changed for {item.dst}.")
+
+    # One attribute write per file; files skipped with a valid record aren't touched.
+    timestamp = timestamp_now()
+    for item in plan.write + plan.record:
+        set_gnw_sha256(fs, item.dst, item.digest, item.size, timestamp)
+
+
 @app.command(group="Filesystem")
 def push(
     gnw_path: Path,
     local_paths: Annotated[list[Path], Parameter(negative=[])],
     offset: OffsetType = 0,
     *,
+    image: Annotated[bool, Parameter(negative="")] = False,
+    trust_hashes: Annotated[bool, Parameter(negative="")] = False,
     gnw: GnWType,
 ):
     """Push file(s) and folder(s) to device.
@@ -74,53 +142,33 @@ def push(
         Local file(s) or folder to copy data to.
     offset: int
         Distance from the END of the filesystem, to the END of flash.
+    image: bool
+        Read the whole filesystem from the device, apply all changes to it locally,
+        then flash only the changed sectors. Faster for large directory trees.
+    trust_hashes: bool
+        Skip files whose recorded hash matches without reading them back.
+        Faster, but misses files the device rewrote in place at the same size.
     """
     gnw.start_gnwmanager()
 
-    fs = gnw.filesystem(offset=offset)
+    fs = gnw.filesystem(offset=offset, image=image)
 
     local_paths = _expand_glob(local_paths)
 
-    gnw_path_is_dir = True if len(local_paths) > 1 else is_existing_gnw_dir(fs, gnw_path)
-
-    for local_path in local_paths:
-        if not local_path.exists():
-            raise ValueError(f'Local "{local_path}" does not exist.')
-
-        if local_path.is_file():
-            data = local_path.read_bytes()
-
-            dst = gnw_path / local_path.name if gnw_path_is_dir else gnw_path
-
-            if sha256(data) != gnw_sha256(fs, dst):
-                fs.makedirs(dst.parent.as_posix(), exist_ok=True)
-
-                log.info(f"Writing {len(data)} bytes to {dst.as_posix()}.")
-                with fs.open(dst.as_posix(), "wb") as f:
-                    f.write(data)
-            else:
-                log.info(f"No data changed for {dst.as_posix()}.")
-
-            fs.setattr(dst.as_posix(), "t", timestamp_now().to_bytes(4, "little"))
-        else:
-            all_local_files = [
-                file for file in local_path.rglob("*") if not _should_ignore(file.name) and not file.is_dir()
-            ]
-            for file in all_local_files:
-                data = file.read_bytes()
-
-                subpath = file.relative_to(local_path.parent)
-                dst = gnw_path / Path(*subpath.parts[1:]) if not gnw_path_is_dir else gnw_path / subpath
-
-                if sha256(data) != gnw_sha256(fs, dst):
-                    fs.makedirs(dst.parent.as_posix(), exist_ok=True)
+    remote = walk_gnw(fs, gnw_path)
+    gnw_path_is_dir = True if len(local_paths) > 1 else gnw_path.as_posix() in remote.dirs
 
-                    log.info(f"Writing {len(data)} bytes to {dst.as_posix()}.")
-                    with fs.open(dst.as_posix(), "wb") as f:
-                        f.write(data)
-                else:
-                    log.info(f"No data changed for {dst.as_posix()}.")
+    plan = _plan_push(fs, _resolve_sources(local_paths, gnw_path, gnw_path_is_dir), remote, trust_hashes)
+    write_bytes = sum(item.size for item in plan.write)
+    skip_bytes = sum(item.size for item in plan.skip)
+    print(
+        f"Writing {len(plan.write)} files ({write_bytes} bytes), "
+        f"skipping {len(plan.skip)} unchanged ({skip_bytes} bytes)."
+    )
 
-                fs.setattr(dst.as_posix(), "t", timestamp_now().to_bytes(4, "little"))
+    _execute_push(fs, plan)
 
-    gnw.wait_for_all_contexts_complete()
+    if image:
+        flash_filesystem_image(gnw, fs, offset=offset, progress=True)
+    else:
+        gnw.wait_for_all_contexts_complete()
@@ -1,11 +1,25 @@
+import glob
 import logging
 from pathlib import Path
 from typing import Annotated
 
 from cyclopts import Group, Parameter, validators
 
-from gnwmanager.cli._parsers import GnWType
+from gnwmanager.cli._parsers import GnWType, JobsType
 from gnwmanager.cli.main import app
+from gnwmanager.exceptions import DataError
+from gnwmanager.sdcard import (
+    SDOp,
+    SDTree,
+    expand_sd_glob,
+    join_path,
+    plan_sync,
+    raise_for_failures,
+    sd_sha256,
+    verify_sd_file,
+    walk_sd,
+)
+from gnwmanager.utils import sha256_file, should_ignore
 
 log = logging.getLogger(__name__)
 
@@ -16,28 +30,61 @@ group_sd = Group("SD Card (Only for game and watch with SD Card mod)")
 def sdls(
     path: str = "/",
     *,
+    long: Annotated[bool, Parameter(name=["--long", "-l"])] = False,
     gnw: GnWType,
 ):
-    """List files and directories on the SD card under ``path`` (directories end with ``/``)."""
+    """List files and directories on the SD card under ``path`` (directories end with ``/``).
+
+    Parameters
+    ----------
+    path: str
+        Directory on the SD card to list.
+    long: bool
+        Also show each entry's size and modification time.
+    """
     if not path.startswith("/"):
         raise ValueError("path shall start with '/'")
     gnw.start_gnwmanager()
-    listing = gnw.sd_list_dir(path)
     # Plain print: Rich would interpret ``[...]`` in filenames (e.g. ``[!].bin``) as markup.
-    print(listing, end="" if listing.endswith("\n") else "\n")
+    for entry in gnw.sd_scandir(path):
+        name = f"{entry.name}/" if entry.is_dir else entry.name
+        if long:
+            mtime = entry.mtime.strftime("%Y-%m-%d %H:%M") if entry.mtime else "-"
+            size = "-" if entry.is_dir else str(entry.size)
+            print(f"{size:>12}  {mtime:16}  {name}")
+        else:
+            print(name)
 
 
 @app.command(group=group_sd)
 def sdrm(
-    path: str,
-    *,
+    *paths: str,
     gnw: GnWType,
 ):
-    """Delete a file on the SD card."""
-    if not path.startswith("/"):
-        raise ValueError("path shall start with '/'")
+    """Delete files (or empty directories) on the SD card.
+
+    Parameters
+    ----------
+    paths: str
+        Paths to delete. The last path component may contain shell-style
+        wildcards, e.g. ``/roms/gb/*.sav``.
+    """
+    if not paths:
+        raise ValueError("sdrm requires at least one path.")
+    for path in paths:
+        if not path.startswith("/"):
+            raise ValueError(f"path shall start with '/' {path}")
     gnw.start_gnwmanager()
-    gnw.sd_unlink(path)
+
+    to_delete = []
+    for path in paths:
+        matches = expand_sd_glob(gnw, path)
+        if not matches:
+            log.warning(f"No files match {path}.")
+        to_delete.extend(matches)
+
+    results = gnw.sd_batch(SDOp("unlink", path) for path in to_delete)
+    raise_for_failures(results, "BAD_SD_UNLINK")
 
 
 @app.command(group=group_sd)
@@ -56,32 +103,154 @@ def sdpull(
         dest = dest / Path(src_path).name
 
     gnw.start_gnwmanager()
-    data = gnw.sd_read_file(src_path, progress=True)
     dest.parent.mkdir(parents=True, exist_ok=True)
-    dest.write_bytes(data)
+    with dest.open("wb") as f:
+        gnw.sd_read_file_to(src_path, f, progress=True)
 
 
 @app.command(group=group_sd)
 def sdpush(
-    file: Annotated[Path, Parameter(validator=validators.Path(exists=True, dir_okay=False))],
+    *paths: str,
+    jobs: JobsType = 0,
+    force: bool = False,
+    verify: bool = True,
+    gnw: GnWType,
+):
+    """Push file(s) to SD Card connected to device.
+
+    Usage: ``sdpush FILE... DEST_PATH``. With several files (or wildcards),
+    ``DEST_PATH`` must be a directory ending in ``/``; their transfers are
+    queued back-to-back.
+
+    Parameters
+    ----------
+    paths: str
+        Local files to store on the SD Card, followed by the destination path
+        on the SD Card. A destination ending in ``/`` keeps the local file names.
+    jobs: int
+        Number of worker processes compressing data ahead of the transfer.
+        Defaults to one per CPU.
+    force: bool
+        Write files even if an identical one already exists on the SD Card.
+    verify: bool
+        Hash files on-device after writing and compare against the local files.
+    """
+    if len(paths) < 2:
+        raise ValueError("sdpush requires at least one file and a destination path.")
+    *patterns, dest_path = paths
+    if not dest_path.startswith("/"):
+        raise ValueError("dest_path shall start with '/'")
+
+    files = []
+    for pattern in patterns:
+        # ``Path.glob`` doesn't accept absolute patterns.
+        matches = [] if Path(pattern).exists() else sorted(map(Path, glob.glob(pattern)))  # noqa: PTH207
+        for file in matches or [Path(pattern)]:
+            if not file.is_file():
+                raise FileNotFoundError(f"{file} is not a file.")
+            files.append(file)
+    if len(files) > 1 and not dest_path.endswith("/"):
+        raise ValueError("dest_path shall be a directory ending in '/' when pushing multiple files.")
+
+    gnw.start_gnwmanager()
+
+    to_write = []
+    for file in files:
+        dest = f"{dest_path}{file.name}" if dest_path.endswith("/") else dest_path
+        local_hash = sha256_file(file)
+        if not force and sd_sha256(gnw, dest) == local_hash:
+            log.info(f"No data changed for {dest}.")
+            continue
+        to_write.append((file, dest, local_hash))
+
+    errors = gnw.sd_write_files([(dest, file) for file, dest, _ in to_write], progress=True, jobs=jobs)
+
+    n_failed = 0
+    for (file, dest, local_hash), error in zip(to_write, errors):
+        if error is None and verify:
+            try:
+                verify_sd_file(gnw, dest, local_hash)
+            except DataError as e:
+                error = e
+        if error is not None:
+            if len(to_write) == 1:
+                raise error
+            print(f"Failed to push {file} to {dest}: {error}")
+            n_failed += 1
+    if n_failed:
+        raise DataError("BAD_SD_WRITE")
+
+
+def _walk_local(root: Path) -> SDTree:
+    files, dirs = {}, set()
+    for path in root.rglob("*"):
+        relative = path.relative_to(root)
+        if any(should_ignore(part) for part in relative.parts):
+            continue
+        if path.is_dir():
+            dirs.add(relative.as_posix())
+        else:
+            files[relative.as_posix()] = path.stat().st_size
+    return SDTree(files, dirs)
+
+
+@app.command(group=group_sd)
+def sdsync(
+    src: Annotated[Path, Parameter(validator=validators.Path(exists=True, file_okay=False))],
     dest_path: str,
     *,
+    delete: bool = False,
+    checksum: bool = False,
+    jobs: JobsType = 0,
     gnw: GnWType,
 ):
-    """Store data in a file on SD Card of the game and watch.
+    """Mirror a local directory onto the SD card, only transferring missing or changed files.
 
     Parameters
     ----------
-    destpath: str
-        path of the file to create on the SD Card of the game and watch
-    file: Path
-        file to store in SD Card.
+    src: Path
+        Local directory to copy.
+    dest_path: str
+        Directory on the SD card to mirror ``src`` into.
+    delete: bool
+        Remove files and directories under ``dest_path`` that don't exist in ``src``.
+    checksum: bool
+        Also compare on-device hashes of files whose size matches, instead of
+        trusting the size alone. Transferred files are verified either way.
+    jobs: int
+        Number of worker processes compressing data ahead of the transfer.
+        Defaults to one per CPU.
     """
     if not dest_path.startswith("/"):
         raise ValueError("dest_path shall start with '/'")
-    if dest_path.endswith("/"):
-        dest_path = f"{dest_path}{file.name}"
+    dest_path = dest_path.rstrip("/") or "/"
 
     gnw.start_gnwmanager()
-    data = file.read_bytes()
-    gnw.sd_write_file(dest_path, data, progress=True)
+
+    remote = walk_sd(gnw, dest_path)
+    if remote is None:
+        gnw.sd_mkdir(dest_path, parents=True)
+    plan = plan_sync(_walk_local(src), remote, delete=delete)
+    push = plan.push
+    if checksum:
+        push = sorted(
+            push
+            + [path for path in plan.skip if gnw.sd_hash_file(join_path(dest_path, path)) != sha256_file(src / path)]
+        )
+
+    if plan.mkdirs:
+        results = gnw.sd_batch(SDOp("mkdir", join_path(dest_path, directory)) for directory in plan.mkdirs)
+        raise_for_failures(results, "BAD_SD_MKDIR")
+
+    errors = gnw.sd_write_files([(join_path(dest_path, path), src / path) for path in push], progress=True, jobs=jobs)
+    for path, error in zip(push, errors):
+        if error is not None:
+            raise error
+        verify_sd_file(gnw, join_path(dest_path, path), sha256_file(src / path))
+
+    if plan.delete:
+        results = gnw.sd_batch(SDOp("unlink", join_path(dest_path, path)) for path in plan.delete)
+        raise_for_failures(results, "BAD_SD_UNLINK")
+
+    n_unchanged = len(plan.push) + len(plan.skip) - len(push)
+    print(f"{len(push)} transferred, {n_unchanged} unchanged, {len(plan.delete)} deleted.")
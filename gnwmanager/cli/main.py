@@ -15,6 +15,7 @@ from cyclopts import App, Parameter
 from littlefs.errors import LittleFSError
 
 from gnwmanager import __version__
+from gnwmanager.cache import DEFAULT_BLOCK_CACHE_SIZE
 from gnwmanager.cli._parsers import GnWType, OffsetType, int_parser
 from gnwmanager.cli.devices import AutodetectError, DeviceModel
 from gnwmanager.exceptions import DataError, DebugProbeConnectionError
@@ -25,6 +26,8 @@ with suppress(ImportError):
     # By importing, makes things like the arrow-keys work.
     import readline  # Not available on windows
 
+log = logging.getLogger(__name__)
+
 app = App(group_commands="Miscellaneous", end_of_options_delimiter="")
 
 app.meta["--help"].group = "Admin"
@@ -205,6 +208,9 @@ def main(
     *tokens: Annotated[str, Parameter(show=False, allow_leading_hyphen=True)],
     backend: Annotated[Literal["openocd", "pyocd"], Parameter(name=["--backend", "-b"])] = "openocd",
     frequency: Annotated[Optional[int], Parameter(name=["--frequency", "-f"], converter=int_parser)] = None,
+    cache_size: Annotated[
+        int, Parameter(converter=int_parser, env_var="GNWMANAGER_CACHE_SIZE")
+    ] = DEFAULT_BLOCK_CACHE_SIZE,
     verbosity: Annotated[
         Literal["debug", "info", "warning", "error"], Parameter(env_var="GNWMANAGER_VERBOSITY")
     ] = "warning",
@@ -219,6 +225,8 @@ def main(
         Underlying on-chip-debugger backend to use.
     frequency
         Debug probe frequency. Defaults to a typically reasonable fast value.
+    cache_size
+        Memory budget for caching filesystem blocks read from the device.
     """
     _setup_logging(verbosity)
 
@@ -242,6 +250,7 @@ def main(
                     gnw.backend.open()
                     if frequency is not None:
                         gnw.backend.set_frequency(frequency)
+                    gnw.block_cache.max_bytes = cache_size
                 additional_kwargs["gnw"] = gnw
 
             command(*bound.args, **bound.kwargs, **additional_kwargs)
@@ -268,6 +277,14 @@ def main(
             rich.print("[red]SD directory listing was truncated (too many entries or long names).[/red]")
         elif e.args == ("BAD_SD_READ",):
             rich.print("[red]Failed to read file from SD Card![/red]")
+        elif e.args == ("BAD_SD_MKDIR",):
+            rich.print("[red]Failed to create directory on SD Card![/red]")
+        elif e.args == ("BAD_SD_BATCH",):
+            rich.print("[red]SD Card rejected a malformed batch request.[/red]")
+        elif first_arg.startswith("BAD_SD_VERIFY"):
+            rich.print(
+                f"[red]File on SD Card does not match after writing ({first_arg.split(':', 1)[-1].strip()}).[/red]"
+            )
         elif first_arg.startswith(("BAD_HASH_RAM_COMPRESSED", "BAD_HASH_RAM", "BAD_HASH_FLASH")):
             status = first_arg.split(":", 1)[0]
             rich.print(
@@ -282,6 +299,8 @@ def main(
         print(traceback.format_exc())
         close_on_exit = False
     finally:
+        if gnw is not None and gnw.block_cache.hits + gnw.block_cache.misses:
+            log.info(gnw.block_cache.summary())
         if close_on_exit and gnw is not None:
             gnw.backend.close()
 
@@ -1,6 +1,8 @@
+import logging
+import struct
 from functools import lru_cache
 from pathlib import Path
-from typing import Dict, Optional, Tuple, Union
+from typing import Dict, NamedTuple, Optional, Set, Tuple, Union
 
 from littlefs import LittleFS
 from littlefs.context import UserContext
@@ -11,51 +13,227 @@ from gnwmanager.gnw import GnW
 from gnwmanager.utils import sha256
 from gnwmanager.validation import validate_extflash_offset
 
-_gnw_cache = {}
+log = logging.getLogger(__name__)
+
+
+# Custom attribute recording the file's sha256 at ``push`` time, along with its
+# size and the push timestamp; see ``gnw_file_matches``. Pushed files carry the
+# timestamp only here, so the push costs a single metadata commit; see
+# ``get_gnw_timestamp``.
+HASH_ATTR = "h"
+_HASH_RECORD = struct.Struct("<32sII")  # sha256, size, timestamp
+
+DEFAULT_READAHEAD = 256 << 10
+DEFAULT_MAX_DIRTY = 1 << 20
 
 
 class LfsDriverContext(UserContext):
-    def __init__(self, gnw: GnW, filesystem_end: int, cache: Optional[dict] = None) -> None:
+    """LittleFS block device backed by the GnW's memory-mapped external flash.
+
+    Parameters
+    ----------
+    gnw: GnW
+        Game and Watch object.
+    filesystem_end: int
+        Offset into external flash where the filesystem ends.
+    readahead: int
+        Maximum number of bytes to fetch in one read once sequential block
+        access is detected. The window starts at one block and doubles with
+        each sequential miss. ``0`` disables read-ahead.
+    max_dirty: int
+        Writes are buffered on the host until LittleFS syncs, or until this
+        many bytes of blocks are dirty. Buffered writes are then submitted
+        without waiting for the device; call ``flush(blocking=True)`` (or
+        ``GnW.wait_for_all_contexts_complete``) before relying on them.
+
+    LittleFS must be configured with ``prog_size == block_size``. A dirty block
+    that wasn't erased is programmed from its start, padded with 0xFF, and the
+    device hash-verifies the whole programmed range. That only matches flash
+    if every program covers the whole block.
+    """
+
+    def __init__(
+        self,
+        gnw: GnW,
+        filesystem_end: int,
+        readahead: int = DEFAULT_READAHEAD,
+        max_dirty: int = DEFAULT_MAX_DIRTY,
+    ) -> None:
         validate_extflash_offset(filesystem_end)
 
         self.gnw = gnw
         self.filesystem_end = filesystem_end
-        self.cache = _gnw_cache if cache is None else cache
+        self.readahead = readahead
+        self.max_dirty = max_dirty
+        # Block -> its pending contents. Bytes not yet programmed are 0xFF, which
+        # leaves flash untouched when programmed without an erase.
+        self._dirty: Dict[int, bytearray] = {}
+        self._erased: Set[int] = set()  # Dirty blocks that must be erased first.
+        self._last_block: Optional[int] = None
+        self._direction = 0
+        self._window = 1  # Number of blocks to fetch on the next sequential miss.
+
+    def _block_offset(self, cfg: LFSConfig, block: int) -> int:
+        # Blocks are numbered backwards from the end of the filesystem.
+        return self.filesystem_end - ((block + 1) * cfg.block_size)
+
+    def _track_access(self, block: int) -> bool:
+        """Record an access to ``block``; return whether it continues a sequential run."""
+        if self._last_block is None or block == self._last_block:
+            sequential = block == self._last_block
+        else:
+            step = block - self._last_block
+            sequential = abs(step) == 1 and self._direction in (0, step)
+            self._direction = step if sequential else 0
+        self._last_block = block
+        return sequential
 
     def read(self, cfg: LFSConfig, block: int, off: int, size: int) -> bytearray:
-        try:
-            return bytearray(self.cache[block][off : off + size])
-        except KeyError:
-            pass
+        sequential = self._track_access(block)
+        if block in self._erased:
+            return self._dirty[block][off : off + size]
+        offset = self._block_offset(cfg, block)
+        data = self.gnw.block_cache.get(offset)
+        if data is None:
+            data = self._fetch(cfg, block, sequential)
+        if block in self._dirty:
+            return _program_bits(data[off : off + size], self._dirty[block][off : off + size])
+        return bytearray(data[off : off + size])
+
+    def _fetch(self, cfg: LFSConfig, block: int, sequential: bool) -> bytes:
+        """Read ``block`` from flash, plus the following blocks of a sequential run."""
+        max_window = max(1, min(self.readahead, self.gnw.block_cache.max_bytes // 4) // cfg.block_size)
+        self._window = min(2 * self._window, max_window) if sequential and self._direction else 1
+
+        # Blocks are numbered backwards from the end of the filesystem, so a run of
+        # increasing block numbers is a run of decreasing flash addresses.
+        blocks = [block]
+        for _ in range(self._window - 1):
+            nxt = blocks[-1] + self._direction
+            if nxt < 0 or (cfg.block_count and nxt >= cfg.block_count) or self._block_offset(cfg, nxt) < 0:
+                break
+            if self._block_offset(cfg, nxt) in self.gnw.block_cache:
+                break
+            blocks.append(nxt)
+        start = min(self._block_offset(cfg, b) for b in blocks)
+        if len(blocks) > 1:
+            log.debug(f"Reading ahead {len(blocks)} blocks from block {block}.")
+
         self.gnw.wait_for_all_contexts_complete()  # if a prog/erase is being performed, chip is not in memory-mapped-mode
-        addr = 0x9000_0000 + self.filesystem_end - ((block + 1) * cfg.block_size)
-        self.cache[block] = bytearray(self.gnw.read_memory(addr, size))
-        return bytearray(self.cache[block][off : off + size])
+        data = self.gnw.read_memory(0x9000_0000 + start, len(blocks) * cfg.block_size)
+        # Insert the requested block last so read-ahead can't evict it.
+        for b in sorted(blocks, key=lambda b: b == block):
+            rel = self._block_offset(cfg, b) - start
+            self.gnw.block_cache.put(start + rel, data[rel : rel + cfg.block_size])
+        rel = self._block_offset(cfg, block) - start
+        return data[rel : rel + cfg.block_size]
 
     def prog(self, cfg: LFSConfig, block: int, off: int, data: bytes) -> int:
-        # Update the local block if it has previously been read
-        try:
-            barray = self.cache[block]
-            barray[off : off + len(data)] = data
-        except KeyError:
-            pass
+        if cfg.prog_size != cfg.block_size:
+            log.error(f"prog_size ({cfg.prog_size}) must equal block_size ({cfg.block_size}).")
+            return LittleFSError.Error.LFS_ERR_INVAL
+        pending = self._dirty.setdefault(block, bytearray(b"\xff" * cfg.block_size))
+        pending[off : off + len(data)] = _program_bits(pending[off : off + len(data)], data)
+        self._flush_if_full(cfg)
+        return 0
 
-        addr = self.filesystem_end - ((block + 1) * cfg.block_size) + off
-        self.gnw.program(0, addr, data, erase=False)
+    def erase(self, cfg: LFSConfig, block: int) -> int:
+        self._dirty[block] = bytearray(b"\xff" * cfg.block_size)
+        self._erased.add(block)
+        self._flush_if_full(cfg)
+        return 0
 
+    def sync(self, cfg: LFSConfig) -> int:
+        self.flush(cfg)
+        return 0
+
+    def _flush_if_full(self, cfg: LFSConfig):
+        if len(self._dirty) * cfg.block_size > self.max_dirty:
+            self.flush(cfg)
+
+    def flush(self, cfg: Optional[LFSConfig] = None, blocking: bool = False):
+        """Submit buffered writes to the device.
+
+        Runs of address-contiguous erased blocks are combined into a single
+        erase-and-program per context buffer; other dirty blocks are programmed
+        without erasing, trimmed of trailing unwritten bytes.
+        """
+        if self._dirty:
+            block_size = len(next(iter(self._dirty.values())))
+            max_run = max(1, self.gnw.contexts[0]["buffer"].size // block_size)
+            log.debug(f"Flushing {len(self._dirty)} dirty blocks ({len(self._erased)} erased).")
+
+            # Decreasing block numbers are increasing flash addresses.
+            run: list[int] = []
+            for block in sorted(self._erased, reverse=True):
+                if run and (block != run[-1] - 1 or len(run) == max_run):
+                    self._program_erased_run(run, block_size)
+                    run = []
+                run.append(block)
+            if run:
+                self._program_erased_run(run, block_size)
+
+            for block, data in sorted(self._dirty.items()):
+                if block in self._erased:
+                    continue
+                # Programs must start on a 4KB boundary; trailing 0xFF bytes are a no-op.
+                n_bytes = len(data.rstrip(b"\xff"))
+                if n_bytes:
+                    offset = self.filesystem_end - (block + 1) * block_size
+                    self.gnw.program(0, offset, bytes(data[:n_bytes]), erase=False, blocking=False)
+
+            self._dirty.clear()
+            self._erased.clear()
+        if blocking:
+            self.gnw.wait_for_all_contexts_complete()
+
+    def _program_erased_run(self, run: list[int], block_size: int):
+        offset = self.filesystem_end - (run[0] + 1) * block_size
+        data = b"".join(bytes(self._dirty[block]) for block in run)
+        self.gnw.program(0, offset, data, erase=True, blocking=False)
+        for i in range(len(run)):
+            self.gnw.block_cache.put(offset + i * block_size, data[i * block_size : (i + 1) * block_size])
+
+
+class ImageContext(UserContext):
+    """LittleFS block device over a host-memory copy of a GnW filesystem region.
+
+    Blocks use the device's layout, numbered backwards from the end of ``buffer``,
+    so the buffer can be read from, or written back to, external flash as-is.
+    """
+
+    def __init__(self, buffer: bytearray) -> None:
+        # Not ``super().__init__(buffer=...)``: older littlefs-python only takes ``buffsize``.
+        self.buffer = buffer
+
+    def _block_offset(self, cfg: LFSConfig, block: int) -> int:
+        return len(self.buffer) - ((block + 1) * cfg.block_size)
+
+    def read(self, cfg: LFSConfig, block: int, off: int, size: int) -> bytearray:
+        start = self._block_offset(cfg, block) + off
+        return self.buffer[start : start + size]
+
+    def prog(self, cfg: LFSConfig, block: int, off: int, data: bytes) -> int:
+        start = self._block_offset(cfg, block) + off
+        self.buffer[start : start + len(data)] = data
         return 0
 
     def erase(self, cfg: LFSConfig, block: int) -> int:
-        self.cache[block] = bytearray([0xFF] * cfg.block_size)
-        offset = self.filesystem_end - ((block + 1) * cfg.block_size)
-        self.gnw.erase(0, offset, cfg.block_size)
+        start = self._block_offset(cfg, block)
+        self.buffer[start : start + cfg.block_size] = b"\xff" * cfg.block_size
         return 0
 
     def sync(self, cfg: LFSConfig) -> int:
         return 0
 
 
-def get_filesystem(gnw: GnW, offset: int = 0, block_count=0, mount=True) -> LittleFS:
+def _program_bits(old, new) -> bytearray:
+    """Result of NOR-programming ``new`` over ``old``: bits can only be cleared."""
+    value = int.from_bytes(old, "little") & int.from_bytes(new, "little")
+    return bytearray(value.to_bytes(len(new), "little"))
+
+
+def get_filesystem(gnw: GnW, offset: int = 0, block_count=0, mount=True, image=False) -> LittleFS:
     """Get LittleFS filesystem handle.
 
     Parameters
@@ -70,13 +248,20 @@ def get_filesystem(gnw: GnW, offset: int = 0, block_count=0, mount=True) -> Litt
         Defaults to ``0`` (infer from existing filesystem).
     mount: bool
         Mount the filesystem.
+    image: bool
+        Read the whole filesystem region from the device in one transfer, and
+        operate on that host-side copy (see ``get_filesystem_image``).
     """
+    if image:
+        return get_filesystem_image(gnw, offset=offset, block_count=block_count)
+
     filesystem_end = gnw.external_flash_size - offset
     lfs_context = LfsDriverContext(gnw, filesystem_end)
 
     fs = LittleFS(
         lfs_context,
         block_size=gnw.external_flash_block_size,
+        prog_size=gnw.external_flash_block_size,  # Required by LfsDriverContext.
         block_count=block_count,
         block_cycles=500,
         mount=False,  # Separately mount to not trigger a format-on-corruption
@@ -86,6 +271,76 @@ def get_filesystem(gnw: GnW, offset: int = 0, block_count=0, mount=True) -> Litt
     return fs
 
 
+def read_filesystem_image(gnw: GnW, offset: int = 0, block_count: int = 0) -> bytearray:
+    """Read the whole filesystem region from external flash in one transfer.
+
+    Parameters
+    ----------
+    gnw: GnW
+        Game and Watch object.
+    offset: int
+        Distance in bytes from the END of the filesystem, to the END of flash.
+    block_count: int
+        Number of blocks in filesystem.
+        Defaults to ``0`` (infer from existing filesystem).
+    """
+    if not block_count:
+        block_count = get_filesystem(gnw, offset=offset).block_count
+    filesystem_end = gnw.external_flash_size - offset
+    size = block_count * gnw.external_flash_block_size
+    if size > filesystem_end:
+        raise ValueError(f"Filesystem of {block_count} blocks doesn't fit before offset {filesystem_end}.")
+
+    log.info(f"Reading {size} byte filesystem image.")
+    gnw.wait_for_all_contexts_complete()  # if a prog/erase is being performed, chip is not in memory-mapped-mode
+    return bytearray(gnw.read_memory(0x9000_0000 + filesystem_end - size, size))
+
+
+def get_filesystem_image(gnw: GnW, offset: int = 0, block_count: int = 0) -> LittleFS:
+    """Mount a host-side copy of the filesystem, read from the device in one transfer.
+
+    Much faster than ``get_filesystem`` when most of the filesystem will be read,
+    e.g. pulling everything. Changes to the returned filesystem are NOT written
+    back to the device.
+    """
+    data = read_filesystem_image(gnw, offset=offset, block_count=block_count)
+    fs = LittleFS(
+        ImageContext(data),
+        block_size=gnw.external_flash_block_size,
+        block_count=len(data) // gnw.external_flash_block_size,
+        block_cycles=500,
+        mount=False,  # Separately mount to not trigger a format-on-corruption
+    )
+    fs.mount()
+    return fs
+
+
+def flash_filesystem_image(gnw: GnW, fs: LittleFS, offset: int = 0, progress: bool = False):
+    """Write a filesystem from ``get_filesystem_image`` back to the device.
+
+    The image is compared against the device per erase-sector, and only
+    differing sectors are erased and programmed, coalesced into contiguous runs.
+
+    Parameters
+    ----------
+    gnw: GnW
+        Game and Watch object.
+    fs: LittleFS
+        Filesystem returned by ``get_filesystem_image`` with the same ``offset``.
+    offset: int
+        Distance in bytes from the END of the filesystem, to the END of flash.
+    progress: bool
+        Display a progress bar.
+    """
+    context = fs.cfg.user_context
+    if not isinstance(context, ImageContext):
+        raise TypeError("Filesystem is not backed by a host-side image.")
+    image = bytes(context.buffer)
+    filesystem_end = gnw.external_flash_size - offset
+    log.info(f"Flashing changes of {len(image)} byte filesystem image.")
+    gnw.flash(0, filesystem_end - len(image), image, progress=progress, desc="Flashing filesystem", delta=True)
+
+
 def is_existing_gnw_dir(fs: LittleFS, path: Union[str, Path]) -> bool:
     """Checks if a directory exists on the GnW filesystem."""
     if isinstance(path, Path):
@@ -100,6 +355,44 @@ def is_existing_gnw_dir(fs: LittleFS, path: Union[str, Path]) -> bool:
     return stat.type == 2
 
 
+class GnWTree(NamedTuple):
+    """Files and directories under a root, keyed by POSIX path (including the root)."""
+
+    files: Dict[str, int]  # Path -> size in bytes.
+    dirs: Set[str]
+
+
+def walk_gnw(fs: LittleFS, root: Union[str, Path]) -> GnWTree:
+    """Recursively list ``root`` on the GnW filesystem with one ``scandir`` per directory.
+
+    ``root`` may also be a file, or not exist at all (an empty tree).
+    """
+    if isinstance(root, Path):
+        root = root.as_posix()
+
+    try:
+        stat = fs.stat(root)
+    except LittleFSError as e:
+        if e.code == LittleFSError.Error.LFS_ERR_NOENT:
+            return GnWTree({}, set())
+        raise
+    if stat.type != 2:
+        return GnWTree({root: stat.size}, set())
+
+    files, dirs = {}, {root}
+    stack = [root]
+    while stack:
+        directory = stack.pop()
+        for element in fs.scandir(directory):
+            path = f"{directory.rstrip('/')}/{element.name}"
+            if element.type == 2:
+                dirs.add(path)
+                stack.append(path)
+            else:
+                files[path] = element.size
+    return GnWTree(files, dirs)
+
+
 def gnw_sha256(fs: LittleFS, path: Union[str, Path]):
     """Compute locally the sha256 digest of a remote file."""
     if isinstance(path, Path):
@@ -116,3 +409,78 @@ def gnw_sha256(fs: LittleFS, path: Union[str, Path]):
         raise
 
     return sha256(data)
+
+
+def set_gnw_sha256(fs: LittleFS, path: Union[str, Path], digest: bytes, size: int, timestamp: int):
+    """Record ``digest`` and the ``timestamp`` of an existing remote file in one attribute write."""
+    if isinstance(path, Path):
+        path = path.as_posix()
+
+    fs.setattr(path, HASH_ATTR, _HASH_RECORD.pack(digest, size, timestamp))
+
+
+def _getattr(fs: LittleFS, path: str, attr: str) -> Optional[bytes]:
+    try:
+        return fs.getattr(path, attr)
+    except LittleFSError as e:
+        if e.code == LittleFSError.Error.LFS_ERR_NOATTR:
+            return None
+        raise
+
+
+def get_gnw_timestamp(fs: LittleFS, path: Union[str, Path]) -> Optional[int]:
+    """Modification time of a remote file: the later of its ``"t"`` attribute and hash record."""
+    if isinstance(path, Path):
+        path = path.as_posix()
+
+    timestamps = []
+    t = _getattr(fs, path, "t")
+    if t is not None:
+        timestamps.append(int.from_bytes(t, "little"))
+    record = _getattr(fs, path, HASH_ATTR)
+    if record is not None and len(record) == _HASH_RECORD.size:
+        timestamps.append(_HASH_RECORD.unpack(record)[2])
+    return max(timestamps, default=None)
+
+
+def get_gnw_sha256(fs: LittleFS, path: Union[str, Path]) -> Optional[bytes]:
+    """The sha256 recorded for a remote file, or ``None`` if missing or stale.
+
+    A record is stale if the file's size no longer matches, or its ``"t"``
+    timestamp was set after the record. A file rewritten in place at the same
+    size without touching ``"t"`` (e.g. a save state written by the device) is
+    not detected, so the result is only a hint; see ``gnw_file_matches``.
+    """
+    if isinstance(path, Path):
+        path = path.as_posix()
+
+    try:
+        record = _getattr(fs, path, HASH_ATTR)
+        t = _getattr(fs, path, "t")
+        size = fs.stat(path).size
+    except LittleFSError as e:
+        if e.code == LittleFSError.Error.LFS_ERR_NOENT:
+            return None
+        raise
+    if record is None or len(record) != _HASH_RECORD.size:
+        return None
+    digest, recorded_size, recorded_timestamp = _HASH_RECORD.unpack(record)
+    if recorded_size != size or (t is not None and int.from_bytes(t, "little") > recorded_timestamp):
+        log.debug(f"Stale hash record for {path}.")
+        return None
+    return digest
+
+
+def gnw_file_matches(fs: LittleFS, path: Union[str, Path], digest: bytes, trust_record: bool = False) -> bool:
+    """Whether the contents of a remote file have the sha256 ``digest``.
+
+    A hash record that differs is taken at its word; at worst the file is written
+    again needlessly. A matching record can't rule out an in-place rewrite, so the
+    file is read back to confirm it unless ``trust_record``.
+    """
+    recorded = get_gnw_sha256(fs, path)
+    if recorded is not None and recorded != digest:
+        return False
+    if recorded is not None and trust_record:
+        return True
+    return gnw_sha256(fs, path) == digest
@@ -1,20 +1,49 @@
 import importlib.resources
+import io
 import logging
-from collections import namedtuple
-from copy import deepcopy
+import os
+from collections import deque
+from contextlib import ExitStack
+from functools import lru_cache
 from itertools import count
 from math import ceil
-from pathlib import PurePosixPath
+from pathlib import Path, PurePosixPath
 from time import sleep, time
-from typing import Dict, List, Literal, NamedTuple, Optional, Union
+from typing import (
+    BinaryIO,
+    Callable,
+    Deque,
+    Dict,
+    Hashable,
+    Iterable,
+    Iterator,
+    List,
+    Literal,
+    NamedTuple,
+    Optional,
+    Sequence,
+    Union,
+)
 
 from tqdm import tqdm
 
+from gnwmanager.cache import BlockCache
 from gnwmanager.exceptions import DataError
 from gnwmanager.ocdbackend import OCDBackend
-from gnwmanager.status import flashapp_status_enum_to_str
+from gnwmanager.pipeline import CompressionStats, PreparedChunk, iter_chunks, prepare_chunk, prepare_chunks
+from gnwmanager.sdcard import (
+    SD_BATCH_RESULT,
+    SDDirEntry,
+    SDOp,
+    SDOpResult,
+    decode_batch_results,
+    encode_batch_op,
+    parse_scandir_page,
+    raise_for_failures,
+)
+from gnwmanager.status import flashapp_status_enum_to_str, flashapp_status_str_to_enum
 from gnwmanager.time import timestamp_now
-from gnwmanager.utils import EMPTY_HASH_DIGEST, chunk_bytes, compress_lzma, pad_bytes, sha256
+from gnwmanager.utils import EMPTY_HASH_DIGEST, chunk_bytes, pad_bytes, sha256
 from gnwmanager.validation import validate_extflash_offset, validate_intflash_offset
 
 log = logging.getLogger(__name__)
@@ -25,6 +54,102 @@ class Variable(NamedTuple):
     size: int
 
 
+SDWriteSource = Union[BinaryIO, bytes, bytearray, memoryview, os.PathLike]
+
+
+class _SDWrite(NamedTuple):
+    path: str
+    source: SDWriteSource
+    start: Optional[int]  # Position to rewind file objects to; ``None`` for buffers and local paths.
+    size: int
+
+    @classmethod
+    def from_source(cls, path: str, source: SDWriteSource, size: Optional[int] = None) -> "_SDWrite":
+        if path.endswith("/"):
+            raise ValueError(f"path shall not be a folder {path}")
+        if not path.startswith("/"):
+            raise ValueError(f"path shall start with '/' {path}")
+
+        if isinstance(source, os.PathLike):
+            # Opened only while its chunks are being queued, to bound open file handles.
+            start, n_available = None, Path(source).stat().st_size
+        else:
+            try:
+                with memoryview(source) as view:  # pyright: ignore[reportArgumentType]
+                    start, n_available = None, view.nbytes
+            except TypeError:
+                start = source.tell()  # pyright: ignore[reportAttributeAccessIssue]
+                n_available = source.seek(0, io.SEEK_END) - start  # pyright: ignore[reportAttributeAccessIssue]
+                source.seek(start)  # pyright: ignore[reportAttributeAccessIssue]
+        if size is None:
+            size = n_available
+        elif size > n_available:
+            # Caught here rather than mid-transfer, which would leave a truncated file on the SD card.
+            raise ValueError(f"size {size} exceeds the {n_available} bytes available for {path}.")
+        return cls(path, source, start, size)
+
+
+class _Packet(NamedTuple):
+    addr: int
+    data: bytes
+    erase: bool = True  # False if the destination is known to already be erased.
+
+
+@lru_cache(maxsize=8)
+def _erased_hash(size: int) -> bytes:
+    """sha256 of ``size`` bytes of erased (0xFF) flash."""
+    return sha256(b"\xff" * size)
+
+
+def _is_blank(data: bytes) -> bool:
+    return not data.lstrip(b"\xff")
+
+
+def _coalesce_runs(keys: Sequence[Optional[Hashable]], unit: int, max_size: int) -> list[tuple[int, int, Hashable]]:
+    """Group consecutive equal non-``None`` keys into ``(byte_offset, byte_size, key)`` runs.
+
+    Each key represents ``unit`` bytes; runs are split so none exceed ``max_size``.
+    """
+    units_per_run = max(1, max_size // unit)
+    runs = []
+    start = None
+    for i, key in enumerate([*keys, None]):
+        if start is not None and (key != keys[start] or i - start == units_per_run):
+            runs.append((start * unit, (i - start) * unit, keys[start]))
+            start = None
+        if key is not None and start is None:
+            start = i
+    return runs
+
+
+class PollPolicy(NamedTuple):
+    """Schedule for polling the on-device state.
+
+    The first poll waits ``initial`` seconds; every subsequent wait grows by
+    ``factor`` up to ``maximum`` seconds. Short operations are therefore
+    observed within roughly one probe round trip, while long ones (erases,
+    SD syncs) don't flood the probe with reads.
+    """
+
+    initial: float = 0.0005
+    maximum: float = 0.1
+    factor: float = 2.0
+
+    def intervals(self) -> Iterator[float]:
+        interval = self.initial
+        while True:
+            yield interval
+            interval = min(interval * self.factor, self.maximum)
+
+
+class _Snapshot(NamedTuple):
+    """Device state captured by one batched read of the status and context flag words."""
+
+    status: int
+    ready: tuple[int, ...]
+    response_ready: tuple[int, ...]
+
+
 ERROR_MASK = 0xFFFF_0000
 
 # Status strings that indicate the bytes the host wrote to device RAM didn't
@@ -57,13 +182,20 @@ actions: dict[str, int] = {
     "LIST_SD_DIR": 3,
     "DELETE_FILE_FROM_SD": 4,
     "READ_FILE_FROM_SD": 5,
+    "HASH_SD_FILE": 7,
+    "SCAN_SD_DIR": 8,
+    "BATCH_SD": 9,
 }
 
 _comm: dict[str, Variable] = {
     "framebuffer": Variable(0x2400_0000, 320 * 240 * 2),
     "flashapp_comm": Variable(0x2402_5800, 0xC4000),
 }
-_contexts: list[dict[str, Variable]] = [{} for _ in range(2)]
+
+# Context layout used by firmware that doesn't publish ``context_count``.
+_LEGACY_CONTEXT_COUNT = 2
+_LEGACY_CONTEXT_BUFFER_SIZE = 256 << 10
+_MAX_CONTEXT_COUNT = 255  # The device indexes contexts with a uint8_t.
 
 
 def _populate_comm():
@@ -88,35 +220,58 @@ def _populate_comm():
     _comm["retry_request"] = last_variable = Variable(last_variable.address + last_variable.size, 4)
     _comm["retry_ack"] = last_variable = Variable(last_variable.address + last_variable.size, 4)
 
-    for i in range(2):
+    # Context layout published by the device; 0 for firmware predating this (legacy layout).
+    _comm["context_count"] = last_variable = Variable(last_variable.address + last_variable.size, 4)
+    _comm["context_buffer_size"] = last_variable = Variable(last_variable.address + last_variable.size, 4)
+
+    # First command that failed since the host zeroed failed_context_counter.
+    _comm["failed_context_counter"] = last_variable = Variable(last_variable.address + last_variable.size, 4)
+    _comm["failed_status"] = last_variable = Variable(last_variable.address + last_variable.size, 4)
+
+
+_populate_comm()
+
+
+def _build_contexts(n_contexts: int, buffer_size: int) -> list[dict[str, Variable]]:
+    """Addresses of each work context's fields for a given device layout.
+
+    The ``n_contexts`` 1024-byte context structs follow the comm header, then the
+    device's ``active_context``, then ``n_contexts`` buffers of ``buffer_size`` bytes.
+    """
+    contexts: list[dict[str, Variable]] = [{} for _ in range(n_contexts)]
+    for i, context in enumerate(contexts):
         struct_start = _comm["flashapp_comm"].address + ((i + 1) * 1024)
 
-        _contexts[i]["return_buffer_ptr"] = last_variable = Variable(struct_start, 4)
+        context["return_buffer_ptr"] = last_variable = Variable(struct_start, 4)
 
-        _contexts[i]["size"] = last_variable = Variable(last_variable.address + last_variable.size, 4)
-        _contexts[i]["offset"] = last_variable = Variable(last_variable.address + last_variable.size, 4)
-        _contexts[i]["erase"] = last_variable = Variable(last_variable.address + last_variable.size, 4)
-        _contexts[i]["erase_bytes"] = last_variable = Variable(last_variable.address + last_variable.size, 4)
-        _contexts[i]["compressed_size"] = last_variable = Variable(last_variable.address + last_variable.size, 4)
-        _contexts[i]["expected_sha256"] = last_variable = Variable(last_variable.address + last_variable.size, 32)
-        _contexts[i]["bank"] = last_variable = Variable(last_variable.address + last_variable.size, 4)
-        _contexts[i]["action"] = last_variable = Variable(last_variable.address + last_variable.size, 4)
-        _contexts[i]["response_ready"] = last_variable = Variable(last_variable.address + last_variable.size, 4)
-        _contexts[i]["dest_path"] = last_variable = Variable(last_variable.address + last_variable.size, 256)
-        _contexts[i]["block"] = last_variable = Variable(last_variable.address + last_variable.size, 4)
-        _contexts[i]["total_blocks"] = last_variable = Variable(last_variable.address + last_variable.size, 4)
-        _contexts[i]["compressed_sha256"] = last_variable = Variable(last_variable.address + last_variable.size, 32)
+        context["size"] = last_variable = Variable(last_variable.address + last_variable.size, 4)
+        context["offset"] = last_variable = Variable(last_variable.address + last_variable.size, 4)
+        context["erase"] = last_variable = Variable(last_variable.address + last_variable.size, 4)
+        context["erase_bytes"] = last_variable = Variable(last_variable.address + last_variable.size, 4)
+        context["compressed_size"] = last_variable = Variable(last_variable.address + last_variable.size, 4)
+        context["expected_sha256"] = last_variable = Variable(last_variable.address + last_variable.size, 32)
+        context["bank"] = last_variable = Variable(last_variable.address + last_variable.size, 4)
+        context["action"] = last_variable = Variable(last_variable.address + last_variable.size, 4)
+        context["response_ready"] = last_variable = Variable(last_variable.address + last_variable.size, 4)
+        context["dest_path"] = last_variable = Variable(last_variable.address + last_variable.size, 256)
+        context["block"] = last_variable = Variable(last_variable.address + last_variable.size, 4)
+        context["total_blocks"] = last_variable = Variable(last_variable.address + last_variable.size, 4)
+        context["compressed_sha256"] = last_variable = Variable(last_variable.address + last_variable.size, 32)
 
-        _contexts[i]["ready"] = last_variable = Variable(last_variable.address + last_variable.size, 4)
+        context["ready"] = last_variable = Variable(last_variable.address + last_variable.size, 4)
 
-    struct_start = _comm["flashapp_comm"].address + (3 * 1024)
-    _comm["active_context"] = last_variable = Variable(struct_start, 1024)
+    # Skip over the device's active_context.
+    last_variable = Variable(_comm["flashapp_comm"].address + ((n_contexts + 1) * 1024), 1024)
 
-    for i in range(2):
-        _contexts[i]["buffer"] = last_variable = Variable(last_variable.address + last_variable.size, 256 << 10)
+    for context in contexts:
+        context["buffer"] = last_variable = Variable(last_variable.address + last_variable.size, buffer_size)
 
+    # The device's decompress_buffer, another ``buffer_size`` bytes, follows the context buffers.
+    end = last_variable.address + last_variable.size + buffer_size
+    if end > _comm["flashapp_comm"].address + _comm["flashapp_comm"].size:
+        raise DataError(f"Context layout {n_contexts}x {buffer_size}B does not fit in flashapp_comm.")
 
-_populate_comm()
+    return contexts
 
 
 def _round_up(value, mod) -> int:
@@ -144,7 +299,7 @@ class GnW:
 
     def __init__(self, backend: OCDBackend):
         self.backend = backend
-        self.contexts = deepcopy(_contexts)
+        self.contexts = _build_contexts(_LEGACY_CONTEXT_COUNT, _LEGACY_CONTEXT_BUFFER_SIZE)
         self.context_counter = 1
         self._external_flash_size = 0
         self._external_flash_block_size = 0
@@ -155,7 +310,13 @@ class GnW:
         # or a dict with the buffer bytes + hashes the host wrote, plus an
         # `attempts` counter. Populated by program()/sd_write_file_chunk()
         # whenever they push compressed data to a context.
-        self._in_flight_retry: list[Optional[dict]] = [None, None]
+        self._in_flight_retry: list[Optional[dict]] = [None] * len(self.contexts)
+        # Polling schedule used while waiting on the device; see ``PollPolicy``.
+        self.poll_policy = PollPolicy()
+        # External flash blocks read through the LittleFS driver; kept coherent by program()/erase().
+        self.block_cache = BlockCache()
+        # Session-wide compression decisions; lets incompressible streams stop trying.
+        self.compression_stats = CompressionStats()
 
     @property
     def external_flash_size(self) -> int:
@@ -221,7 +382,7 @@ class GnW:
 
         Driven from `_get_status` on BAD_HASH_RAM_COMPRESSED.
         """
-        idx = _contexts.index(context)
+        idx = self.contexts.index(context)
         self._in_flight_retry[idx] = {
             "buffer_data": buffer_data,
             "compressed_sha256": compressed_sha256,
@@ -229,6 +390,23 @@ class GnW:
             "attempts": 0,
         }
 
+    def _write_payload(self, context, chunk: PreparedChunk):
+        """Write a prepared chunk's hashes and (possibly compressed) data into ``context``."""
+        self.write_memory(context["expected_sha256"], chunk.data_hash)
+        if chunk.compressed_data:
+            self.write_uint32(context["compressed_size"], len(chunk.compressed_data))
+            self.write_memory(context["buffer"], chunk.compressed_data)
+            self.write_memory(context["compressed_sha256"], chunk.compressed_hash)
+            self._record_in_flight_compressed(
+                context,
+                buffer_data=chunk.compressed_data,
+                compressed_sha256=chunk.compressed_hash,
+                expected_sha256=chunk.data_hash,
+            )
+        else:
+            self.write_uint32(context["compressed_size"], 0)
+            self.write_memory(context["buffer"], chunk.data)
+
     def _try_chunk_retry(self) -> bool:
         """Re-transmit a corrupted context buffer via the HASH_RETRY_WAIT handshake.
 
@@ -239,37 +417,40 @@ class GnW:
         operation-level retry.
         """
         failed_idx = self.read_uint32("failed_context_idx")
-        if failed_idx not in (0, 1):
+        if failed_idx >= len(self.contexts):
             return False
         saved = self._in_flight_retry[failed_idx]
         if saved is None or saved["attempts"] >= _MAX_CHUNK_RETRIES:
             return False
 
-        context = _contexts[failed_idx]
+        context = self.contexts[failed_idx]
         saved["attempts"] += 1
         log.warning(
             f"BAD_HASH_RAM_COMPRESSED on context {failed_idx}; "
             f"re-transmitting buffer (attempt {saved['attempts']}/{_MAX_CHUNK_RETRIES})."
         )
 
-        self.write_uint32("upload_in_progress", 1)
-        self.write_memory(context["buffer"], saved["buffer_data"])
-        self.write_memory(context["compressed_sha256"], saved["compressed_sha256"])
-        self.write_memory(context["expected_sha256"], saved["expected_sha256"])
+        with self.backend.batch():
+            self.write_uint32("upload_in_progress", 1)
+            self.write_memory(context["buffer"], saved["buffer_data"])
+            self.write_memory(context["compressed_sha256"], saved["compressed_sha256"])
+            self.write_memory(context["expected_sha256"], saved["expected_sha256"])
         self._drain_pending_writes(context)
 
         new_request = self.read_uint32("retry_request") + 1
-        self.write_uint32("retry_request", new_request)
-        self.write_uint32("upload_in_progress", 0)
+        with self.backend.batch():
+            self.write_uint32("retry_request", new_request)
+            self.write_uint32("upload_in_progress", 0)
 
         # Wait for the device to consume retry_request — at that point it has
         # already re-loaded working_context and transitioned back to DECOMPRESSING.
         deadline = time() + 10
+        intervals = self.poll_policy.intervals()
         while self.read_uint32("retry_ack") != new_request:
             if time() > deadline:
                 log.warning(f"Retry ack timeout on context {failed_idx}.")
                 return False
-            sleep(0.01)
+            sleep(next(intervals))
         return True
 
     def _with_transfer_retry(self, op_name: str, fn, *args, **kwargs):
@@ -294,6 +475,74 @@ class GnW:
                 )
                 self.start_gnwmanager(force=True)
 
+    def _read_snapshot(self) -> _Snapshot:
+        """Read the status word and every context's ``ready``/``response_ready`` in one round trip.
+
+        Only these words are read, so a poll stays a handful of small reads
+        rather than a block transfer spanning the context headers.
+        """
+        words = [_comm["status"].address]
+        for context in self.contexts:
+            words.extend((context["ready"].address, context["response_ready"].address))
+        status, *flags = self.backend.read_uint32s(words)
+        return _Snapshot(
+            status=status,
+            ready=tuple(flags[0::2]),
+            response_ready=tuple(flags[1::2]),
+        )
+
+    def _poll(
+        self,
+        done: Callable[[_Snapshot], bool],
+        *,
+        timeout: float,
+        name: str,
+        track_ready: bool = False,
+    ) -> _Snapshot:
+        """Poll device snapshots until ``done`` returns ``True``.
+
+        Polling follows ``self.poll_policy``, restarting from its initial
+        interval whenever progress is observed. Device error statuses are
+        raised (or chunk-retried) via ``_get_status``.
+
+        Parameters
+        ----------
+        done: Callable
+            Predicate evaluated on each snapshot.
+        timeout: float
+            Maximum seconds to wait without observing progress.
+        name: str
+            Caller name for log and error messages.
+        track_ready: bool
+            Also count changes of the contexts' ``ready`` fields as progress;
+            otherwise only status changes count.
+
+        Raises
+        ------
+        TimeoutError
+            If no progress is observed for `timeout` seconds.
+        """
+        t_progress = time()
+        last_progress = None
+        intervals = self.poll_policy.intervals()
+        while True:
+            snapshot = self._read_snapshot()
+            if done(snapshot):
+                return snapshot
+            status_str = self._get_status(status_enum=snapshot.status)
+            progress = (status_str, snapshot.ready) if track_ready else status_str
+            if progress != last_progress:
+                log.debug(f"{name}: status={status_str} ready={[f'0x{r:x}' for r in snapshot.ready]}")
+                t_progress = time()
+                last_progress = progress
+                intervals = self.poll_policy.intervals()
+            if time() - t_progress > timeout:
+                raise TimeoutError(
+                    f"{name}: no progress for {timeout:.1f}s "
+                    f"(ready={[f'0x{r:x}' for r in snapshot.ready]}, status={status_str})"
+                )
+            sleep(next(intervals))
+
     def wait_for_idle(self, timeout: float = 120):
         """Block until the on-device status is IDLE.
 
@@ -315,67 +564,42 @@ class GnW:
         """
         log.debug("Waiting for device to idle.")
         t_start = time()
-        t_progress = t_start
-        last_status = None
-
-        for i in count():
-            status_str = self._get_status()
-            if status_str == "IDLE":
-                break
-            if status_str != last_status:
-                t_progress = time()
-                last_status = status_str
-            if i % 10 == 0:
-                log.debug(f"waiting for device to IDLE; current status: {status_str}")
-            if time() - t_progress > timeout:
-                raise TimeoutError(f"wait_for_idle: no status progress for {timeout:.1f}s (status={status_str})")
-            sleep(0.1)
+        self._poll(
+            lambda snapshot: snapshot.status == flashapp_status_str_to_enum["IDLE"],
+            timeout=timeout,
+            name="wait_for_idle",
+        )
         log.debug(f"Waited {time() - t_start:.3f}s for device idle.")
 
     def wait_for_all_contexts_complete(self, timeout=120):
         """Wait for every in-flight context slot to be acked by the device.
 
-        `timeout` is a *no-progress* budget per context, not a total
-        wall-clock budget: while waiting on a given context the deadline
-        resets every time its `ready` field or the device `status` changes.
-        Slow but advancing operations (e.g. a long FAT sync on a slow SD
-        card) are tolerated indefinitely; only a stall with no observable
-        state change for `timeout` seconds raises.
+        `timeout` is a *no-progress* budget, not a total wall-clock budget:
+        the deadline resets every time any context's `ready` field or the
+        device `status` changes. Slow but advancing operations (e.g. a long
+        FAT sync on a slow SD card) are tolerated indefinitely; only a stall
+        with no observable state change for `timeout` seconds raises.
 
         Parameters
         ----------
         timeout: float
             Maximum seconds to wait without observing any change in the
-            current context's `ready` field or the device status. The same
+            contexts' `ready` fields or the device status. The same
             budget is also passed to the trailing `wait_for_idle` call.
 
         Raises
         ------
         TimeoutError
-            If no progress is observed on a context for `timeout` seconds.
+            If no progress is observed for `timeout` seconds.
         """
         log.debug("Waiting for all contexts to complete.")
         t_start = time()
-        for i, context in enumerate(_contexts):
-            t_progress = time()
-            last_ready = None
-            last_status = None
-            while True:
-                cur_ready = self.read_uint32(context["ready"])
-                if not cur_ready:
-                    break
-                cur_status = self._get_status()
-                if cur_ready != last_ready or cur_status != last_status:
-                    t_progress = time()
-                    last_ready = cur_ready
-                    last_status = cur_status
-                if time() - t_progress > timeout:
-                    raise TimeoutError(
-                        f"wait_for_all_contexts_complete: no progress for {timeout:.1f}s "
-                        f"on context {i} (ready=0x{cur_ready:x}, status={cur_status})"
-                    )
-                sleep(0.1)
-            log.debug(f"Context {i} complete.")
+        self._poll(
+            lambda snapshot: not any(snapshot.ready),
+            timeout=timeout,
+            name="wait_for_all_contexts_complete",
+            track_ready=True,
+        )
         log.debug(f"Waited {time() - t_start:.3f}s for all contexts to complete.")
         self._get_status()
         self.wait_for_idle(timeout=timeout)
@@ -404,29 +628,21 @@ class GnW:
             If the device status does not change for `timeout` seconds
             before `response_ready` becomes non-zero.
         """
-        context_index = _contexts.index(context)
+        context_index = self.contexts.index(context)
         log.debug(f"Waiting on context {context_index} for response.")
         t_start = time()
-        t_progress = t_start
-        last_status = None
-        while not self.read_uint32(context["response_ready"]):
-            cur_status = self._get_status()
-            if cur_status != last_status:
-                t_progress = time()
-                last_status = cur_status
-            if time() - t_progress > timeout:
-                raise TimeoutError(
-                    f"wait_for_context_response: no progress for {timeout:.1f}s "
-                    f"on context {context_index} (status={cur_status})"
-                )
-            sleep(0.1)
+        self._poll(
+            lambda snapshot: bool(snapshot.response_ready[context_index]),
+            timeout=timeout,
+            name=f"wait_for_context_response[{context_index}]",
+        )
         log.debug(f"Waited {time() - t_start:.3f}s for context {context_index} response.")
 
     def reset_context_counter(self):
         self.context_counter = 1
         # Any prior in-flight buffers are gone with the device's RAM; the
         # next program/sd_write_file_chunk will repopulate as needed.
-        self._in_flight_retry = [None, None]
+        self._in_flight_retry = [None] * len(self.contexts)
         log.debug(f"context_counter reset to {self.context_counter}.")
 
     def reset(self):
@@ -441,15 +657,21 @@ class GnW:
         self.reset_context_counter()
         self._gnwmanager_started = False
 
-    def _get_status(self, raise_on_error=True) -> str:
+    def _get_status(self, raise_on_error=True, *, status_enum: Optional[int] = None) -> str:
+        """Return the device status string, raising ``DataError`` on error statuses.
+
+        ``status_enum`` may supply an already-read status word (e.g. from a snapshot).
+        """
         while True:
-            status_enum = self.read_uint32("status")
+            if status_enum is None:
+                status_enum = self.read_uint32("status")
             status_str = flashapp_status_enum_to_str.get(status_enum, "UNKNOWN")
             if raise_on_error and (status_enum & ERROR_MASK) == 0xBAD0_0000:
                 # In-protocol chunk retry: device parks in HASH_RETRY_WAIT and
                 # we resend the corrupted buffer without reloading firmware.
                 # Falls through to the DataError raise once retries are spent.
                 if status_str == "BAD_HASH_RAM_COMPRESSED" and self._try_chunk_retry():
+                    status_enum = None
                     continue
                 if status_str in ("BAD_HASH_RAM", "BAD_HASH_RAM_COMPRESSED", "BAD_HASH_FLASH"):
                     expected_hash = self.read_memory("expected_hash")
@@ -480,34 +702,19 @@ class GnW:
             `timeout` seconds.
         """
         t_start = time()
-        t_progress = t_start
-        last_ready = None
-        last_status = None
-        while True:
-            ready_states = []
-            for i, context in enumerate(_contexts):
-                ready = self.read_uint32(context["ready"])
-                if not ready:
-                    # Slot is free → its prior work succeeded; drop stale
-                    # retry tracking so a future BAD_HASH_RAM_COMPRESSED on
-                    # this slot can't pull data from a finished chunk.
-                    self._in_flight_retry[i] = None
-                    log.debug(f"Got context {i} in {time() - t_start:.3f}s.")
-                    return context
-                ready_states.append(ready)
-            cur_ready = tuple(ready_states)
-            cur_status = self._get_status()
-            if cur_ready != last_ready or cur_status != last_status:
-                t_progress = time()
-                last_ready = cur_ready
-                last_status = cur_status
-            if time() - t_progress > timeout:
-                log.debug(f"Timeout ({timeout}s no-progress) waiting for an available context.")
-                raise TimeoutError(
-                    f"get_context: no progress for {timeout:.1f}s "
-                    f"(ready={[f'0x{r:x}' for r in ready_states]}, status={cur_status})"
-                )
-            sleep(0.1)
+        snapshot = self._poll(
+            lambda snapshot: not all(snapshot.ready),
+            timeout=timeout,
+            name="get_context",
+            track_ready=True,
+        )
+        i = snapshot.ready.index(0)
+        # Slot is free → its prior work succeeded; drop stale retry tracking so
+        # a future BAD_HASH_RAM_COMPRESSED on this slot can't pull data from a
+        # finished chunk.
+        self._in_flight_retry[i] = None
+        log.debug(f"Got context {i} in {time() - t_start:.3f}s.")
+        return self.contexts[i]
 
     def filesystem(self, offset: Optional[int] = None, **kwargs):
         from gnwmanager.filesystem import get_filesystem
@@ -518,10 +725,10 @@ class GnW:
 
         return get_filesystem(self, offset=offset, **kwargs)
 
-    def read_hashes(self, offset, size) -> list[bytes]:
+    def read_hashes(self, offset, size, chunk_size: int = 256 << 10) -> list[bytes]:
         """Blocking call to get the hashes of external flash chunks.
 
-        All chunks are 256KB; the last chunk may be less.
+        All chunks are ``chunk_size``; the last chunk may be less.
 
         Parameters
         ----------
@@ -529,6 +736,8 @@ class GnW:
             Offset into external flash.
         size: int
             Number of bytes to hash.
+        chunk_size: int
+            Number of bytes per hash. Defaults to 256KB.
 
         Returns
         -------
@@ -536,27 +745,38 @@ class GnW:
             List of 32-byte sha256 hashes.
         """
         validate_extflash_offset(offset)
-        n_chunks = int(ceil(size / (256 << 10)))
-        log.debug(f"Hashing {size} bytes starting at {offset} in {n_chunks}x 256KB chunks.")
+        if chunk_size <= 0:
+            raise ValueError("chunk_size must be positive.")
 
-        context = self.get_context()
+        # The device writes all hashes of a request into the context buffer.
+        max_request_size = (self.contexts[0]["buffer"].size // 32) * chunk_size
 
-        self.write_uint32(context["response_ready"], 0)
-        self.write_uint32(context["action"], actions["HASH"])
-        self.write_uint32(context["offset"], offset)
-        self.write_uint32(context["size"], size)
-        self.write_uint32(context["ready"], self.context_counter)
-        self.context_counter += 1
-        log.debug(f"context_counter incremented to {self.context_counter}.")
+        hashes = []
+        for request_offset in range(offset, offset + size, max_request_size):
+            request_size = min(max_request_size, offset + size - request_offset)
+            n_chunks = int(ceil(request_size / chunk_size))
+            log.debug(f"Hashing {request_size} bytes starting at {request_offset} in {n_chunks}x {chunk_size}B chunks.")
 
-        self.wait_for_context_response(context)
+            context = self.get_context()
 
-        hashes = self.read_memory(context["buffer"], n_chunks * 32)
+            with self.backend.batch():
+                self.write_uint32(context["response_ready"], 0)
+                self.write_uint32(context["action"], actions["HASH"])
+                self.write_uint32(context["offset"], request_offset)
+                self.write_uint32(context["size"], request_size)
+                self.write_uint32(context["block"], chunk_size)
+                self.write_uint32(context["ready"], self.context_counter)
+            self.context_counter += 1
+            log.debug(f"context_counter incremented to {self.context_counter}.")
 
-        # Free the context
-        self.write_uint32(context["ready"], 0)
+            self.wait_for_context_response(context)
+
+            hashes.extend(_chunk_bytes(self.read_memory(context["buffer"], n_chunks * 32), 32))
+
+            # Free the context
+            self.write_uint32(context["ready"], 0)
 
-        return _chunk_bytes(hashes, 32)
+        return hashes
 
     def program(
         self,
@@ -566,6 +786,8 @@ class GnW:
         erase: bool = True,
         blocking: bool = True,
         compress: bool = True,
+        *,
+        prepared: Optional[PreparedChunk] = None,
     ) -> None:
         """Low-level write data to flash.
 
@@ -590,6 +812,9 @@ class GnW:
             Defaults to ``True``.
         blocking: bool
             Wait for action to be complete.
+        prepared: Optional[PreparedChunk]
+            Already hashed/compressed ``data`` (see ``prepare_chunk``).
+            Computed here if not provided.
         """
         log.debug(f"gnw.program: {bank=} {offset=} {len(data)=} {erase=} {blocking=} {compress=}")
         if bank not in (0, 1, 2):
@@ -602,61 +827,47 @@ class GnW:
 
         if not data:
             return
-        if len(data) > (256 << 10):
+        if len(data) > self.contexts[0]["buffer"].size:
             raise ValueError("Too large of data for a single write.")
 
-        if compress:
-            compressed_data = compress_lzma(data)
-            # If we are unable to compress meaningfully, don't bother.
-            if len(compressed_data) > (0.9 * len(data)):
-                compress = False
-        else:
-            compressed_data = b""
+        if prepared is None:
+            prepared = prepare_chunk(data, compress and self.compression_stats.should_try())
+            self.compression_stats.record(prepared)
+
+        if bank == 0 and len(self.block_cache):
+            if erase:
+                self.block_cache.erase(offset, _round_up(len(data), self.external_flash_block_size))
+            self.block_cache.program(offset, data)
 
         context = self.get_context()
 
         log.debug("setting upload_in_progress.")
-        self.write_uint32("upload_in_progress", 1)
-
-        self.write_uint32(context["action"], actions["ERASE_AND_FLASH"])
-        self.write_uint32(context["offset"], offset)
-        self.write_uint32(context["size"], len(data))
-        self.write_uint32(context["bank"], bank)
+        with self.backend.batch():
+            self.write_uint32("upload_in_progress", 1)
 
-        if erase:
-            self.write_uint32(context["erase"], 1)  # Perform an erase at `offset`
-            self.write_uint32(context["erase_bytes"], len(data))
-        else:
-            self.write_uint32(context["erase"], 0)
+            self.write_uint32(context["action"], actions["ERASE_AND_FLASH"])
+            self.write_uint32(context["offset"], offset)
+            self.write_uint32(context["size"], len(data))
+            self.write_uint32(context["bank"], bank)
 
-        data_hash = sha256(data)
-        self.write_memory(context["expected_sha256"], data_hash)
+            if erase:
+                self.write_uint32(context["erase"], 1)  # Perform an erase at `offset`
+                self.write_uint32(context["erase_bytes"], len(data))
+            else:
+                self.write_uint32(context["erase"], 0)
 
-        if compress:
-            compressed_hash = sha256(compressed_data)
-            self.write_uint32(context["compressed_size"], len(compressed_data))
-            self.write_memory(context["buffer"], compressed_data)
-            self.write_memory(context["compressed_sha256"], compressed_hash)
-            self._record_in_flight_compressed(
-                context,
-                buffer_data=compressed_data,
-                compressed_sha256=compressed_hash,
-                expected_sha256=data_hash,
-            )
-        else:
-            self.write_uint32(context["compressed_size"], 0)
-            self.write_memory(context["buffer"], data)
+            self._write_payload(context, prepared)
 
         self._drain_pending_writes(context)
 
-        log.debug(f"Activating PROGRAM: {data_hash.hex()}")
-        self.write_uint32(context["ready"], self.context_counter)
+        log.debug(f"Activating PROGRAM: {prepared.data_hash.hex()}")
+        with self.backend.batch():
+            self.write_uint32(context["ready"], self.context_counter)
+            log.debug("clearing upload_in_progress.")
+            self.write_uint32("upload_in_progress", 0)
         self.context_counter += 1
         log.debug(f"context_counter incremented to {self.context_counter}.")
 
-        log.debug("clearing upload_in_progress.")
-        self.write_uint32("upload_in_progress", 0)
-
         if blocking:
             self.wait_for_all_contexts_complete()
 
@@ -667,15 +878,26 @@ class GnW:
         data: bytes,
         progress: bool = False,
         desc: Optional[str] = None,
+        jobs: int = 1,
+        delta: bool = False,
     ):
-        """High level convenience function for flashing any-length data to any flash location."""
+        """High level convenience function for flashing any-length data to any flash location.
+
+        ``jobs`` is the number of worker processes compressing external flash
+        chunks ahead of the transfer (``0`` for one per CPU).
+
+        With ``delta``, external flash is compared per erase-sector rather than
+        per 256KB chunk, and only differing sectors are erased and programmed.
+        """
         op_name = f"flash bank={bank} offset=0x{offset:x}"
         if bank == 0:
             data = pad_bytes(data, self.external_flash_block_size)
             if len(data) > self.external_flash_size:
                 raise ValueError("Data cannot fit into external flash.")
 
-            self._with_transfer_retry(op_name, self._flash_ext, offset, data, progress=progress, desc=desc)
+            self._with_transfer_retry(
+                op_name, self._flash_ext, offset, data, progress=progress, desc=desc, jobs=jobs, delta=delta
+            )
         elif bank in (1, 2):
             data = pad_bytes(data, 8192)
             if len(data) > (256 << 10):
@@ -738,18 +960,25 @@ class GnW:
         else:
             raise NotImplementedError
 
+        if bank == 0:
+            if whole_chip:
+                self.block_cache.clear()
+            elif len(self.block_cache):
+                self.block_cache.erase(offset, _round_up(size, self.external_flash_block_size))
+
         # Perform action
         context = self.get_context()
 
-        self.write_uint32(context["action"], actions["ERASE_AND_FLASH"])
-        self.write_uint32(context["offset"], offset)
-        self.write_uint32(context["size"], 0)  # We are not programming any bytes
-        self.write_uint32(context["erase"], 1)  # Perform an erase at `offset`
-        self.write_uint32(context["erase_bytes"].address, size)  # 0 signals a whole-chip erase.
-        self.write_uint32(context["bank"], bank)
-        self.write_memory(context["expected_sha256"], EMPTY_HASH_DIGEST)
+        with self.backend.batch():
+            self.write_uint32(context["action"], actions["ERASE_AND_FLASH"])
+            self.write_uint32(context["offset"], offset)
+            self.write_uint32(context["size"], 0)  # We are not programming any bytes
+            self.write_uint32(context["erase"], 1)  # Perform an erase at `offset`
+            self.write_uint32(context["erase_bytes"].address, size)  # 0 signals a whole-chip erase.
+            self.write_uint32(context["bank"], bank)
+            self.write_memory(context["expected_sha256"], EMPTY_HASH_DIGEST)
 
-        self.write_uint32(context["ready"], self.context_counter)
+            self.write_uint32(context["ready"], self.context_counter)
         self.context_counter += 1
         log.debug(f"context_counter incremented to {self.context_counter}.")
 
@@ -762,30 +991,76 @@ class GnW:
         data: bytes,
         progress: bool = False,
         desc: Optional[str] = None,
+        jobs: int = 1,
+        delta: bool = False,
     ):
         validate_extflash_offset(offset)
 
-        device_hashes = self.read_hashes(offset, len(data))
-
         chunk_size = self.contexts[0]["buffer"].size  # Assumes all contexts have same size buffer
-        chunks = chunk_bytes(data, chunk_size)
+        sector_size = self.external_flash_block_size
 
-        Packet = namedtuple("Packet", ["addr", "data"])
-        all_packets = [Packet(offset + i * chunk_size, chunk) for i, chunk in enumerate(chunks)]
-        log.info(f"Data chunked into {len(all_packets)} packets.")
-
-        # Remove packets where the hash already matches
-        packets = [
-            packet for packet, device_hash in zip(all_packets, device_hashes) if sha256(packet.data) != device_hash
-        ]
+        if delta and offset % sector_size:
+            log.warning(f"Offset 0x{offset:x} is not sector-aligned; falling back to whole-chunk comparison.")
+            delta = False
 
-        log.info(f"{len(packets)} packets need to be programmed.")
-        for i, packet in enumerate(tqdm(packets, desc=desc) if progress else packets):
+        if delta:
+            packets = self._delta_packets(offset, data, sector_size, chunk_size)
+        else:
+            device_hashes = self.read_hashes(offset, len(data))
+            chunks = chunk_bytes(data, chunk_size)
+            log.info(f"Data chunked into {len(chunks)} packets.")
+
+            # Remove packets where the hash already matches
+            packets = [
+                _Packet(offset + i * chunk_size, chunk, erase=device_hash != _erased_hash(len(chunk)))
+                for i, (chunk, device_hash) in enumerate(zip(chunks, device_hashes))
+                if sha256(chunk) != device_hash
+            ]
+
+        # Blank source data over non-blank flash only needs an erase.
+        erase_packets = [packet for packet in packets if _is_blank(packet.data)]
+        packets = [packet for packet in packets if not _is_blank(packet.data)]
+        for packet in erase_packets:
+            self.erase(0, packet.addr, len(packet.data), blocking=False)
+
+        log.info(
+            f"{len(packets)} packets need to be programmed "
+            f"({sum(not packet.erase for packet in packets)} onto already-erased flash); "
+            f"{len(erase_packets)} only need to be erased."
+        )
+        prepared_packets = zip(
+            packets,
+            prepare_chunks((packet.data for packet in packets), jobs=jobs, stats=self.compression_stats),
+        )
+        for i, (packet, prepared) in enumerate(
+            tqdm(prepared_packets, desc=desc, total=len(packets)) if progress else prepared_packets
+        ):
             log.info(f"Programming packet {i + 1}/{len(packets)}.")
-            self.program(0, packet.addr, packet.data, blocking=False)
+            self.program(0, packet.addr, packet.data, erase=packet.erase, blocking=False, prepared=prepared)
             self.write_uint32("progress", int(26 * (i + 1) / len(packets)))
 
         self.wait_for_all_contexts_complete()
+        log.info(self.compression_stats.summary())
+
+    def _delta_packets(self, offset: int, data: bytes, sector_size: int, chunk_size: int) -> list[_Packet]:
+        """Packets covering only the sectors whose device hash differs from ``data``.
+
+        Contiguous dirty sectors that are all erased (or all not erased) on the
+        device are coalesced into packets of up to ``chunk_size`` bytes.
+        """
+        device_hashes = self.read_hashes(offset, len(data), sector_size)
+        # Per sector: None if clean, otherwise whether it must be erased.
+        needs_erase = [
+            None
+            if sha256(data[i * sector_size : (i + 1) * sector_size]) == device_hash
+            else device_hash != _erased_hash(sector_size)
+            for i, device_hash in enumerate(device_hashes)
+        ]
+        log.info(f"{sum(x is not None for x in needs_erase)}/{len(needs_erase)} sectors differ.")
+        return [
+            _Packet(offset + start, data[start : start + size], erase=bool(erase))
+            for start, size, erase in _coalesce_runs(needs_erase, sector_size, chunk_size)
+        ]
 
     def _sd_write_file_chunk(
         self,
@@ -795,6 +1070,8 @@ class GnW:
         data: bytes = b"",
         blocking: bool = True,
         compress: bool = True,
+        *,
+        prepared: Optional[PreparedChunk] = None,
     ) -> None:
         """Low-level write data to fat filesystem.
 
@@ -808,62 +1085,46 @@ class GnW:
             Number of bytes to write.
         blocking: bool
             Wait for action to be complete.
+        prepared: Optional[PreparedChunk]
+            Already hashed/compressed ``data`` (see ``prepare_chunk``).
+            Computed here if not provided.
         """
         log.debug(f"gnw._sd_write_file_chunk: {path=} {len(data)=} {blocking=} {compress=}")
 
         if not path:
             raise ValueError("Destination SD path cannot be empty.")
 
-        if len(data) > (256 << 10):
+        if len(data) > self.contexts[0]["buffer"].size:
             raise ValueError("Too large of data for a single write.")
 
-        if compress:
-            compressed_data = compress_lzma(data)
-            # If we are unable to compress meaningfully, don't bother.
-            if len(compressed_data) > (0.9 * len(data)):
-                compress = False
-        else:
-            compressed_data = b""
+        if prepared is None:
+            prepared = prepare_chunk(data, compress and self.compression_stats.should_try())
+            self.compression_stats.record(prepared)
 
         context = self.get_context()
 
         log.debug("setting upload_in_progress.")
-        self.write_uint32("upload_in_progress", 1)
-
-        self.write_uint32(context["action"], actions["WRITE_FILE_TO_SD"])
-        self.write_str(context["dest_path"], path)
-        self.write_uint32(context["size"], len(data))
-        self.write_uint32(context["block"], block)
-        self.write_uint32(context["total_blocks"], total_blocks)
-
-        data_hash = sha256(data)
-        self.write_memory(context["expected_sha256"], data_hash)
-
-        if compress:
-            compressed_hash = sha256(compressed_data)
-            self.write_uint32(context["compressed_size"], len(compressed_data))
-            self.write_memory(context["buffer"], compressed_data)
-            self.write_memory(context["compressed_sha256"], compressed_hash)
-            self._record_in_flight_compressed(
-                context,
-                buffer_data=compressed_data,
-                compressed_sha256=compressed_hash,
-                expected_sha256=data_hash,
-            )
-        else:
-            self.write_uint32(context["compressed_size"], 0)
-            self.write_memory(context["buffer"], data)
+        with self.backend.batch():
+            self.write_uint32("upload_in_progress", 1)
+
+            self.write_uint32(context["action"], actions["WRITE_FILE_TO_SD"])
+            self.write_str(context["dest_path"], path)
+            self.write_uint32(context["size"], len(data))
+            self.write_uint32(context["block"], block)
+            self.write_uint32(context["total_blocks"], total_blocks)
+
+            self._write_payload(context, prepared)
 
         self._drain_pending_writes(context)
 
-        log.debug(f"Activating PROGRAM: {data_hash.hex()}")
-        self.write_uint32(context["ready"], self.context_counter)
+        log.debug(f"Activating PROGRAM: {prepared.data_hash.hex()}")
+        with self.backend.batch():
+            self.write_uint32(context["ready"], self.context_counter)
+            log.debug("clearing upload_in_progress.")
+            self.write_uint32("upload_in_progress", 0)
         self.context_counter += 1
         log.debug(f"context_counter incremented to {self.context_counter}.")
 
-        log.debug("clearing upload_in_progress.")
-        self.write_uint32("upload_in_progress", 0)
-
         if blocking:
             self.wait_for_all_contexts_complete()
 
@@ -872,29 +1133,170 @@ class GnW:
         path: str,
         data: bytes,
         progress: bool = False,
+        jobs: int = 1,
     ):
-        if path.endswith("/"):
-            raise ValueError(f"path shall not be a folder {path}")
-        if not path.startswith("/"):
-            raise ValueError(f"path shall start with '/' {path}")
-        self._with_transfer_retry(f"sdpush {path}", self._sd_write_file_impl, path, data, progress)
+        """Write ``data`` to ``path`` on the SD card.
 
-    def _sd_write_file_impl(self, path: str, data: bytes, progress: bool):
-        chunk_size = self.contexts[0]["buffer"].size  # Assumes all contexts have same size buffer
-        chunks = chunk_bytes(data, chunk_size)
+        ``jobs`` is the number of worker processes compressing chunks ahead
+        of the transfer (``0`` for one per CPU).
+        """
+        self.sd_write_stream(path, data, len(data), progress=progress, jobs=jobs)
+
+    def sd_write_stream(
+        self,
+        path: str,
+        source: SDWriteSource,
+        size: Optional[int] = None,
+        progress: bool = False,
+        jobs: int = 1,
+    ):
+        """Write ``size`` bytes from ``source`` to ``path`` on the SD card.
+
+        Data is read, hashed and compressed one context buffer at a time, so
+        host memory use doesn't grow with the file size.
+
+        Parameters
+        ----------
+        path: str
+            Destination path on the SD card.
+        source: SDWriteSource
+            Binary file object (read from its current position), local file
+            path, or any object supporting the buffer protocol, such as an ``mmap``.
+        size: Optional[int]
+            Number of bytes to write. Defaults to the rest of ``source``.
+        progress: bool
+            Display a progress bar.
+        jobs: int
+            Number of worker processes compressing chunks ahead of the
+            transfer (``0`` for one per CPU).
+
+        Raises
+        ------
+        ValueError
+            If ``size`` exceeds the bytes available in ``source``.
+        """
+        write = _SDWrite.from_source(path, source, size)
+        self._with_transfer_retry(f"sdpush {path}", self._sd_write_files_impl, [write], {}, progress, jobs)
+
+    def sd_write_files(
+        self,
+        files: Sequence[tuple[str, SDWriteSource]],
+        progress: bool = False,
+        jobs: int = 1,
+    ) -> list[Optional[DataError]]:
+        """Write several files to the SD card, queueing their chunks back-to-back.
+
+        Unlike calling ``sd_write_stream`` per file, the device queue is only
+        drained once at the very end, so many small files don't each pay for
+        a full round trip.
+
+        A device error only aborts the file it occurred in: the firmware is
+        reloaded and the files after it are still written.
+
+        Parameters
+        ----------
+        files: Sequence[tuple[str, SDWriteSource]]
+            ``(path, source)`` pairs; see ``sd_write_stream`` for ``source``.
+        progress: bool
+            Display a progress bar.
+        jobs: int
+            Number of worker processes compressing chunks ahead of the
+            transfer (``0`` for one per CPU).
+
+        Returns
+        -------
+        list[Optional[DataError]]
+            For each file, ``None`` if it was written or the error that aborted it.
+        """
+        writes = [_SDWrite.from_source(path, source) for path, source in files]
+        errors: list[Optional[DataError]] = [None] * len(writes)
+        first = 0
+        while first < len(writes):
+            owners: dict[int, int] = {}
+            try:
+                self._with_transfer_retry("sdpush", self._sd_write_files_impl, writes[first:], owners, progress, jobs)
+                break
+            except DataError:
+                failed_counter, error = self._failed_command()
+                failed = owners.get(failed_counter)
+                if failed is None:
+                    raise
+                failed += first
+                log.warning(f"Failed to write {writes[failed].path} ({error}); continuing with the remaining files.")
+                errors[failed] = error
+                self.start_gnwmanager(force=True)
+                first = failed + 1
+        return errors
+
+    def _failed_command(self) -> tuple[int, DataError]:
+        """``context_counter`` (0 if none) and error of the first command the device failed.
 
-        log.info(f"Data chunked into {len(chunks)} packets.")
+        The device carries on with queued commands after an error and clears the
+        BAD_* status, so it records the failed command separately until
+        ``failed_context_counter`` is zeroed.
+        """
+        failed_counter = self.read_uint32("failed_context_counter")
+        status = flashapp_status_enum_to_str.get(self.read_uint32("failed_status"), "UNKNOWN")
+        return failed_counter, DataError(status)
 
-        if len(chunks) == 0:
-            log.info("Programming empty file.")
-            self._sd_write_file_chunk(path, 0, 1, blocking=False)
+    def _sd_write_files_impl(
+        self,
+        writes: Sequence["_SDWrite"],
+        owners: dict[int, int],
+        progress: bool,
+        jobs: int = 1,
+    ):
+        """Queue every chunk of ``writes``, then wait for the device to finish.
 
-        for i, packet in enumerate(tqdm(chunks, desc=PurePosixPath(path).name) if progress else chunks):
-            log.info(f"Programming packet {i + 1}/{len(chunks)}.")
-            self._sd_write_file_chunk(path, i, len(chunks), packet, blocking=False)
-            self.write_uint32("progress", int(26 * (i + 1) / len(chunks)))
+        ``owners`` is filled with the index into ``writes`` of each queued ``context_counter``.
+        """
+        chunk_size = self.contexts[0]["buffer"].size  # Assumes all contexts have same size buffer
+        n_chunks_total = sum(max(1, ceil(write.size / chunk_size)) for write in writes)
+        owners.clear()
+        self.write_uint32("failed_context_counter", 0)
+
+        # (index, block, n_blocks) of each chunk handed to ``prepare_chunks``, which
+        # yields them back in order, possibly running a few chunks ahead.
+        queued: Deque[tuple[int, int, int]] = deque()
+
+        def chunks() -> Iterator[Union[bytes, memoryview]]:
+            for index, write in enumerate(writes):
+                n_blocks = int(ceil(write.size / chunk_size))
+                log.info(f"{write.path}: data chunked into {n_blocks} packets.")
+                if n_blocks == 0:
+                    log.info("Programming empty file.")
+                    queued.append((index, 0, 1))
+                    yield b""
+                    continue
+                with ExitStack() as stack:
+                    source = write.source
+                    if isinstance(source, os.PathLike):
+                        source = stack.enter_context(Path(source).open("rb"))
+                    elif write.start is not None:
+                        source.seek(write.start)  # pyright: ignore[reportAttributeAccessIssue]
+                    for block, chunk in enumerate(iter_chunks(source, write.size, chunk_size)):
+                        queued.append((index, block, n_blocks))
+                        yield chunk
+
+        prepared_chunks = prepare_chunks(chunks(), jobs=jobs, stats=self.compression_stats)
+        if progress:
+            desc = PurePosixPath(writes[0].path).name if len(writes) == 1 else f"{len(writes)} files"
+            prepared_chunks = tqdm(prepared_chunks, desc=desc, total=n_chunks_total)
+        for i, prepared in enumerate(prepared_chunks):
+            index, block, n_blocks = queued.popleft()
+            log.info(f"Programming packet {block + 1}/{n_blocks} of {writes[index].path}.")
+            owners[self.context_counter] = index
+            self._sd_write_file_chunk(
+                writes[index].path, block, n_blocks, prepared.data, blocking=False, prepared=prepared
+            )
+            self.write_uint32("progress", int(26 * (i + 1) / n_chunks_total))
 
         self.wait_for_all_contexts_complete()
+        log.info(self.compression_stats.summary())
+        failed_counter, error = self._failed_command()
+        if failed_counter:
+            # The device moved on before the error status was seen.
+            raise error
 
     def _sd_read_file_chunk(
         self,
@@ -905,35 +1307,102 @@ class GnW:
         blocking: bool = True,
     ) -> bytes:
         """Read up to ``max_bytes`` from ``path`` on the SD card starting at ``offset``."""
+        data = self._sd_read_file_collect(self._sd_read_file_submit(path, offset, max_bytes))
+        if blocking:
+            self.wait_for_idle()
+        return data
+
+    def _sd_read_file_submit(self, path: str, offset: int, max_bytes: int):
+        """Queue a read of up to ``max_bytes`` from ``path``; returns the context to collect from."""
         if not path:
             raise ValueError("SD path cannot be empty.")
         if offset < 0:
             raise ValueError("offset must be >= 0")
-        if max_bytes < 0 or max_bytes > (256 << 10):
-            raise ValueError("max_bytes must be in [0, 256 KiB].")
+        if max_bytes < 0 or max_bytes > self.contexts[0]["buffer"].size:
+            raise ValueError(f"max_bytes must be in [0, {self.contexts[0]['buffer'].size}].")
         if max_bytes == 0 and offset != 0:
             raise ValueError("max_bytes==0 (stat) requires offset==0.")
 
         context = self.get_context()
-        self.write_uint32(context["response_ready"], 0)
-        self.write_uint32(context["action"], actions["READ_FILE_FROM_SD"])
-        self.write_str(context["dest_path"], path)
-        self.write_uint32(context["offset"], offset)
-        self.write_uint32(context["size"], max_bytes)
+        with self.backend.batch():
+            self.write_uint32(context["response_ready"], 0)
+            self.write_uint32(context["action"], actions["READ_FILE_FROM_SD"])
+            self.write_str(context["dest_path"], path)
+            self.write_uint32(context["offset"], offset)
+            self.write_uint32(context["size"], max_bytes)
         self._drain_pending_writes(context)
         self.write_uint32(context["ready"], self.context_counter)
         self.context_counter += 1
         log.debug(f"context_counter incremented to {self.context_counter}.")
+        return context
 
+    def _sd_read_file_collect(self, context) -> bytes:
+        """Wait for a read queued by ``_sd_read_file_submit``, fetch its data and free the context."""
         self.wait_for_context_response(context)
         self._get_status()
         nbytes = self.read_uint32(context["size"])
         data = self.read_memory(context["buffer"], nbytes) if nbytes else b""
         self.write_uint32(context["ready"], 0)
-        if blocking:
-            self.wait_for_idle()
         return data
 
+    def sd_iter_file(self, path: str, offset: int = 0, size: Optional[int] = None) -> Iterator[bytes]:
+        """Yield the contents of ``path`` on the SD card in order, one context buffer at a time.
+
+        Reads are queued on every context, so the device reads the next chunks
+        from the SD card while the current one is transferred over the probe.
+
+        Parameters
+        ----------
+        path: str
+            File on the SD card.
+        offset: int
+            Byte offset to start reading from.
+        size: Optional[int]
+            Number of bytes to read. Defaults to the rest of the file.
+        """
+        if path.endswith("/"):
+            raise ValueError(f"path shall not be a directory: {path}")
+        if not path.startswith("/"):
+            raise ValueError(f"path shall start with '/' {path}")
+
+        chunk_size = self.contexts[0]["buffer"].size
+        if size is None:
+            size = max(0, self._sd_file_size(path) - offset)
+        end = offset + size
+
+        request_offsets = deque(range(offset, end, chunk_size))
+        pending = deque()
+
+        def drain():
+            # Let the queued reads finish so their contexts are freed.
+            while pending:
+                self._sd_read_file_collect(pending.popleft())
+
+        try:
+            while request_offsets or pending:
+                while request_offsets and len(pending) < len(self.contexts):
+                    request_offset = request_offsets.popleft()
+                    request_size = min(chunk_size, end - request_offset)
+                    pending.append(self._sd_read_file_submit(path, request_offset, request_size))
+                data = self._sd_read_file_collect(pending.popleft())
+                if not data:
+                    log.warning(f"{path} ended before the expected {size} bytes were read.")
+                    break
+                yield data
+        except GeneratorExit:
+            # The consumer stopped early.
+            drain()
+            raise
+        except BaseException:
+            # Don't let a cleanup failure mask the original error.
+            try:
+                drain()
+            except Exception:
+                log.warning(f"Failed to free queued reads of {path}.", exc_info=True)
+            raise
+        # The file ended early.
+        drain()
+
     def _sd_file_size(self, path: str) -> int:
         """Return the size in bytes of ``path`` on the SD card (FatFs ``f_size``)."""
         if not path.startswith("/"):
@@ -942,11 +1411,12 @@ class GnW:
             raise ValueError(f"path shall not be a directory: {path}")
 
         context = self.get_context()
-        self.write_uint32(context["response_ready"], 0)
-        self.write_uint32(context["action"], actions["READ_FILE_FROM_SD"])
-        self.write_str(context["dest_path"], path)
-        self.write_uint32(context["offset"], 0)
-        self.write_uint32(context["size"], 0)
+        with self.backend.batch():
+            self.write_uint32(context["response_ready"], 0)
+            self.write_uint32(context["action"], actions["READ_FILE_FROM_SD"])
+            self.write_str(context["dest_path"], path)
+            self.write_uint32(context["offset"], 0)
+            self.write_uint32(context["size"], 0)
         self._drain_pending_writes(context)
         self.write_uint32(context["ready"], self.context_counter)
         self.context_counter += 1
@@ -959,35 +1429,45 @@ class GnW:
         self.wait_for_idle()
         return nbytes
 
-    def sd_read_file(self, path: str, progress: bool = False) -> bytes:
-        """Read an entire file from the SD card (chunks of up to 256 KiB)."""
-        if path.endswith("/"):
-            raise ValueError(f"path shall not be a directory: {path}")
-        if not path.startswith("/"):
-            raise ValueError(f"path shall start with '/' {path}")
+    def sd_open(self, path: str) -> io.BufferedReader:
+        """Open a file on the SD card for streaming, seekable reads.
 
-        chunk_size = self.contexts[0]["buffer"].size
-        file_size = self._sd_file_size(path)
-
-        ranges: List[tuple[int, int]] = []
-        o = 0
-        while o < file_size:
-            nb = min(chunk_size, file_size - o)
-            ranges.append((o, nb))
-            o += nb
-        if file_size == 0:
-            ranges = [(0, chunk_size)]
-
-        log.info(f"Data fetched in {len(ranges)} packets.")
-        out = bytearray()
-        for i, (off, nb) in enumerate(tqdm(ranges, desc=PurePosixPath(path).name, disable=not progress)):
-            log.info(f"Reading packet {i + 1}/{len(ranges)}.")
-            chunk = self._sd_read_file_chunk(path, off, nb, blocking=False)
-            out.extend(chunk)
-            self.write_uint32("progress", int(26 * (i + 1) / len(ranges)))
+        Data is fetched on demand, one context buffer at a time.
+        """
+        from gnwmanager.sdcard import SDFileReader
+
+        raw = SDFileReader(self, path)
+        return io.BufferedReader(raw, buffer_size=raw.chunk_size)
+
+    def sd_read_file_to(self, path: str, fileobj: BinaryIO, progress: bool = False) -> int:
+        """Stream a file from the SD card into ``fileobj``.
+
+        Host memory use is bounded by the context buffers; see ``sd_iter_file``.
 
+        Returns
+        -------
+        int
+            Number of bytes written to ``fileobj``.
+        """
+        size = self._sd_file_size(path)
+        n_total = 0
+        with tqdm(total=size, desc=PurePosixPath(path).name, unit="B", unit_scale=True, disable=not progress) as pbar:
+            for chunk in self.sd_iter_file(path, size=size):
+                fileobj.write(chunk)
+                n_total += len(chunk)
+                pbar.update(len(chunk))
+                self.write_uint32("progress", int(26 * n_total / size))
         self.wait_for_all_contexts_complete()
-        return bytes(out)
+        return n_total
+
+    def sd_read_file(self, path: str, progress: bool = False) -> bytes:
+        """Read an entire file from the SD card.
+
+        Prefer ``sd_open`` or ``sd_read_file_to`` for large files.
+        """
+        out = io.BytesIO()
+        self.sd_read_file_to(path, out, progress=progress)
+        return out.getvalue()
 
     def sd_unlink(self, path: str) -> None:
         """Remove a file from the SD card (FatFs ``f_unlink``)."""
@@ -997,9 +1477,10 @@ class GnW:
             raise ValueError(f"path shall be a file, not a directory: {path}")
 
         context = self.get_context()
-        self.write_uint32(context["response_ready"], 0)
-        self.write_uint32(context["action"], actions["DELETE_FILE_FROM_SD"])
-        self.write_str(context["dest_path"], path)
+        with self.backend.batch():
+            self.write_uint32(context["response_ready"], 0)
+            self.write_uint32(context["action"], actions["DELETE_FILE_FROM_SD"])
+            self.write_str(context["dest_path"], path)
         self._drain_pending_writes(context)
         self.write_uint32(context["ready"], self.context_counter)
         self.context_counter += 1
@@ -1010,15 +1491,89 @@ class GnW:
         self.write_uint32(context["ready"], 0)
         self.wait_for_idle()
 
+    def sd_hash_file(self, path: str, offset: int = 0, size: int = 0) -> bytes:
+        """sha256 of a file (or range of it) on the SD card, computed on-device.
+
+        Parameters
+        ----------
+        path: str
+            File on the SD card.
+        offset: int
+            Byte offset to start hashing from.
+        size: int
+            Number of bytes to hash. ``0`` hashes until the end of the file.
+
+        Returns
+        -------
+        bytes
+            32-byte sha256 digest.
+        """
+        if not path.startswith("/"):
+            raise ValueError(f"path shall start with '/' {path}")
+        if path.endswith("/"):
+            raise ValueError(f"path shall not be a directory: {path}")
+        if offset < 0 or size < 0:
+            raise ValueError("offset and size must be >= 0")
+
+        context = self.get_context()
+        with self.backend.batch():
+            self.write_uint32(context["response_ready"], 0)
+            self.write_uint32(context["action"], actions["HASH_SD_FILE"])
+            self.write_str(context["dest_path"], path)
+            self.write_uint32(context["offset"], offset)
+            self.write_uint32(context["size"], size)
+        self._drain_pending_writes(context)
+        self.write_uint32(context["ready"], self.context_counter)
+        self.context_counter += 1
+        log.debug(f"context_counter incremented to {self.context_counter}.")
+
+        self.wait_for_context_response(context)
+        status_enum = self.read_uint32("status")
+        digest = self.read_memory(context["buffer"], 32)
+        # Free the context before surfacing an error, so a missing file doesn't wedge the session.
+        self.write_uint32(context["ready"], 0)
+        if (status_enum & ERROR_MASK) == 0xBAD0_0000:
+            self._get_status(status_enum=status_enum)
+        self.wait_for_idle()
+        return digest
+
+    def sd_mkdir(self, path: str, parents: bool = False) -> None:
+        """Create a directory on the SD card (FatFs ``f_mkdir``).
+
+        Existing directories are not an error, but a file of the same name is.
+        With ``parents``, missing parent directories are created too.
+        """
+        if not path.startswith("/"):
+            raise ValueError(f"path shall start with '/' {path}")
+        pure_path = PurePosixPath(path)
+        paths = [*reversed(list(pure_path.parents)[:-1]), pure_path] if parents else [pure_path]
+
+        results = self.sd_batch(SDOp("mkdir", str(directory)) for directory in paths)
+        raise_for_failures(results, "BAD_SD_MKDIR", allowed=["FR_EXIST"])
+
+        # FR_EXIST is also reported when a file has the directory's name.
+        existing = [result.op.path for result in results if result.error == "FR_EXIST"]
+        results = self.sd_batch(SDOp("stat", existing_path) for existing_path in existing)
+        raise_for_failures(results, "BAD_SD_MKDIR")
+        conflicts = [result.op.path for result in results if result.entry is not None and not result.entry.is_dir]
+        for conflict in conflicts:
+            log.error(f"mkdir {conflict}: a file with that name already exists")
+        if conflicts:
+            raise DataError("BAD_SD_MKDIR")
+
     def sd_list_dir(self, path: str) -> str:
-        """Return a newline-separated listing of ``path`` on the SD card."""
+        """Return a newline-separated listing of ``path`` on the SD card.
+
+        The listing is capped at one context buffer; prefer ``sd_scandir``.
+        """
         if not path.startswith("/"):
             raise ValueError(f"path shall start with '/' {path}")
 
         context = self.get_context()
-        self.write_uint32(context["response_ready"], 0)
-        self.write_uint32(context["action"], actions["LIST_SD_DIR"])
-        self.write_str(context["dest_path"], path)
+        with self.backend.batch():
+            self.write_uint32(context["response_ready"], 0)
+            self.write_uint32(context["action"], actions["LIST_SD_DIR"])
+            self.write_str(context["dest_path"], path)
         self._drain_pending_writes(context)
         self.write_uint32(context["ready"], self.context_counter)
         self.context_counter += 1
@@ -1036,6 +1591,102 @@ class GnW:
             log.warning("SD directory listing was truncated (output larger than 256 KiB).")
         return data.decode("utf-8", errors="replace")
 
+    def _sd_scandir_page(self, path: str, cursor: int) -> tuple[bytes, int]:
+        """Fetch one page of a binary directory listing; returns ``(data, next_cursor)``."""
+        context = self.get_context()
+        with self.backend.batch():
+            self.write_uint32(context["response_ready"], 0)
+            self.write_uint32(context["action"], actions["SCAN_SD_DIR"])
+            self.write_str(context["dest_path"], path)
+            self.write_uint32(context["offset"], cursor)
+        self._drain_pending_writes(context)
+        self.write_uint32(context["ready"], self.context_counter)
+        self.context_counter += 1
+        log.debug(f"context_counter incremented to {self.context_counter}.")
+
+        self.wait_for_context_response(context)
+        status_enum = self.read_uint32("status")
+        nbytes = self.read_uint32(context["size"])
+        next_cursor = self.read_uint32(context["offset"])
+        data = self.read_memory(context["buffer"], nbytes) if nbytes else b""
+        self.write_uint32(context["ready"], 0)
+        self.wait_for_idle()
+        if (status_enum & ERROR_MASK) == 0xBAD0_0000:
+            self._get_status(status_enum=status_enum)
+        return data, next_cursor
+
+    def sd_scandir(self, path: str) -> Iterator[SDDirEntry]:
+        """Iterate over the entries of directory ``path`` on the SD card.
+
+        Unlike ``sd_list_dir``, entries carry their size, modification time and
+        type, and the listing is paged so directories of any size are returned
+        in full. ``.`` and ``..`` are not included.
+        """
+        if not path.startswith("/"):
+            raise ValueError(f"path shall start with '/' {path}")
+
+        cursor = 0
+        while True:
+            data, cursor = self._sd_scandir_page(path, cursor)
+            yield from parse_scandir_page(data)
+            if not cursor:
+                return
+
+    def _sd_batch_page(self, ops: Sequence[SDOp], request: bytes) -> list[SDOpResult]:
+        results_offset = _round_up(len(request), 4)
+        context = self.get_context()
+        with self.backend.batch():
+            self.write_uint32(context["response_ready"], 0)
+            self.write_uint32(context["action"], actions["BATCH_SD"])
+            self.write_uint32(context["size"], len(request))
+            self.write_uint32(context["block"], len(ops))
+            self.write_uint32(context["offset"], results_offset)
+            self.write_memory(context["buffer"], request)
+        self._drain_pending_writes(context)
+        self.write_uint32(context["ready"], self.context_counter)
+        self.context_counter += 1
+        log.debug(f"context_counter incremented to {self.context_counter}.")
+
+        self.wait_for_context_response(context)
+        status_enum = self.read_uint32("status")
+        data = self.read_memory(context["buffer"].address + results_offset, len(ops) * SD_BATCH_RESULT.size)
+        self.write_uint32(context["ready"], 0)
+        self.wait_for_idle()
+        if (status_enum & ERROR_MASK) == 0xBAD0_0000:
+            self._get_status(status_enum=status_enum)
+        return decode_batch_results(ops, data)
+
+    def sd_batch(self, ops: Iterable[SDOp]) -> list[SDOpResult]:
+        """Run many unlink/mkdir/stat/rename operations with few device round trips.
+
+        Operations are packed into as few context buffers as they fit in and run
+        in order. Individual failures don't stop the batch; check each result.
+
+        Parameters
+        ----------
+        ops: Iterable[SDOp]
+            Operations to perform.
+
+        Returns
+        -------
+        list[SDOpResult]
+            One result per operation, in the same order.
+        """
+        buffer_size = self.contexts[0]["buffer"].size
+        results = []
+        page_ops, page_request = [], bytearray()
+        for op in ops:
+            encoded = encode_batch_op(op)
+            needed = _round_up(len(page_request) + len(encoded), 4) + (len(page_ops) + 1) * SD_BATCH_RESULT.size
+            if page_ops and needed > buffer_size:
+                results.extend(self._sd_batch_page(page_ops, bytes(page_request)))
+                page_ops, page_request = [], bytearray()
+            page_ops.append(op)
+            page_request.extend(encoded)
+        if page_ops:
+            results.extend(self._sd_batch_page(page_ops, bytes(page_request)))
+        return results
+
     def start_gnwmanager(self, force=False, resume=True):
         if not force and self._gnwmanager_started:
             return
@@ -1062,6 +1713,7 @@ class GnW:
         if resume:
             self.backend.resume()
             self.wait_for_idle()
+            self._negotiate_contexts()
 
             # Time has to be set **after** device is in an idle state
             log.debug("Setting device time.")
@@ -1069,6 +1721,17 @@ class GnW:
 
         self._gnwmanager_started = True
 
+    def _negotiate_contexts(self):
+        """Adopt the context layout published by the running firmware."""
+        n_contexts, buffer_size = self.read_uint32("context_count"), self.read_uint32("context_buffer_size")
+        if n_contexts == 0 or buffer_size == 0:
+            n_contexts, buffer_size = _LEGACY_CONTEXT_COUNT, _LEGACY_CONTEXT_BUFFER_SIZE
+        if not 1 <= n_contexts <= _MAX_CONTEXT_COUNT or buffer_size % 4:
+            raise DataError(f"Unsupported device context layout {n_contexts}x {buffer_size}B.")
+        log.debug(f"Device has {n_contexts}x {buffer_size}B contexts.")
+        self.contexts = _build_contexts(n_contexts, buffer_size)
+        self._in_flight_retry = [None] * n_contexts
+
     def is_locked(self) -> bool:
         """Returns ``True`` if the device is locked."""
         try:
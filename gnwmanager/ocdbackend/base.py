@@ -1,4 +1,6 @@
 from abc import abstractmethod
+from collections.abc import Sequence
+from contextlib import contextmanager
 from typing import Tuple
 
 from autoregistry import Registry
@@ -27,10 +29,26 @@ class OCDBackend(Registry, suffix="Backend"):
     def close(self):
         """Close device connection."""
 
+    @contextmanager
+    def batch(self):
+        """Group memory writes so the backend may submit them together.
+
+        Reads issued inside a batch always observe previously issued writes.
+        Backends without a pipelined transport perform each write immediately.
+        """
+        yield self
+
     def read_uint32(self, addr: int):
         """Reads a uint32 from addr."""
         return int.from_bytes(self.read_memory(addr, 4), byteorder="little")
 
+    def read_uint32s(self, addrs: Sequence[int]) -> list[int]:
+        """Reads a uint32 from each address in addrs.
+
+        Backends with a pipelined transport may submit all reads in one round trip.
+        """
+        return [self.read_uint32(addr) for addr in addrs]
+
     def write_uint32(self, addr: int, val: int):
         """Writes a uint32 to addr."""
         return self.write_memory(addr, val.to_bytes(length=4, byteorder="little"))
@@ -4,14 +4,15 @@ import os
 import re
 import shutil
 import socket
+import struct
 import subprocess
 import tempfile
 from collections import deque
-from collections.abc import Generator
+from collections.abc import Generator, Sequence
 from pathlib import Path
 from threading import Thread
 from time import sleep, time
-from typing import Deque, List, Tuple
+from typing import Deque, List, Literal, Optional, Tuple
 
 from gnwmanager.exceptions import DataError, DebugProbeConnectionError, MissingThirdPartyError
 from gnwmanager.ocdbackend.base import OCDBackend, TransferErrors
@@ -23,6 +24,15 @@ _COMMAND_TOKEN_STR = "\x1a"
 _COMMAND_TOKEN_BYTES = _COMMAND_TOKEN_STR.encode("utf-8")
 _BUFFER_SIZE = 4096
 
+# Large transfers either go through a scratch file (``dump_image``/``load_image``)
+# or are streamed directly over the TCL socket as ``read_memory``/``write_memory``
+# word lists. Each TCL command moves at most ``_TCL_TRANSFER_CHUNK`` bytes so a
+# single command line stays a reasonable size for OpenOCD's TCL server.
+TransferMode = Literal["file", "tcl"]
+_TRANSFER_MODES = ("file", "tcl")
+_TCL_TRANSFER_CHUNK = 16 << 10
+_TCL_MIN_VERSION = (0, 12, 0)  # read_memory/write_memory were added in OpenOCD 0.12.0
+
 
 class OpenOCDError(DebugProbeConnectionError):
     pass
@@ -178,20 +188,82 @@ def _convert_hex_str_to_bytes(hex_str: bytes) -> bytes:
         raise ValueError(f"Error decoding expected hex response: {hex_str}") from None
 
 
+def _target_lost_error(addr: int) -> "OpenOCDError":
+    return OpenOCDError(
+        f"OpenOCD lost contact with the target while reading 0x{addr:08X}. "
+        "The CPU likely entered low-power/standby and could not be halted — "
+        "try releasing the Game & Watch power button at the same time as running this command."
+    )
+
+
 def _parse_md_response(res: str, addr: int, width: str) -> int:
     """Parse a `mdw`/`mdb` response, raising a helpful error if the target was lost."""
     if not res:
-        raise OpenOCDError(
-            f"OpenOCD lost contact with the target while reading 0x{addr:08X}. "
-            "The CPU likely entered low-power/standby and could not be halted — "
-            "try releasing the Game & Watch power button at the same time as running this command."
-        )
+        raise _target_lost_error(addr)
     try:
         return int(res.split(": ")[-1], 16)
     except ValueError:
         raise DataError(f'Unable to parse read_{width} response: "{res}"') from None
 
 
+def _split_aligned(addr: int, size: int) -> list[tuple[int, int, int]]:
+    """Split a memory range into ``(addr, width, count)`` segments.
+
+    The word-aligned body is a single 32-bit segment; only the unaligned
+    leading/trailing bytes are 8-bit segments.
+    """
+    segments = []
+    head = min((-addr) % 4, size)
+    if head:
+        segments.append((addr, 8, head))
+    addr, size = addr + head, size - head
+    n_words = size // 4
+    if n_words:
+        segments.append((addr, 32, n_words))
+    tail = size - (n_words * 4)
+    if tail:
+        segments.append((addr + n_words * 4, 8, tail))
+    return segments
+
+
+def _parse_md_block_response(res: str, addr: int, width: int, count: int) -> bytes:
+    """Parse a multi-line ``mdw``/``mdb`` response (``ADDR: VAL VAL ...`` per line)."""
+    if not res:
+        raise _target_lost_error(addr)
+    try:
+        values = [int(x, 16) for line in res.splitlines() if ": " in line for x in line.split(": ", 1)[1].split()]
+    except ValueError:
+        raise DataError(f'Unable to parse md response: "{res}"') from None
+    if len(values) != count:
+        raise DataError(f"Expected {count} values at 0x{addr:08X}, parsed {len(values)}.")
+    return struct.pack(f"<{count}{'I' if width == 32 else 'B'}", *values)
+
+
+def _decode_tcl_values(res: bytes, addr: int, width: int, count: int) -> bytes:
+    """Decode a ``read_memory`` TCL list of hex values into little-endian bytes."""
+    try:
+        values = [int(x, 16) for x in res.split()]
+    except ValueError:
+        msg = res.decode(errors="replace")
+        raise OpenOCDError(f"Error reading {count}x{width}-bit values at 0x{addr:08X}: {msg}") from None
+    if len(values) != count:
+        raise OpenOCDError(f"Failed to read {count}x{width}-bit values at 0x{addr:08X}. Received {len(values)} values.")
+    return struct.pack(f"<{count}{'I' if width == 32 else 'B'}", *values)
+
+
+def _encode_tcl_values(data: bytes, width: int) -> str:
+    """Encode little-endian bytes as a TCL list of hex values for ``write_memory``."""
+    values = struct.unpack(f"<{len(data) * 8 // width}{'I' if width == 32 else 'B'}", data)
+    return " ".join(f"0x{v:x}" for v in values)
+
+
+def _check_write_response(cmd: str, res: bytes):
+    """Write commands (``mww``, ``write_memory``, ...) respond with nothing on success."""
+    if res.strip():
+        summary = cmd if len(cmd) <= 64 else f"{cmd[:64]}..."
+        raise OpenOCDError(f'Command "{summary}" failed: {res.decode(errors="replace").strip()}')
+
+
 def find_openocd_executable() -> Path:
     openocd_executable = os.environ.get("OPENOCD", "openocd")
     if shutil.which(openocd_executable) is None:
@@ -219,14 +291,44 @@ def _get_openocd_version() -> tuple[int, int, int]:
 class OpenOCDBackend(OCDBackend):
     _socket: socket.socket
 
-    def __init__(self, connect_mode="attach", port=6666):
+    def __init__(self, connect_mode="attach", port=6666, transfer_mode: Optional[TransferMode] = None):
+        """Create an OpenOCD backend.
+
+        Parameters
+        ----------
+        transfer_mode: Optional[str]
+            How blocks larger than 64 bytes are transferred.
+            ``"file"`` goes through a scratch file with ``dump_image``/``load_image``;
+            ``"tcl"`` streams the data over the TCL socket with ``read_memory``/``write_memory``.
+            Blocks of at most 64 bytes use ``read_memory``/``write_memory`` in ``"tcl"`` mode,
+            and ``mdw``/``mww`` otherwise.
+            Defaults to the ``GNWMANAGER_OPENOCD_TRANSFER`` environment variable, otherwise
+            ``"file"``. Compare both with ``gnwmanager debug transfer``.
+        """
         super().__init__()
         self._address = ("localhost", port)
         self._openocd_process = None
         self._stderr_buffer: Deque[str] = deque(maxlen=1000)
         self._stderr_thread = None
+        self._rx_buffer = bytearray()
+        self._batch_depth = 0
+        self._pending: list[str] = []
         self.version = _get_openocd_version()
 
+        self.transfer_mode = transfer_mode or os.environ.get("GNWMANAGER_OPENOCD_TRANSFER", "").lower() or "file"
+
+    @property
+    def transfer_mode(self) -> str:
+        return self._transfer_mode
+
+    @transfer_mode.setter
+    def transfer_mode(self, mode: str):
+        if mode not in _TRANSFER_MODES:
+            raise ValueError(f"Unknown transfer mode {mode!r}; must be one of {_TRANSFER_MODES}.")
+        if mode == "tcl" and not self._has_tcl_memory_commands:
+            raise ValueError(f"TCL transfers require OpenOCD >= {'.'.join(str(x) for x in _TCL_MIN_VERSION)}.")
+        self._transfer_mode = mode
+
     def open(self) -> OCDBackend:
         # In-case there's a previous openocd process still running.
         kill_processes_by_name("openocd")
@@ -281,10 +383,22 @@ class OpenOCDBackend(OCDBackend):
         return "\n".join(self._stderr_buffer)
 
     def __call__(self, cmd: str, *, decode=True) -> bytes:
-        """Invoke an OpenOCD command."""
+        """Invoke an OpenOCD command.
+
+        Any writes queued by an open :meth:`batch` are submitted first so that
+        this command observes them.
+        """
+        self._flush()
+        response = self._transact([cmd])[0]
+        if decode:
+            response = _convert_hex_str_to_bytes(response)
+        return response
+
+    def _transact(self, cmds: list[str]) -> list[bytes]:
+        """Send ``cmds`` back-to-back, then collect one raw response per command."""
         try:
-            self._socket.send(cmd.encode("utf-8") + _COMMAND_TOKEN_BYTES)
-            return self._receive_response(decode=decode)
+            self._socket.sendall(b"".join(cmd.encode("utf-8") + _COMMAND_TOKEN_BYTES for cmd in cmds))
+            return [self._receive_response() for _ in cmds]
         except (BrokenPipeError, ConnectionResetError) as e:
             assert self._openocd_process is not None
             err = self._collect_stderr()
@@ -296,42 +410,136 @@ class OpenOCDBackend(OCDBackend):
             else:
                 raise DebugProbeConnectionError from e
 
-    def _receive_response(self, *, decode=True) -> bytes:
-        responses = []
-
-        while True:
+    def _receive_response(self) -> bytes:
+        # Responses to pipelined commands may share a single recv(), so keep any
+        # bytes past the first command token around for the next response.
+        while _COMMAND_TOKEN_BYTES not in self._rx_buffer:
             single_response = self._socket.recv(_BUFFER_SIZE)
-
-            if single_response:
-                responses.append(single_response)
-            else:
+            if not single_response:
                 # An empty response means that the client has disconnected.
-                response = b"".join(responses)
-                raise DebugProbeConnectionError(f"Disconnected from openocd. Response so far: {response}")
-
-            if _COMMAND_TOKEN_BYTES in responses[-1]:
-                # Strip trailing command token.
-                responses[-1] = responses[-1][:-1]
-                break
+                raise DebugProbeConnectionError(f"Disconnected from openocd. Response so far: {bytes(self._rx_buffer)}")
+            self._rx_buffer += single_response
 
-        response = b"".join(responses)
-        if decode:
-            response = _convert_hex_str_to_bytes(response)
+        response, _, remaining = bytes(self._rx_buffer).partition(_COMMAND_TOKEN_BYTES)
+        self._rx_buffer = bytearray(remaining)
         return response
 
+    @contextlib.contextmanager
+    def batch(self):
+        """Queue memory writes and submit them back-to-back on exit.
+
+        All queued commands are sent in one socket write and their responses are
+        collected afterwards, so a batch costs roughly one round trip instead of
+        one per write. Any other command (e.g. a read) issued inside the batch
+        first submits the queued writes. Batches may be nested; the queue is
+        submitted when the outermost batch exits.
+        """
+        self._batch_depth += 1
+        try:
+            yield self
+        except BaseException:
+            if self._batch_depth == 1:
+                self._pending.clear()
+            raise
+        finally:
+            self._batch_depth -= 1
+        if self._batch_depth == 0:
+            self._flush()
+
+    def _flush(self):
+        """Submit all queued writes, attributing any failure to its command."""
+        if not self._pending:
+            return
+        cmds, self._pending = self._pending, []
+        log.debug(f"Submitting {len(cmds)} batched commands.")
+        for cmd, res in zip(cmds, self._transact(cmds)):
+            _check_write_response(cmd, res)
+
+    def _write(self, cmd: str):
+        """Invoke a write command that produces no output; queued while a batch is open."""
+        if self._batch_depth:
+            self._pending.append(cmd)
+        else:
+            _check_write_response(cmd, self(cmd, decode=False))
+
     def read_uint32(self, addr: int) -> int:
         """Reads a uint32 from addr."""
         res = self(f"mdw 0x{addr:08X}", decode=False).strip().decode()
         return _parse_md_response(res, addr, "uint32")
 
+    def read_uint32s(self, addrs: Sequence[int]) -> list[int]:
+        """Reads a uint32 from each address in addrs with one pipelined ``mdw`` per word."""
+        self._flush()
+        responses = self._transact([f"mdw 0x{addr:08X}" for addr in addrs])
+        return [_parse_md_response(res.strip().decode(), addr, "uint32") for addr, res in zip(addrs, responses)]
+
     def read_uint8(self, addr: int) -> int:
         res = self(f"mdb 0x{addr:08X}", decode=False).strip().decode()
         return _parse_md_response(res, addr, "uint8")
 
+    @property
+    def _has_tcl_memory_commands(self) -> bool:
+        return self.version >= _TCL_MIN_VERSION
+
+    def _tcl_read_memory(self, addr: int, size: int) -> bytes:
+        """Read a block of memory as ``read_memory`` TCL lists over the socket."""
+        out = bytearray()
+        for seg_addr, width, count in _split_aligned(addr, size):
+            max_count = _TCL_TRANSFER_CHUNK * 8 // width
+            for i in range(0, count, max_count):
+                chunk_addr = seg_addr + i * width // 8
+                chunk_count = min(max_count, count - i)
+                res = self(f"read_memory 0x{chunk_addr:08X} {width} {chunk_count}", decode=False)
+                out += _decode_tcl_values(res, chunk_addr, width, chunk_count)
+        return bytes(out)
+
+    def _tcl_write_memory(self, addr: int, data: bytes):
+        """Write a block of memory as ``write_memory`` TCL lists over the socket."""
+        offset = 0
+        for seg_addr, width, count in _split_aligned(addr, len(data)):
+            max_count = _TCL_TRANSFER_CHUNK * 8 // width
+            for i in range(0, count, max_count):
+                chunk_addr = seg_addr + i * width // 8
+                chunk_size = min(max_count, count - i) * width // 8
+                values = _encode_tcl_values(data[offset : offset + chunk_size], width)
+                self._write(f"write_memory 0x{chunk_addr:08X} {width} {{{values}}}")
+                offset += chunk_size
+
+    def _small_read_memory(self, addr: int, size: int) -> bytes:
+        """Read a small block with one command per aligned segment (at most 3)."""
+        if self.transfer_mode == "tcl":
+            return self._tcl_read_memory(addr, size)
+
+        out = bytearray()
+        for seg_addr, width, count in _split_aligned(addr, size):
+            cmd = "mdw" if width == 32 else "mdb"
+            res = self(f"{cmd} 0x{seg_addr:08X} {count}", decode=False).strip().decode()
+            out += _parse_md_block_response(res, seg_addr, width, count)
+        return bytes(out)
+
+    def _small_write_memory(self, addr: int, data: bytes):
+        """Write a small block; whole words are written with ``mww``, only unaligned edges with ``mwb``."""
+        if self.transfer_mode == "tcl":
+            self._tcl_write_memory(addr, data)
+            return
+
+        offset = 0
+        for seg_addr, width, count in _split_aligned(addr, len(data)):
+            for i in range(count):
+                if width == 32:
+                    val = int.from_bytes(data[offset : offset + 4], byteorder="little")
+                    self._write(f"mww 0x{seg_addr + 4 * i:08x} 0x{val:08x}")
+                    offset += 4
+                else:
+                    self._write(f"mwb 0x{seg_addr + i:08x} 0x{data[offset]:02X}")
+                    offset += 1
+
     def read_memory(self, addr: int, size: int) -> bytes:
         """Reads a block of memory."""
         if size <= 64:
-            return bytes(self.read_uint8(addr + offset) for offset in range(size))
+            return self._small_read_memory(addr, size)
+        elif self.transfer_mode == "tcl":
+            return self._tcl_read_memory(addr, size)
         else:
             with tempfile.TemporaryDirectory(dir=_ramdisk if _ramdisk.exists() else None) as temp_dir:
                 temp_file = Path(temp_dir) / "scratch.bin"
@@ -344,13 +552,14 @@ class OpenOCDBackend(OCDBackend):
 
     def write_uint32(self, addr: int, val: int):
         """Writes a uint32 to addr."""
-        self(f"mww 0x{addr:08x} 0x{val:08x}")
+        self._write(f"mww 0x{addr:08x} 0x{val:08x}")
 
     def write_memory(self, addr: int, data: bytes):
         """Writes a block of memory."""
         if len(data) <= 64:
-            for i, b in enumerate(data):
-                self(f"mwb 0x{addr + i:08x} 0x{b:02X}")
+            self._small_write_memory(addr, data)
+        elif self.transfer_mode == "tcl":
+            self._tcl_write_memory(addr, data)
         else:
             # For some reason, this doesn't handle small (single?) bytes well.
             with tempfile.TemporaryDirectory(dir=_ramdisk if _ramdisk.exists() else None) as temp_dir:
@@ -0,0 +1,260 @@
+"""Host-side preparation (hashing, compression) of data chunks before they are sent to the device."""
+
+import logging
+import os
+import zlib
+from collections import deque
+from collections.abc import Iterable, Iterator
+from concurrent.futures import Future, ProcessPoolExecutor
+from itertools import chain, islice
+from typing import BinaryIO, Deque, NamedTuple, Optional, Union
+
+from gnwmanager.utils import compress_lzma, sha256
+
+log = logging.getLogger(__name__)
+
+# LZMA output is only used if it is at most this fraction of the input.
+_MAX_COMPRESSED_RATIO = 0.9
+
+# A zlib level-1 trial on a few samples is ~100x cheaper than LZMA preset 6.
+# LZMA reliably beats it, so only chunks where zlib saves (almost) nothing are
+# skipped.
+_ESTIMATE_SAMPLE_SIZE = 4096
+_ESTIMATE_N_SAMPLES = 4
+_ESTIMATE_SKIP_RATIO = 0.97
+
+
+class PreparedChunk(NamedTuple):
+    data: bytes  # The input chunk as given, possibly a ``memoryview``.
+    data_hash: bytes
+    compressed_data: bytes  # Empty if the chunk is sent uncompressed.
+    compressed_hash: bytes
+    estimated_ratio: Optional[float] = None  # zlib trial ratio; None if not estimated.
+    lzma_ratio: Optional[float] = None  # LZMA ratio; None if LZMA wasn't run.
+
+
+def estimate_compressibility(data: bytes) -> float:
+    """Cheaply estimate how well ``data`` compresses.
+
+    Returns the zlib level-1 compression ratio (compressed/original) of a few
+    evenly spaced samples; values near (or above) 1.0 indicate incompressible
+    data.
+    """
+    if not data:
+        return 1.0
+    sample_size, n_samples = _ESTIMATE_SAMPLE_SIZE, _ESTIMATE_N_SAMPLES
+    if len(data) <= sample_size * n_samples:
+        sample = data
+    else:
+        stride = (len(data) - sample_size) // (n_samples - 1)
+        sample = b"".join(data[i * stride : i * stride + sample_size] for i in range(n_samples))
+    return len(zlib.compress(sample, 1)) / len(sample)
+
+
+def prepare_chunk(data: bytes, compress: bool = True) -> PreparedChunk:
+    """Hash and (optionally) LZMA-compress a chunk.
+
+    LZMA is skipped if ``estimate_compressibility`` predicts it won't help;
+    its output is discarded if it doesn't save at least 10%.
+
+    ``data`` is not copied; the returned ``PreparedChunk.data`` is the same
+    object, so a ``memoryview`` from ``iter_chunks`` stays valid only until
+    the next chunk is read.
+    """
+    compressed_data = b""
+    estimated_ratio = lzma_ratio = None
+    if compress and data:
+        estimated_ratio = estimate_compressibility(data)
+        if estimated_ratio < _ESTIMATE_SKIP_RATIO:
+            compressed_data = compress_lzma(data)
+            lzma_ratio = len(compressed_data) / len(data)
+            # If we are unable to compress meaningfully, don't bother.
+            if lzma_ratio > _MAX_COMPRESSED_RATIO:
+                compressed_data = b""
+    return PreparedChunk(
+        data=data,
+        data_hash=sha256(data),
+        compressed_data=compressed_data,
+        compressed_hash=sha256(compressed_data) if compressed_data else b"",
+        estimated_ratio=estimated_ratio,
+        lzma_ratio=lzma_ratio,
+    )
+
+
+class CompressionStats:
+    """Per-session record of compression decisions.
+
+    After ``give_up_after`` consecutive chunks that didn't compress, further
+    chunks are sent uncompressed without even running the estimator; every
+    ``reprobe_interval``-th chunk is still tried so the session notices when
+    the data becomes compressible again.
+    """
+
+    def __init__(self, give_up_after: int = 8, reprobe_interval: int = 16):
+        self.give_up_after = give_up_after
+        self.reprobe_interval = reprobe_interval
+        self.reset()
+
+    def reset(self):
+        self.n_chunks = 0
+        self.n_skipped_session = 0  # Not attempted due to session history.
+        self.n_skipped_estimate = 0  # Not attempted due to the estimator.
+        self.n_lzma = 0  # LZMA ran.
+        self.n_compressed = 0  # LZMA output was used.
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self._n_incompressible_streak = 0
+        self._n_since_probe = 0
+
+    def should_try(self) -> bool:
+        """Whether the next chunk should attempt compression at all."""
+        if self._n_incompressible_streak < self.give_up_after:
+            return True
+        self._n_since_probe += 1
+        if self._n_since_probe >= self.reprobe_interval:
+            self._n_since_probe = 0
+            return True
+        return False
+
+    def record(self, chunk: PreparedChunk):
+        self.n_chunks += 1
+        self.bytes_in += len(chunk.data)
+        self.bytes_out += len(chunk.compressed_data or chunk.data)
+
+        if chunk.estimated_ratio is None:
+            if chunk.data:
+                self.n_skipped_session += 1
+            decision = "not attempted"
+        elif chunk.lzma_ratio is None:
+            self.n_skipped_estimate += 1
+            decision = "skipped by estimator"
+        else:
+            self.n_lzma += 1
+            if chunk.compressed_data:
+                self.n_compressed += 1
+                decision = "compressed"
+            else:
+                decision = "lzma discarded"
+
+        if chunk.estimated_ratio is not None:
+            if chunk.compressed_data:
+                self._n_incompressible_streak = 0
+                self._n_since_probe = 0
+            else:
+                self._n_incompressible_streak += 1
+
+        estimate_str = "-" if chunk.estimated_ratio is None else f"{chunk.estimated_ratio:.3f}"
+        lzma_str = "-" if chunk.lzma_ratio is None else f"{chunk.lzma_ratio:.3f}"
+        log.debug(f"Chunk {self.n_chunks} ({len(chunk.data)}B): estimate={estimate_str} lzma={lzma_str} -> {decision}.")
+
+    def summary(self) -> str:
+        ratio = self.bytes_out / self.bytes_in if self.bytes_in else 1.0
+        return (
+            f"Compression: {self.n_chunks} chunks, {self.bytes_in}B -> {self.bytes_out}B ({ratio:.3f}); "
+            f"{self.n_compressed} compressed, {self.n_lzma - self.n_compressed} lzma discarded, "
+            f"{self.n_skipped_estimate} skipped by estimator, {self.n_skipped_session} skipped by session history."
+        )
+
+
+def iter_chunks(
+    source: Union[BinaryIO, bytes, bytearray, memoryview], size: int, chunk_size: int
+) -> Iterator[memoryview]:
+    """Yield ``size`` bytes of ``source`` in ``chunk_size`` pieces without intermediate copies.
+
+    Objects supporting the buffer protocol (``bytes``, ``mmap``, ...) are sliced
+    through a ``memoryview``. Anything else is treated as a binary file and
+    read from its current position into a single reusable buffer, so each
+    yielded view is only valid until the next one is requested.
+    """
+    try:
+        view = memoryview(source).cast("B")  # pyright: ignore[reportArgumentType]
+    except TypeError:
+        pass
+    else:
+        if len(view) < size:
+            raise EOFError(f"Source has {len(view)} bytes; expected {size}.")
+        for offset in range(0, size, chunk_size):
+            yield view[offset : min(offset + chunk_size, size)]
+        return
+
+    fileobj: BinaryIO = source  # pyright: ignore[reportAssignmentType]
+    buffer = memoryview(bytearray(min(chunk_size, size)))
+    for offset in range(0, size, chunk_size):
+        chunk = buffer[: min(chunk_size, size - offset)]
+        n_read = 0
+        while n_read < len(chunk):
+            n = fileobj.readinto(chunk[n_read:])
+            if not n:
+                raise EOFError(f"Source ended after {offset + n_read} bytes; expected {size}.")
+            n_read += n
+        yield chunk
+
+
+def resolve_jobs(jobs: int) -> int:
+    """Number of worker processes; ``0`` means one per CPU."""
+    if jobs < 0:
+        raise ValueError("jobs must be >= 0.")
+    return jobs or os.cpu_count() or 1
+
+
+def prepare_chunks(
+    chunks: Iterable[bytes],
+    compress: bool = True,
+    jobs: int = 1,
+    stats: Optional[CompressionStats] = None,
+) -> Iterator[PreparedChunk]:
+    """Prepare ``chunks`` in order, running ahead of the consumer in a process pool.
+
+    With ``jobs > 1``, up to ``2 * jobs`` chunks are hashed/compressed ahead of
+    the one being consumed, so CPU-bound compression overlaps with the
+    consumer's probe I/O. Memory is bounded by that lookahead. Inputs of fewer
+    than ``2 * jobs`` chunks are prepared inline, since starting the workers
+    would cost more than it saves.
+
+    Parameters
+    ----------
+    chunks: Iterable[bytes]
+        Data chunks; consumed lazily.
+    compress: bool
+        Attempt LZMA compression of each chunk.
+    jobs: int
+        Number of worker processes. ``1`` prepares chunks inline in the
+        calling process; ``0`` uses one worker per CPU.
+    stats: Optional[CompressionStats]
+        Consulted before each chunk is submitted and updated as chunks are yielded.
+    """
+    jobs = resolve_jobs(jobs)
+
+    def should_compress() -> bool:
+        return compress and (stats is None or stats.should_try())
+
+    def record(chunk: PreparedChunk) -> PreparedChunk:
+        if stats is not None:
+            stats.record(chunk)
+        return chunk
+
+    lookahead = 2 * jobs
+    if jobs > 1:
+        chunks = iter(chunks)
+        head = [bytes(chunk) for chunk in islice(chunks, lookahead)]  # Chunks may share one buffer.
+        if len(head) < lookahead:
+            jobs = 1
+        chunks = chain(head, chunks)
+
+    if jobs == 1:
+        for chunk in chunks:
+            yield record(prepare_chunk(chunk, should_compress()))
+        return
+
+    log.debug(f"Preparing chunks with {jobs} workers.")
+    executor = ProcessPoolExecutor(max_workers=jobs)
+    pending: Deque[Future] = deque()
+    try:
+        for chunk in chunks:
+            pending.append(executor.submit(prepare_chunk, bytes(chunk), should_compress()))
+            if len(pending) >= lookahead:
+                yield record(pending.popleft().result())
+        while pending:
+            yield record(pending.popleft().result())
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
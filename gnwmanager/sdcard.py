@@ -0,0 +1,311 @@
+import fnmatch
+import io
+import logging
+import struct
+from datetime import datetime
+from pathlib import PurePosixPath
+from typing import TYPE_CHECKING, Literal, NamedTuple, Optional, Sequence
+
+from gnwmanager.exceptions import DataError
+
+if TYPE_CHECKING:
+    from gnwmanager.gnw import GnW
+
+log = logging.getLogger(__name__)
+
+
+_AM_DIR = 0x10  # FatFs directory attribute.
+_SCANDIR_HEADER = struct.Struct("<QHHBxH")  # size, fdate, ftime, fattrib, name_len
+
+
+class SDDirEntry(NamedTuple):
+    name: str
+    size: int
+    mtime: Optional[datetime]  # ``None`` if the card holds no valid timestamp.
+    is_dir: bool
+
+
+def _fat_datetime(fdate: int, ftime: int) -> Optional[datetime]:
+    try:
+        return datetime(
+            1980 + (fdate >> 9),
+            (fdate >> 5) & 0xF,
+            fdate & 0x1F,
+            ftime >> 11,
+            (ftime >> 5) & 0x3F,
+            (ftime & 0x1F) * 2,
+        )
+    except ValueError:
+        return None
+
+
+def parse_scandir_page(data: bytes) -> list[SDDirEntry]:
+    """Decode one page of the device's binary ``SCAN_SD_DIR`` listing."""
+    entries = []
+    offset = 0
+    while offset < len(data):
+        if offset + _SCANDIR_HEADER.size > len(data):
+            raise DataError("Truncated SD directory entry header.")
+        size, fdate, ftime, fattrib, name_len = _SCANDIR_HEADER.unpack_from(data, offset)
+        offset += _SCANDIR_HEADER.size
+        if offset + name_len > len(data):
+            raise DataError("Truncated SD directory entry name.")
+        name = data[offset : offset + name_len].decode("utf-8", errors="replace")
+        offset += name_len
+        entries.append(SDDirEntry(name, size, _fat_datetime(fdate, ftime), bool(fattrib & _AM_DIR)))
+    return entries
+
+
+# FatFs ``FRESULT`` codes, as returned per-operation by the batch action.
+FRESULT_NAMES = [
+    "FR_OK",
+    "FR_DISK_ERR",
+    "FR_INT_ERR",
+    "FR_NOT_READY",
+    "FR_NO_FILE",
+    "FR_NO_PATH",
+    "FR_INVALID_NAME",
+    "FR_DENIED",
+    "FR_EXIST",
+    "FR_INVALID_OBJECT",
+    "FR_WRITE_PROTECTED",
+    "FR_INVALID_DRIVE",
+    "FR_NOT_ENABLED",
+    "FR_NO_FILESYSTEM",
+    "FR_MKFS_ABORTED",
+    "FR_TIMEOUT",
+    "FR_LOCKED",
+    "FR_NOT_ENOUGH_CORE",
+    "FR_TOO_MANY_OPEN_FILES",
+    "FR_INVALID_PARAMETER",
+]
+
+_SD_BATCH_OPS = {"unlink": 0, "mkdir": 1, "stat": 2, "rename": 3}
+_SD_BATCH_REQUEST_HEADER = struct.Struct("<BxHH")  # op, path_len, dest_len
+SD_BATCH_RESULT = struct.Struct("<IQHHB3x")  # fresult, size, fdate, ftime, fattrib
+
+
+class SDOp(NamedTuple):
+    op: Literal["unlink", "mkdir", "stat", "rename"]
+    path: str
+    dest: str = ""  # Only used by "rename".
+
+
+class SDOpResult(NamedTuple):
+    op: SDOp
+    fresult: int  # FatFs ``FRESULT``; 0 on success.
+    entry: Optional["SDDirEntry"] = None  # Only set by a successful "stat".
+
+    @property
+    def ok(self) -> bool:
+        return self.fresult == 0
+
+    @property
+    def error(self) -> str:
+        return FRESULT_NAMES[self.fresult] if self.fresult < len(FRESULT_NAMES) else f"FRESULT {self.fresult}"
+
+
+def encode_batch_op(op: SDOp) -> bytes:
+    """Pack one operation into the device's ``BATCH_SD`` request format."""
+    if op.op not in _SD_BATCH_OPS:
+        raise ValueError(f"Unknown SD operation {op.op!r}.")
+    for p in (op.path, op.dest) if op.op == "rename" else (op.path,):
+        if not p.startswith("/"):
+            raise ValueError(f"path shall start with '/' {p}")
+    path = op.path.encode()
+    dest = op.dest.encode() if op.op == "rename" else b""
+    if len(path) > 255 or len(dest) > 255:
+        raise ValueError(f"SD paths are limited to 255 bytes: {op.path}")
+    return _SD_BATCH_REQUEST_HEADER.pack(_SD_BATCH_OPS[op.op], len(path), len(dest)) + path + dest
+
+
+def decode_batch_results(ops: Sequence[SDOp], data: bytes) -> list[SDOpResult]:
+    """Pair each operation with its entry in the device's result array."""
+    results = []
+    for op, (fresult, size, fdate, ftime, fattrib) in zip(ops, SD_BATCH_RESULT.iter_unpack(data)):
+        entry = None
+        if op.op == "stat" and fresult == 0:
+            entry = SDDirEntry(PurePosixPath(op.path).name, size, _fat_datetime(fdate, ftime), bool(fattrib & _AM_DIR))
+        results.append(SDOpResult(op, fresult, entry))
+    return results
+
+
+def raise_for_failures(results: Sequence[SDOpResult], status: str, allowed: Sequence[str] = ()):
+    """Log every failed operation and raise ``DataError(status)`` if there were any."""
+    failures = [result for result in results if not result.ok and result.error not in allowed]
+    for result in failures:
+        log.error(f"{result.op.op} {result.op.path}: {result.error}")
+    if failures:
+        raise DataError(status)
+
+
+class SDTree(NamedTuple):
+    """Files and directories under a root, keyed by POSIX path relative to that root."""
+
+    files: dict[str, int]  # Relative path -> size in bytes.
+    dirs: set[str]
+
+
+class SyncPlan(NamedTuple):
+    mkdirs: list[str]  # Parents before children.
+    push: list[str]
+    skip: list[str]
+    delete: list[str]  # Files first, then directories (children before parents).
+
+
+def join_path(root: str, relative: str) -> str:
+    return str(PurePosixPath(root) / relative) if relative else root
+
+
+def walk_sd(gnw: "GnW", root: str) -> Optional[SDTree]:
+    """Recursively list ``root`` on the SD card.
+
+    Returns ``None`` if ``root`` doesn't exist.
+    """
+    files, dirs = {}, set()
+    stack = [""]
+    while stack:
+        relative = stack.pop()
+        try:
+            for entry in gnw.sd_scandir(join_path(root, relative)):
+                child = str(PurePosixPath(relative) / entry.name)
+                if entry.is_dir:
+                    dirs.add(child)
+                    stack.append(child)
+                else:
+                    files[child] = entry.size
+        except DataError as e:
+            if relative == "" and e.args == ("BAD_SD_DIR",):
+                return None
+            raise
+    return SDTree(files, dirs)
+
+
+def expand_sd_glob(gnw: "GnW", pattern: str) -> list[str]:
+    """Expand shell-style wildcards in the last component of ``pattern``.
+
+    Patterns without wildcards are returned as-is, whether they exist or not.
+    """
+    pure_path = PurePosixPath(pattern)
+    if not any(c in pure_path.name for c in "*?["):
+        return [pattern]
+    parent = str(pure_path.parent)
+    return sorted(
+        join_path(parent, entry.name)
+        for entry in gnw.sd_scandir(parent)
+        if fnmatch.fnmatchcase(entry.name, pure_path.name)
+    )
+
+
+def sd_sha256(gnw: "GnW", path: str) -> Optional[bytes]:
+    """On-device sha256 of ``path`` on the SD card; ``None`` if it doesn't exist."""
+    try:
+        return gnw.sd_hash_file(path)
+    except DataError as e:
+        if e.args == ("BAD_SD_OPEN",):
+            return None
+        raise
+
+
+def verify_sd_file(gnw: "GnW", path: str, expected: bytes):
+    """Raise ``DataError`` if ``path`` on the SD card doesn't hash to ``expected``."""
+    if gnw.sd_hash_file(path) != expected:
+        raise DataError(f"BAD_SD_VERIFY: {path}")
+
+
+def plan_sync(local: SDTree, remote: Optional[SDTree], delete: bool = False) -> SyncPlan:
+    """Decide which files to transfer to make ``remote`` mirror ``local``.
+
+    Files are considered unchanged if they exist remotely with the same size.
+    """
+    if remote is None:
+        remote = SDTree({}, set())
+
+    mkdirs = sorted(local.dirs - remote.dirs)
+    push, skip = [], []
+    for path, size in sorted(local.files.items()):
+        (skip if remote.files.get(path) == size else push).append(path)
+
+    to_delete = []
+    if delete:
+        to_delete.extend(sorted(remote.files.keys() - local.files.keys()))
+        to_delete.extend(sorted(remote.dirs - local.dirs, reverse=True))
+
+    return SyncPlan(mkdirs=mkdirs, push=push, skip=skip, delete=to_delete)
+
+
+class SDFileReader(io.RawIOBase):
+    """Read-only, seekable view of a file on the SD card.
+
+    Data is fetched on demand, at most one context buffer per device request,
+    so arbitrarily large files can be read with bounded host memory.
+    """
+
+    def __init__(self, gnw: "GnW", path: str, size: Optional[int] = None):
+        super().__init__()
+        if not path.startswith("/"):
+            raise ValueError(f"path shall start with '/' {path}")
+        if path.endswith("/"):
+            raise ValueError(f"path shall not be a directory: {path}")
+
+        self.gnw = gnw
+        self.path = path
+        self.size = gnw._sd_file_size(path) if size is None else size
+        self._pos = 0
+        self._dirty = False  # Whether any device request was issued.
+
+    @property
+    def chunk_size(self) -> int:
+        return self.gnw.contexts[0]["buffer"].size
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        self._checkClosed()
+        return self._pos
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        self._checkClosed()
+        if whence == io.SEEK_SET:
+            pos = offset
+        elif whence == io.SEEK_CUR:
+            pos = self._pos + offset
+        elif whence == io.SEEK_END:
+            pos = self.size + offset
+        else:
+            raise ValueError(f"Invalid whence {whence}.")
+        if pos < 0:
+            raise ValueError(f"Negative seek position {pos}.")
+        self._pos = pos
+        return pos
+
+    def readinto(self, buffer) -> int:
+        self._checkClosed()
+        n_bytes = min(len(buffer), self.size - self._pos, self.chunk_size)
+        if n_bytes <= 0:
+            return 0
+        data = self.gnw._sd_read_file_chunk(self.path, self._pos, n_bytes, blocking=False)
+        self._dirty = True
+        if len(data) < n_bytes:
+            log.warning(f"Short read of {self.path} at {self._pos}: expected {n_bytes} bytes, got {len(data)}.")
+        with memoryview(buffer) as view:
+            view[: len(data)] = data
+        self._pos += len(data)
+        return len(data)
+
+    def readall(self) -> bytes:
+        # The default implementation reads in ``io.DEFAULT_BUFFER_SIZE`` increments;
+        # read whole context buffers instead.
+        out = bytearray()
+        while chunk := self.read(self.chunk_size):
+            out.extend(chunk)
+        return bytes(out)
+
+    def close(self):
+        if not self.closed and self._dirty:
+            self.gnw.wait_for_all_contexts_complete()
+        super().close()
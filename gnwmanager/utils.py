@@ -1,9 +1,11 @@
 import hashlib
 import lzma
 import os
+import re
 import struct
 from contextlib import suppress
 from enum import Enum
+from pathlib import Path
 
 import psutil
 from PIL import Image
@@ -25,6 +27,30 @@ def colored(color: Color, text: str) -> str:
     return f"\033[{color.value}m{text}\033[{Color.NONE.value}m"
 
 
+_ignore_patterns = [
+    r"\.DS_Store",  # macOS folder settings
+    r"Thumbs\.db",  # Windows thumbnail cache
+    r"\.Spotlight-V100",  # macOS indexing file
+    r"\.Trashes",  # macOS trash directory
+    r"ehthumbs\.db",  # Windows Media Center Thumbs
+    r"ehthumbs_vista\.db",  # Alternate Windows Media Center Thumbs
+    r"[Dd]esktop\.ini",  # Windows desktop layout
+    r"\$RECYCLE\.BIN/",  # Windows recycle bin
+    r"\.Trash-.*",  # Linux trash directory
+    r"\.fuse_hidden.*",  # Hidden files created by FUSE
+    r"\.directory",  # KDE directory settings
+    r"\.nfs.*",  # Network File System related file
+]
+
+# Compile the regular expressions
+ignore_regexes = [re.compile(pattern) for pattern in _ignore_patterns]
+
+
+def should_ignore(file_name) -> bool:
+    """Whether a local file is OS/desktop clutter that shouldn't be copied to the device."""
+    return any(regex.search(file_name) for regex in ignore_regexes)
+
+
 def sha256(data) -> bytes:
     return hashlib.sha256(data).digest()
 
@@ -32,6 +58,15 @@ def sha256(data) -> bytes:
 EMPTY_HASH_DIGEST = sha256(b"")
 
 
+def sha256_file(path, chunk_size: int = 1 << 20) -> bytes:
+    """sha256 of a file's contents, read ``chunk_size`` bytes at a time."""
+    hasher = hashlib.sha256()
+    with Path(path).open("rb") as f:
+        while chunk := f.read(chunk_size):
+            hasher.update(chunk)
+    return hasher.digest()
+
+
 def compress_lzma(data) -> bytes:
     compressed_data = lzma.compress(
         data,
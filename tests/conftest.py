@@ -0,0 +1,63 @@
+import pytest
+
+from gnwmanager.gnw import GnW, _comm
+from gnwmanager.ocdbackend import OCDBackend
+
+
+class FakeBackend(OCDBackend):
+    """In-memory stand-in for a debug probe; only models the gnwmanager comm region."""
+
+    def __init__(self):
+        super().__init__()
+        self.base = _comm["flashapp_comm"].address
+        self.memory = bytearray(_comm["flashapp_comm"].size)
+        self.n_reads = 0
+        self.n_bytes_read = 0
+
+    def read_memory(self, addr: int, size: int) -> bytes:
+        self.n_reads += 1
+        self.n_bytes_read += size
+        offset = addr - self.base
+        return bytes(self.memory[offset : offset + size])
+
+    def write_memory(self, addr: int, data: bytes):
+        offset = addr - self.base
+        self.memory[offset : offset + len(data)] = data
+
+    def read_register(self, name: str) -> int:
+        raise NotImplementedError
+
+    def write_register(self, name: str, val: int):
+        raise NotImplementedError
+
+    def set_frequency(self, freq: int):
+        pass
+
+    def reset(self):
+        pass
+
+    def halt(self):
+        pass
+
+    def reset_and_halt(self):
+        pass
+
+    def resume(self):
+        pass
+
+    def start_gdbserver(self, port, logging=True, blocking=True):
+        raise NotImplementedError
+
+    @property
+    def probe_name(self) -> str:
+        return "fake"
+
+
+@pytest.fixture
+def backend():
+    return FakeBackend()
+
+
+@pytest.fixture
+def gnw(backend):
+    return GnW(backend)
@@ -0,0 +1,229 @@
+import os
+from types import SimpleNamespace
+
+import pytest
+from littlefs import LittleFS, LittleFSError
+
+from gnwmanager.cache import BlockCache
+from gnwmanager.filesystem import LfsDriverContext, flash_filesystem_image, get_filesystem_image
+from gnwmanager.gnw import _build_contexts
+
+
+def test_block_cache_lru_eviction():
+    cache = BlockCache(max_bytes=3 * 16)
+    for i in range(3):
+        cache.put(i * 16, bytes([i]) * 16)
+    assert cache.get(0) == bytes(16)  # Now most-recently used.
+    cache.put(48, b"\x03" * 16)
+    assert 16 not in cache
+    assert 0 in cache
+    assert cache.nbytes == 48
+    assert (cache.hits, cache.evictions) == (1, 1)
+    assert cache.get(16) is None
+    assert cache.misses == 1
+
+
+def test_block_cache_disabled():
+    cache = BlockCache(max_bytes=0)
+    cache.put(0, b"data")
+    assert len(cache) == 0
+    with pytest.raises(ValueError):
+        BlockCache(max_bytes=-1)
+
+
+def test_block_cache_program_and_erase():
+    cache = BlockCache()
+    cache.put(0, b"\xff" * 8)
+    cache.put(8, b"\xff" * 8)
+    cache.program(6, b"\x0f\xf0\x00\x12")
+    assert cache.get(0) == b"\xff" * 6 + b"\x0f\xf0"
+    assert cache.get(8) == b"\x00\x12" + b"\xff" * 6
+
+    # NOR programming only clears bits.
+    cache.program(0, b"\xf0")
+    assert cache.get(0)[0] == 0xF0
+
+    cache.erase(0, 12)
+    assert cache.get(0) == b"\xff" * 8
+    assert 8 not in cache  # Partially covered; dropped.
+
+
+class _FakeFlashGnW:
+    def __init__(self, flash):
+        self.flash = bytearray(flash)
+        self.block_cache = BlockCache()
+        self.contexts = _build_contexts(2, 256 << 10)
+        self.reads = []
+        self.programs = []
+
+    def wait_for_all_contexts_complete(self):
+        pass
+
+    def read_memory(self, addr, size):
+        offset = addr - 0x9000_0000
+        self.reads.append((offset, size))
+        return bytes(self.flash[offset : offset + size])
+
+    def program(self, bank, offset, data, erase=True, blocking=True):
+        assert bank == 0
+        assert offset % 4096 == 0
+        self.programs.append((offset, len(data), erase, blocking))
+        if erase:
+            self.flash[offset : offset + len(data)] = b"\xff" * len(data)
+        for i, byte in enumerate(data):
+            self.flash[offset + i] &= byte
+
+
+def test_lfs_driver_reads_whole_blocks():
+    block_size = 4096
+    flash = bytes(range(256)) * (4 * block_size // 256)
+    gnw = _FakeFlashGnW(flash)
+    driver = LfsDriverContext(gnw, len(flash))  # pyright: ignore[reportArgumentType]
+    cfg = SimpleNamespace(block_size=block_size)
+
+    # Block 0 is the last block of the filesystem.
+    block_start = len(flash) - block_size
+    assert driver.read(cfg, 0, 0, 16) == flash[block_start : block_start + 16]  # pyright: ignore[reportArgumentType]
+    # A later read at a higher offset of the same block is served from the cache, untruncated.
+    assert driver.read(cfg, 0, 100, 32) == flash[block_start + 100 : block_start + 132]  # pyright: ignore[reportArgumentType]
+    assert gnw.reads == [(block_start, block_size)]
+    assert (gnw.block_cache.hits, gnw.block_cache.misses) == (1, 1)
+
+
+def test_lfs_driver_readahead_sequential():
+    block_size = 4096
+    n_blocks = 32
+    flash = bytes(i // block_size % 251 for i in range(n_blocks * block_size))
+    gnw = _FakeFlashGnW(flash)
+    driver = LfsDriverContext(gnw, len(flash), readahead=8 * block_size)  # pyright: ignore[reportArgumentType]
+    cfg = SimpleNamespace(block_size=block_size, block_count=n_blocks)
+
+    for block in range(n_blocks):
+        start = len(flash) - (block + 1) * block_size
+        assert driver.read(cfg, block, 0, block_size) == flash[start : start + block_size]  # pyright: ignore[reportArgumentType]
+
+    # Window grows 1, 2, 4, 8 blocks and then stays capped at the read-ahead size.
+    assert [size // block_size for _, size in gnw.reads] == [1, 2, 4, 8, 8, 8, 1]
+    # Each read-ahead is a single read spanning decreasing flash addresses.
+    assert gnw.reads[1] == (len(flash) - 3 * block_size, 2 * block_size)
+
+
+def test_lfs_driver_readahead_random_access():
+    block_size = 4096
+    flash = bytes(16 * block_size)
+    gnw = _FakeFlashGnW(flash)
+    driver = LfsDriverContext(gnw, len(flash))  # pyright: ignore[reportArgumentType]
+    cfg = SimpleNamespace(block_size=block_size, block_count=16)
+
+    for block in (3, 9, 1, 12, 6):
+        driver.read(cfg, block, 0, 16)  # pyright: ignore[reportArgumentType]
+    assert all(size == block_size for _, size in gnw.reads)
+
+
+def test_lfs_driver_write_back():
+    block_size = 4096
+    flash = bytes(8 * block_size)
+    gnw = _FakeFlashGnW(flash)
+    driver = LfsDriverContext(gnw, len(flash))  # pyright: ignore[reportArgumentType]
+    cfg = SimpleNamespace(block_size=block_size, prog_size=block_size, block_count=8)
+
+    # Erase + program blocks 1-3, and program block 6 in place.
+    for block in (2, 1, 3):
+        driver.erase(cfg, block)  # pyright: ignore[reportArgumentType]
+        driver.prog(cfg, block, 0, bytes([block]) * block_size)  # pyright: ignore[reportArgumentType]
+    driver.prog(cfg, 6, 0, b"\x00" * 16)  # pyright: ignore[reportArgumentType]
+
+    # Nothing is sent until LittleFS syncs, and reads see the pending data.
+    assert gnw.programs == []
+    assert driver.read(cfg, 2, 0, 4) == b"\x02" * 4  # pyright: ignore[reportArgumentType]
+    assert gnw.reads == []
+
+    driver.sync(cfg)  # pyright: ignore[reportArgumentType]
+    end = len(flash)
+    assert gnw.programs == [
+        # One erase-and-program for the contiguous run, at its lowest address (block 3).
+        (end - 4 * block_size, 3 * block_size, True, False),
+        (end - 7 * block_size, 16, False, False),
+    ]
+    for block in (1, 2, 3):
+        start = end - (block + 1) * block_size
+        assert gnw.flash[start : start + block_size] == bytes([block]) * block_size
+        # Flushed blocks are served from the cache.
+        assert driver.read(cfg, block, 0, 2) == bytes([block]) * 2  # pyright: ignore[reportArgumentType]
+    assert gnw.reads == []
+
+
+def test_lfs_driver_littlefs_round_trip():
+    block_size, block_count = 4096, 32
+    gnw = _FakeFlashGnW(b"\xff" * (block_size * block_count))
+    driver = LfsDriverContext(gnw, len(gnw.flash))  # pyright: ignore[reportArgumentType]
+    fs = LittleFS(driver, block_size=block_size, block_count=block_count, mount=False)
+    fs.format()
+    fs.mount()
+    files = {f"/dir/{i}.bin": os.urandom(100 + 3000 * i) for i in range(6)}
+    fs.makedirs("/dir", exist_ok=True)
+    for path, data in files.items():
+        with fs.open(path, "wb") as f:
+            f.write(data)
+    fs.unmount()
+
+    # A fresh driver with an empty cache only sees what reached the flash.
+    gnw.block_cache.clear()
+    fs = LittleFS(LfsDriverContext(gnw, len(gnw.flash)), block_size=block_size, block_count=block_count, mount=False)  # pyright: ignore[reportArgumentType]
+    fs.mount()
+    for path, data in files.items():
+        with fs.open(path, "rb") as f:
+            assert f.read() == data
+    assert any(erase for _, _, erase, _ in gnw.programs)
+
+
+def test_lfs_driver_rejects_partial_block_programs():
+    block_size, block_count = 4096, 8
+    gnw = _FakeFlashGnW(b"\xff" * (block_size * block_count))
+    driver = LfsDriverContext(gnw, len(gnw.flash))  # pyright: ignore[reportArgumentType]
+    fs = LittleFS(driver, block_size=block_size, prog_size=256, block_count=block_count, mount=False)
+    with pytest.raises(LittleFSError):
+        fs.format()
+
+
+def test_filesystem_image():
+    block_size, block_count = 4096, 16
+    gnw = _FakeFlashGnW(b"\xff" * (block_size * (block_count + 4)))
+    gnw.external_flash_size = len(gnw.flash)
+    gnw.external_flash_block_size = block_size
+    offset = 2 * block_size  # The filesystem ends 2 blocks before the end of flash.
+
+    fs = LittleFS(LfsDriverContext(gnw, len(gnw.flash) - offset), block_size=block_size, block_count=block_count)  # pyright: ignore[reportArgumentType]
+    fs.makedirs("/saves/gb")
+    with fs.open("/saves/gb/a.sav", "wb") as f:
+        f.write(b"hello")
+    fs.unmount()
+
+    gnw.reads.clear()
+    image_fs = get_filesystem_image(gnw, offset=offset, block_count=block_count)  # pyright: ignore[reportArgumentType]
+    assert gnw.reads == [(len(gnw.flash) - offset - block_count * block_size, block_count * block_size)]
+    with image_fs.open("/saves/gb/a.sav", "rb") as f:
+        assert f.read() == b"hello"
+
+    # Changes stay on the host.
+    flash = bytes(gnw.flash)
+    with image_fs.open("/saves/gb/b.sav", "wb") as f:
+        f.write(b"world")
+    assert image_fs.listdir("/saves/gb") == ["a.sav", "b.sav"]
+    assert gnw.flash == flash
+
+    # The block count is inferred from the superblock.
+    assert get_filesystem_image(gnw, offset=offset).block_count == block_count  # pyright: ignore[reportArgumentType]
+
+    # Flashing the image sends the whole region to ``GnW.flash``, which only writes changed sectors.
+    def flash(bank, addr, data, delta=False, **kwargs):
+        assert (bank, addr, delta) == (0, len(gnw.flash) - offset - block_count * block_size, True)
+        gnw.flash[addr : addr + len(data)] = data
+
+    flash_filesystem_image(SimpleNamespace(external_flash_size=len(gnw.flash), flash=flash), image_fs, offset=offset)  # pyright: ignore[reportArgumentType]
+    gnw.block_cache.clear()
+    fs = LittleFS(LfsDriverContext(gnw, len(gnw.flash) - offset), block_size=block_size, block_count=block_count)  # pyright: ignore[reportArgumentType]
+    assert fs.listdir("/saves/gb") == ["a.sav", "b.sav"]
+
+    with pytest.raises(TypeError):
+        flash_filesystem_image(gnw, fs, offset=offset)  # pyright: ignore[reportArgumentType]
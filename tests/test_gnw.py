@@ -0,0 +1,375 @@
+import io
+import os
+import struct
+from itertools import islice
+
+import pytest
+
+from gnwmanager.exceptions import DataError
+from gnwmanager.gnw import PollPolicy, _build_contexts, _coalesce_runs, _comm, _erased_hash, _is_blank
+from gnwmanager.sdcard import SD_BATCH_RESULT, SDDirEntry, SDOp, SDOpResult
+from gnwmanager.status import flashapp_status_str_to_enum
+from gnwmanager.utils import sha256
+
+
+def test_poll_policy_intervals():
+    policy = PollPolicy(initial=0.001, maximum=0.005, factor=2)
+    assert list(islice(policy.intervals(), 5)) == [0.001, 0.002, 0.004, 0.005, 0.005]
+
+
+def test_snapshot_reads_only_flag_words(gnw, backend):
+    gnw.write_uint32("status", flashapp_status_str_to_enum["PROG"])
+    gnw.write_uint32(gnw.contexts[0]["ready"], 7)
+    gnw.write_uint32(gnw.contexts[1]["response_ready"], 1)
+
+    backend.n_bytes_read = 0
+    snapshot = gnw._read_snapshot()
+    # status + ready/response_ready per context; never the headers in between.
+    assert backend.n_bytes_read == 4 * (1 + 2 * len(gnw.contexts))
+    assert snapshot.status == flashapp_status_str_to_enum["PROG"]
+    assert snapshot.ready == (7, 0)
+    assert snapshot.response_ready == (0, 1)
+
+
+def test_get_context_returns_free_slot(gnw):
+    gnw.write_uint32("status", flashapp_status_str_to_enum["PROG"])
+    gnw.write_uint32(gnw.contexts[0]["ready"], 1)
+    assert gnw.get_context() == gnw.contexts[1]
+
+
+def test_wait_for_idle_raises_device_error(gnw):
+    gnw.write_uint32("status", flashapp_status_str_to_enum["BAD_SD_OPEN"])
+    with pytest.raises(DataError, match="BAD_SD_OPEN"):
+        gnw.wait_for_idle()
+
+
+def test_wait_for_idle_times_out(gnw):
+    gnw.poll_policy = PollPolicy(initial=0.001, maximum=0.001)
+    gnw.write_uint32("status", flashapp_status_str_to_enum["ERASE"])
+    with pytest.raises(TimeoutError):
+        gnw.wait_for_idle(timeout=0.01)
+
+
+def test_coalesce_runs():
+    keys = [None, True, True, None, True, True, True, True, True]
+    assert _coalesce_runs(keys, 4, 12) == [(4, 8, True), (16, 12, True), (28, 8, True)]
+    assert _coalesce_runs([True, True, False, False], 4, 16) == [(0, 8, True), (8, 8, False)]
+    assert _coalesce_runs([], 4, 12) == []
+    assert _coalesce_runs([True], 4, 2) == [(0, 4, True)]
+
+
+def test_delta_packets(gnw, monkeypatch):
+    sector = 4096
+    device = bytearray(b"\xff" * (8 * sector))
+    device[6 * sector] = 0
+    data = bytearray(device)
+    data[sector + 1] = 0  # sector 1
+    data[3 * sector] = 0  # sectors 3, 4 are contiguous
+    data[4 * sector] = 0
+    data[6 * sector] = 1  # sector 6 isn't erased on the device.
+
+    def read_hashes(offset, size, chunk_size):
+        return [sha256(bytes(device[i : i + chunk_size])) for i in range(0, size, chunk_size)]
+
+    monkeypatch.setattr(gnw, "read_hashes", read_hashes)
+    packets = gnw._delta_packets(0x1000_0000, bytes(data), sector, 256 << 10)
+    assert [(p.addr, len(p.data), p.erase) for p in packets] == [
+        (0x1000_0000 + sector, sector, False),
+        (0x1000_0000 + 3 * sector, 2 * sector, False),
+        (0x1000_0000 + 6 * sector, sector, True),
+    ]
+    assert packets[1].data == bytes(data[3 * sector : 5 * sector])
+
+
+def test_erased_detection():
+    assert _erased_hash(16) == sha256(b"\xff" * 16)
+    assert _is_blank(b"\xff" * 16)
+    assert _is_blank(b"")
+    assert not _is_blank(b"\xff" * 15 + b"\x00")
+
+
+def test_build_contexts_legacy_layout():
+    base = _comm["flashapp_comm"].address
+    contexts = _build_contexts(2, 256 << 10)
+    assert contexts[0]["return_buffer_ptr"].address == base + 1024
+    assert contexts[1]["return_buffer_ptr"].address == base + 2048
+    assert contexts[0]["buffer"].address == base + 4 * 1024
+    assert contexts[1]["buffer"].address == base + 4 * 1024 + (256 << 10)
+
+
+def test_build_contexts_too_large():
+    with pytest.raises(DataError):
+        _build_contexts(4, 256 << 10)
+
+
+def test_build_contexts_counts_decompress_buffer():
+    # 1x 512KB buffers leave no room for the equally sized decompress buffer.
+    with pytest.raises(DataError):
+        _build_contexts(1, 512 << 10)
+
+
+@pytest.mark.parametrize("n_contexts, buffer_size", [(256, 1024), (2, (256 << 10) + 2)])
+def test_negotiate_contexts_rejects_unsupported(gnw, n_contexts, buffer_size):
+    gnw.write_uint32("context_count", n_contexts)
+    gnw.write_uint32("context_buffer_size", buffer_size)
+    with pytest.raises(DataError):
+        gnw._negotiate_contexts()
+
+
+def test_negotiate_contexts(gnw):
+    gnw._negotiate_contexts()
+    assert len(gnw.contexts) == 2
+
+    gnw.write_uint32("context_count", 4)
+    gnw.write_uint32("context_buffer_size", 128 << 10)
+    gnw._negotiate_contexts()
+    assert len(gnw.contexts) == 4
+    assert len(gnw._in_flight_retry) == 4
+    assert gnw.contexts[3]["buffer"].size == 128 << 10
+
+    gnw.write_uint32(gnw.contexts[3]["ready"], 1)
+    assert gnw._read_snapshot().ready == (0, 0, 0, 1)
+
+
+def _fake_sd_reads(gnw, monkeypatch, data):
+    """Serve SD reads from ``data``; returns the log of submit/collect events."""
+    events = []
+    in_flight = {}
+
+    def submit(path, offset, max_bytes):
+        i = len(events)
+        in_flight[i] = data[offset : offset + max_bytes]
+        events.append(("submit", offset, len(in_flight)))
+        return i
+
+    def collect(i):
+        events.append(("collect", i))
+        return in_flight.pop(i)
+
+    monkeypatch.setattr(gnw, "_sd_file_size", lambda path: len(data))
+    monkeypatch.setattr(gnw, "_sd_read_file_submit", submit)
+    monkeypatch.setattr(gnw, "_sd_read_file_collect", collect)
+    return events, in_flight
+
+
+def test_sd_iter_file_pipelined(gnw, monkeypatch):
+    chunk_size = gnw.contexts[0]["buffer"].size
+    data = bytes(range(256)) * (5 * chunk_size // 256) + b"tail"
+    events, _ = _fake_sd_reads(gnw, monkeypatch, data)
+
+    assert b"".join(gnw.sd_iter_file("/rom.bin")) == data
+    # Both contexts are kept busy: a new read is queued as soon as one is collected.
+    assert max(event[2] for event in events if event[0] == "submit") == len(gnw.contexts)
+    assert [event[0] for event in events[:4]] == ["submit", "submit", "collect", "submit"]
+
+
+def test_sd_iter_file_early_close_drains(gnw, monkeypatch):
+    chunk_size = gnw.contexts[0]["buffer"].size
+    events, in_flight = _fake_sd_reads(gnw, monkeypatch, bytes(4 * chunk_size))
+
+    iterator = gnw.sd_iter_file("/rom.bin")
+    next(iterator)
+    iterator.close()
+    assert not in_flight
+
+
+def test_sd_iter_file_short_file_drains(gnw, monkeypatch):
+    chunk_size = gnw.contexts[0]["buffer"].size
+    events, in_flight = _fake_sd_reads(gnw, monkeypatch, bytes(chunk_size))
+
+    # The file is shorter than requested: the second read comes back empty.
+    assert b"".join(gnw.sd_iter_file("/rom.bin", size=4 * chunk_size)) == bytes(chunk_size)
+    assert not in_flight
+
+
+def test_sd_iter_file_error_survives_cleanup_failure(gnw, monkeypatch):
+    chunk_size = gnw.contexts[0]["buffer"].size
+    events, _ = _fake_sd_reads(gnw, monkeypatch, bytes(4 * chunk_size))
+
+    def collect(i):
+        events.append(("collect", i))
+        if i == 0:
+            raise DataError("BAD_SD_READ")
+        raise TimeoutError
+
+    monkeypatch.setattr(gnw, "_sd_read_file_collect", collect)
+    with pytest.raises(DataError, match="BAD_SD_READ"):
+        b"".join(gnw.sd_iter_file("/rom.bin"))
+    # The other queued read was still collected.
+    assert ("collect", 1) in events
+
+
+@pytest.mark.parametrize("as_file", [False, True])
+def test_sd_write_stream(gnw, monkeypatch, as_file):
+    chunk_size = gnw.contexts[0]["buffer"].size
+    data = os.urandom(2 * chunk_size + 10)
+    written = []
+
+    def write_chunk(path, block, total_blocks, data=b"", blocking=True, compress=True, *, prepared=None):
+        assert prepared is not None
+        # File-backed chunks share one buffer that the next chunk overwrites.
+        written.append((block, total_blocks, bytes(prepared.data)))
+
+    monkeypatch.setattr(gnw, "_sd_write_file_chunk", write_chunk)
+    monkeypatch.setattr(gnw, "wait_for_all_contexts_complete", lambda: None)
+
+    source = io.BytesIO(b"skip" + data) if as_file else data
+    if as_file:
+        source.seek(4)
+    gnw.sd_write_stream("/foo.bin", source)
+    assert [(block, total) for block, total, _ in written] == [(0, 3), (1, 3), (2, 3)]
+    assert b"".join(chunk for _, _, chunk in written) == data
+
+
+@pytest.mark.parametrize("as_file", [False, True])
+def test_sd_write_stream_size_exceeds_source(gnw, monkeypatch, as_file):
+    written = []
+    monkeypatch.setattr(gnw, "_sd_write_file_chunk", lambda *args, **kwargs: written.append(args))
+
+    source = io.BytesIO(bytes(10)) if as_file else bytes(10)
+    with pytest.raises(ValueError):
+        gnw.sd_write_stream("/foo.bin", source, size=11)
+    assert not written
+
+
+def test_sd_scandir_pages(gnw, monkeypatch):
+    pages = {
+        0: (struct.pack("<QHHBxH", 1, 0, 0, 0, 1) + b"a", 1),
+        1: (struct.pack("<QHHBxH", 0, 0, 0, 0x10, 1) + b"b", 0),
+    }
+    cursors = []
+
+    def scandir_page(path, cursor):
+        cursors.append(cursor)
+        return pages[cursor]
+
+    monkeypatch.setattr(gnw, "_sd_scandir_page", scandir_page)
+    assert [(entry.name, entry.is_dir) for entry in gnw.sd_scandir("/roms")] == [("a", False), ("b", True)]
+    assert cursors == [0, 1]
+
+
+def test_sd_batch_pages(gnw, monkeypatch):
+    pages = []
+
+    def batch_page(ops, request):
+        assert len(request) + len(ops) * SD_BATCH_RESULT.size <= gnw.contexts[0]["buffer"].size
+        pages.append(len(ops))
+        return [SDOpResult(op, 0) for op in ops]
+
+    monkeypatch.setattr(gnw, "_sd_batch_page", batch_page)
+    ops = [SDOp("unlink", f"/saves/{i:05}.sav") for i in range(20_000)]
+    results = gnw.sd_batch(ops)
+    assert [result.op for result in results] == ops
+    assert len(pages) > 1
+    assert sum(pages) == len(ops)
+    assert gnw.sd_batch([]) == []
+
+
+def test_sd_mkdir_existing(gnw, monkeypatch):
+    files = {"/roms": True, "/roms/gb": True, "/roms/gb.sav": False}  # Path -> is a directory.
+    requests = []
+
+    def batch(ops):
+        ops = list(ops)
+        requests.append([(op.op, op.path) for op in ops])
+        results = []
+        for op in ops:
+            if op.op == "mkdir":
+                results.append(SDOpResult(op, 8 if op.path in files else 0))  # FR_EXIST
+                files.setdefault(op.path, True)
+            else:
+                results.append(SDOpResult(op, 0, SDDirEntry(op.path, 0, None, files[op.path])))
+        return results
+
+    monkeypatch.setattr(gnw, "sd_batch", batch)
+    gnw.sd_mkdir("/roms/gb/x", parents=True)
+    assert requests == [
+        [("mkdir", "/roms"), ("mkdir", "/roms/gb"), ("mkdir", "/roms/gb/x")],
+        [("stat", "/roms"), ("stat", "/roms/gb")],
+    ]
+
+    with pytest.raises(DataError, match="BAD_SD_MKDIR"):
+        gnw.sd_mkdir("/roms/gb.sav")
+
+
+def _fake_sd_writes(gnw, monkeypatch):
+    written, waits = [], []
+
+    def write_chunk(path, block, total_blocks, data=b"", blocking=True, compress=True, *, prepared=None):
+        written.append((gnw.context_counter, path, block, total_blocks))
+        gnw.context_counter += 1
+
+    monkeypatch.setattr(gnw, "_sd_write_file_chunk", write_chunk)
+    monkeypatch.setattr(gnw, "wait_for_all_contexts_complete", lambda: waits.append(gnw.context_counter))
+    monkeypatch.setattr(gnw, "start_gnwmanager", lambda force=False: None)
+    return written, waits
+
+
+def test_sd_write_files_back_to_back(gnw, monkeypatch, tmp_path):
+    chunk_size = gnw.contexts[0]["buffer"].size
+    written, waits = _fake_sd_writes(gnw, monkeypatch)
+    local = tmp_path / "c.bin"
+    local.write_bytes(bytes(chunk_size + 1))
+
+    errors = gnw.sd_write_files([("/a.bin", b"a"), ("/b.bin", b""), ("/c.bin", local)])
+    assert errors == [None, None, None]
+    assert [entry[1:] for entry in written] == [
+        ("/a.bin", 0, 1),
+        ("/b.bin", 0, 1),
+        ("/c.bin", 0, 2),
+        ("/c.bin", 1, 2),
+    ]
+    # The device queue is only drained once, after the last file.
+    assert len(waits) == 1
+
+
+def test_sd_write_files_continues_after_failure(gnw, monkeypatch):
+    written, _ = _fake_sd_writes(gnw, monkeypatch)
+    failures = [DataError("BAD_SD_OPEN")]
+
+    def wait():
+        if failures:
+            # The device failed "/b.bin"'s chunk, then moved on to "/c.bin".
+            gnw.write_uint32("failed_context_counter", written[1][0])
+            gnw.write_uint32("failed_status", flashapp_status_str_to_enum["BAD_SD_OPEN"])
+            raise failures.pop()
+
+    monkeypatch.setattr(gnw, "wait_for_all_contexts_complete", wait)
+
+    errors = gnw.sd_write_files([("/a.bin", b"a"), ("/b.bin", b"b"), ("/c.bin", b"c")])
+    assert errors[0] is None
+    assert errors[1] is not None
+    assert errors[1].args == ("BAD_SD_OPEN",)
+    assert errors[2] is None
+    assert [path for _, path, _, _ in written] == ["/a.bin", "/b.bin", "/c.bin", "/c.bin"]
+
+
+def test_sd_write_files_failure_with_cleared_status(gnw, monkeypatch):
+    written, _ = _fake_sd_writes(gnw, monkeypatch)
+    failed = []
+
+    def wait():
+        # The device failed "/a.bin" but cleared the BAD_* status before it was polled.
+        if not failed:
+            failed.append(written[0][0])
+            gnw.write_uint32("failed_context_counter", written[0][0])
+            gnw.write_uint32("failed_status", flashapp_status_str_to_enum["BAD_DECOMPRESS"])
+
+    monkeypatch.setattr(gnw, "wait_for_all_contexts_complete", wait)
+
+    errors = gnw.sd_write_files([("/a.bin", b"a"), ("/b.bin", b"b")])
+    assert errors[0] is not None
+    assert errors[0].args == ("BAD_DECOMPRESS",)
+    assert errors[1] is None
+    assert [path for _, path, _, _ in written] == ["/a.bin", "/b.bin", "/b.bin"]
+
+
+def test_erase_keeps_block_cache_coherent(gnw):
+    gnw._external_flash_block_size = 4096
+    gnw.block_cache.put(0, b"\x00" * 4096)
+    gnw.block_cache.put(4096, b"\x00" * 4096)
+    gnw.erase(0, 0, 4096, blocking=False)
+    assert gnw.block_cache.get(0) == b"\xff" * 4096
+    assert gnw.block_cache.get(4096) == b"\x00" * 4096
+    gnw.erase(0, 0, 0, blocking=False, whole_chip=True)
+    assert len(gnw.block_cache) == 0
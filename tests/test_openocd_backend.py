@@ -0,0 +1,159 @@
+import pytest
+
+from gnwmanager.ocdbackend.openocd_backend import (
+    OpenOCDBackend,
+    OpenOCDError,
+    _decode_tcl_values,
+    _encode_tcl_values,
+    _parse_md_block_response,
+    _split_aligned,
+)
+
+
+def test_tcl_values_roundtrip_words():
+    data = bytes(range(16))
+    encoded = _encode_tcl_values(data, 32)
+    assert encoded == "0x3020100 0x7060504 0xb0a0908 0xf0e0d0c"
+    assert _decode_tcl_values(encoded.encode(), 0x2400_0000, 32, 4) == data
+
+
+def test_tcl_values_roundtrip_bytes():
+    data = b"\x00\x01\xfe\xff\x10"
+    encoded = _encode_tcl_values(data, 8)
+    assert _decode_tcl_values(encoded.encode(), 0x2400_0001, 8, 5) == data
+
+
+def test_tcl_values_decode_error_message():
+    with pytest.raises(OpenOCDError):
+        _decode_tcl_values(b"read_memory: failed to read memory", 0x2400_0000, 32, 4)
+
+
+def test_tcl_values_decode_short_response():
+    with pytest.raises(OpenOCDError):
+        _decode_tcl_values(b"0x1 0x2", 0x2400_0000, 32, 4)
+
+
+def test_split_aligned_aligned():
+    assert _split_aligned(0x2400_0000, 32) == [(0x2400_0000, 32, 8)]
+
+
+def test_split_aligned_unaligned_edges():
+    assert _split_aligned(0x2400_0001, 10) == [
+        (0x2400_0001, 8, 3),
+        (0x2400_0004, 32, 1),
+        (0x2400_0008, 8, 3),
+    ]
+
+
+def test_split_aligned_within_word():
+    assert _split_aligned(0x2400_0001, 2) == [(0x2400_0001, 8, 2)]
+
+
+def test_parse_md_block_response():
+    res = "0x24000000: 03020100 07060504 0b0a0908 0f0e0d0c \n0x24000010: 13121110 "
+    assert _parse_md_block_response(res, 0x2400_0000, 32, 5) == bytes(range(20))
+
+
+class _RecordingBackend(OpenOCDBackend):
+    def __init__(self, version, transfer_mode="file"):
+        self.version = version
+        self.transfer_mode = transfer_mode
+        self.commands = []
+        self._batch_depth = 0
+        self._pending = []
+
+    def __call__(self, cmd, *, decode=True):
+        self.commands.append(cmd)
+        return b""
+
+
+def test_small_write_legacy_uses_words():
+    backend = _RecordingBackend((0, 11, 0))
+    backend.write_memory(0x2400_0002, bytes(range(10)))
+    assert backend.commands == [
+        "mwb 0x24000002 0x00",
+        "mwb 0x24000003 0x01",
+        "mww 0x24000004 0x05040302",
+        "mww 0x24000008 0x09080706",
+    ]
+
+
+def test_small_write_file_mode_uses_words():
+    # An explicit "file" transfer mode is honoured even when OpenOCD supports TCL transfers.
+    backend = _RecordingBackend((0, 12, 0), "file")
+    backend.write_memory(0x2400_0000, bytes(8))
+    assert backend.commands == ["mww 0x24000000 0x00000000", "mww 0x24000004 0x00000000"]
+
+
+def test_small_write_tcl_single_command_per_segment():
+    backend = _RecordingBackend((0, 12, 0), "tcl")
+    backend.write_memory(0x2400_0000, bytes(32))
+    assert len(backend.commands) == 1
+    assert backend.commands[0].startswith("write_memory 0x24000000 32 {")
+
+
+class _PipelineBackend(OpenOCDBackend):
+    """Backend whose socket replies to every command at once, in a single recv."""
+
+    def __init__(self, replies):
+        self.version = (0, 12, 0)
+        self._batch_depth = 0
+        self._pending = []
+        self._rx_buffer = bytearray()
+        self.sent = []
+        self._replies = replies
+
+    def _transact(self, cmds):
+        self.sent.append(cmds)
+        return [self._replies.get(cmd.split()[0], b"") for cmd in cmds]
+
+
+def test_batch_submits_writes_together():
+    backend = _PipelineBackend({})
+    with backend.batch():
+        backend.write_uint32(0x2400_0000, 1)
+        backend.write_uint32(0x2400_0004, 2)
+        assert backend.sent == []
+    assert backend.sent == [["mww 0x24000000 0x00000001", "mww 0x24000004 0x00000002"]]
+
+
+def test_batch_flushed_before_read():
+    backend = _PipelineBackend({"mdw": b"0x24000000: 00000001 "})
+    with backend.batch():
+        backend.write_uint32(0x2400_0000, 1)
+        assert backend.read_uint32(0x2400_0000) == 1
+    assert backend.sent == [["mww 0x24000000 0x00000001"], ["mdw 0x24000000"]]
+
+
+def test_read_uint32s_single_round_trip():
+    backend = _PipelineBackend({"mdw": b"0x24000000: 00000002 "})
+    with backend.batch():
+        backend.write_uint32(0x2400_0000, 2)
+        assert backend.read_uint32s([0x2400_0000, 0x2400_0100, 0x2400_0104]) == [2, 2, 2]
+    assert backend.sent == [
+        ["mww 0x24000000 0x00000002"],
+        ["mdw 0x24000000", "mdw 0x24000100", "mdw 0x24000104"],
+    ]
+
+
+def test_batch_error_attribution():
+    backend = _PipelineBackend({"mwb": b"Error: mem2array: Read @ 0x24000003, w=1, cnt=1, failed"})
+    with pytest.raises(OpenOCDError, match="mwb 0x24000003"), backend.batch():
+        backend.write_uint32(0x2400_0004, 1)
+        backend._write("mwb 0x24000003 0x01")
+
+
+class _FakeSocket:
+    def __init__(self, chunks):
+        self._chunks = list(chunks)
+
+    def recv(self, size):
+        return self._chunks.pop(0)
+
+
+def test_receive_response_splits_coalesced_replies():
+    backend = _PipelineBackend({})
+    backend._socket = _FakeSocket([b"first\x1asec", b"ond\x1a\x1a"])  # pyright: ignore[reportAttributeAccessIssue]
+    assert OpenOCDBackend._receive_response(backend) == b"first"
+    assert OpenOCDBackend._receive_response(backend) == b"second"
+    assert OpenOCDBackend._receive_response(backend) == b""
@@ -0,0 +1,129 @@
+import io
+import mmap
+import os
+
+import pytest
+
+from gnwmanager.pipeline import (
+    CompressionStats,
+    estimate_compressibility,
+    iter_chunks,
+    prepare_chunk,
+    prepare_chunks,
+    resolve_jobs,
+)
+from gnwmanager.utils import sha256
+
+
+def test_prepare_chunk_compressible():
+    data = b"\x00" * 4096
+    chunk = prepare_chunk(data)
+    assert chunk.data == data
+    assert chunk.data_hash == sha256(data)
+    assert 0 < len(chunk.compressed_data) < len(data)
+    assert chunk.compressed_hash == sha256(chunk.compressed_data)
+
+
+def test_prepare_chunk_incompressible():
+    chunk = prepare_chunk(os.urandom(4096))
+    assert chunk.compressed_data == b""
+    assert chunk.compressed_hash == b""
+    # The estimator should have kept LZMA from running at all.
+    assert chunk.estimated_ratio is not None
+    assert chunk.lzma_ratio is None
+
+
+def test_estimate_compressibility():
+    assert estimate_compressibility(b"\x00" * (256 << 10)) < 0.1
+    assert estimate_compressibility(os.urandom(256 << 10)) > 0.97
+    assert estimate_compressibility(b"") == 1.0
+
+
+def test_prepare_chunk_empty():
+    chunk = prepare_chunk(b"")
+    assert chunk.data_hash == sha256(b"")
+    assert chunk.compressed_data == b""
+
+
+@pytest.mark.parametrize("jobs", [1, 2])
+def test_prepare_chunks_preserves_order(jobs):
+    chunks = [bytes([i]) * 1024 for i in range(7)]
+    prepared = list(prepare_chunks(iter(chunks), jobs=jobs))
+    assert [p.data for p in prepared] == chunks
+
+
+def test_prepare_chunks_few_chunks_inline(monkeypatch):
+    def no_pool(*args, **kwargs):
+        raise AssertionError("Process pool started.")
+
+    monkeypatch.setattr("gnwmanager.pipeline.ProcessPoolExecutor", no_pool)
+    chunks = [bytes([i]) * 1024 for i in range(3)]
+    assert [p.data for p in prepare_chunks(iter(chunks), jobs=2)] == chunks
+
+
+def test_resolve_jobs():
+    assert resolve_jobs(3) == 3
+    assert resolve_jobs(0) >= 1
+    with pytest.raises(ValueError):
+        resolve_jobs(-1)
+
+
+def test_compression_stats_gives_up_and_reprobes():
+    stats = CompressionStats(give_up_after=2, reprobe_interval=3)
+    random_chunks = [os.urandom(1024) for _ in range(8)]
+    attempted = []
+    for chunk in random_chunks:
+        should_try = stats.should_try()
+        attempted.append(should_try)
+        stats.record(prepare_chunk(chunk, should_try))
+    assert attempted == [True, True, False, False, True, False, False, True]
+    assert stats.n_chunks == 8
+    assert stats.n_skipped_session == 4
+    assert stats.n_skipped_estimate == 4
+
+    # A compressible chunk during a probe resumes normal operation.
+    for _ in range(3):
+        if stats.should_try():
+            break
+    stats.record(prepare_chunk(b"\x00" * 1024, True))
+    assert stats.n_compressed == 1
+    assert stats.should_try()
+
+
+def test_prepare_chunks_records_stats():
+    stats = CompressionStats()
+    list(prepare_chunks([b"\x00" * 1024, os.urandom(1024)], stats=stats))
+    assert stats.n_chunks == 2
+    assert stats.n_compressed == 1
+    assert "2 chunks" in stats.summary()
+
+
+def test_prepare_chunk_no_copy():
+    view = memoryview(bytes(range(256)) * 16)
+    chunk = prepare_chunk(view, compress=False)
+    assert chunk.data is view
+    assert chunk.data_hash == sha256(bytes(view))
+
+
+def test_iter_chunks_buffer():
+    data = bytes(range(250))
+    chunks = list(iter_chunks(data, 240, 100))
+    assert all(isinstance(chunk, memoryview) for chunk in chunks)
+    assert [bytes(chunk) for chunk in chunks] == [data[:100], data[100:200], data[200:240]]
+    with pytest.raises(EOFError):
+        list(iter_chunks(data, 251, 100))
+
+
+def test_iter_chunks_file(tmp_path):
+    data = os.urandom(250)
+    f = io.BytesIO(data)
+    f.seek(10)
+    assert b"".join(bytes(chunk) for chunk in iter_chunks(f, 240, 100)) == data[10:]
+    f.seek(10)
+    with pytest.raises(EOFError):
+        list(iter_chunks(f, 241, 100))
+
+    path = tmp_path / "data.bin"
+    path.write_bytes(data)
+    with path.open("rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+        assert b"".join(bytes(chunk) for chunk in iter_chunks(m, 250, 64)) == data
@@ -0,0 +1,39 @@
+import io
+import os
+from pathlib import Path
+
+import pytest
+from littlefs import LittleFS
+
+from gnwmanager.cli._pull import _LocalWriter, _pull_dir
+
+
+def test_local_writer(tmp_path):
+    data = os.urandom(10_000)
+    with _LocalWriter(chunk_size=1000, max_pending=2) as writer:
+        writer.write_file(tmp_path / "a" / "b.bin", io.BytesIO(data))
+        writer.write_file(tmp_path / "empty.bin", io.BytesIO())
+    assert (tmp_path / "a" / "b.bin").read_bytes() == data
+    assert (tmp_path / "empty.bin").read_bytes() == b""
+
+
+def test_local_writer_error(tmp_path):
+    (tmp_path / "file").touch()
+    writer = _LocalWriter(chunk_size=10)
+    writer.write_file(tmp_path / "file" / "child.bin", io.BytesIO(b"x" * 100))
+    with pytest.raises(OSError):
+        writer.close()
+
+
+def test_pull_dir(tmp_path):
+    fs = LittleFS(block_size=512, block_count=64)
+    fs.makedirs("/saves/gb")
+    with fs.open("/saves/a.sav", "wb") as f:
+        f.write(b"hello")
+    with fs.open("/saves/gb/b.sav", "wb") as f:
+        f.write(bytes(range(256)) * 10)
+
+    with _LocalWriter(chunk_size=100) as writer:
+        _pull_dir(fs, Path("/saves"), tmp_path / "out", True, writer)
+    assert (tmp_path / "out" / "a.sav").read_bytes() == b"hello"
+    assert (tmp_path / "out" / "gb" / "b.sav").read_bytes() == bytes(range(256)) * 10
@@ -1,6 +1,10 @@
 from pathlib import Path
 
-from gnwmanager.cli._push import _expand_glob
+from littlefs import LittleFS, UserContext
+
+from gnwmanager.cli._push import _execute_push, _expand_glob, _plan_push, _resolve_sources
+from gnwmanager.filesystem import GnWTree, get_gnw_sha256, get_gnw_timestamp, gnw_file_matches, walk_gnw
+from gnwmanager.utils import sha256
 
 
 def test_expand_glob_star(tmp_path):
@@ -56,3 +60,153 @@ def test_expand_glob_directories_included(tmp_path):
 
     result = _expand_glob([tmp_path / "*"])
     assert sorted(result) == sorted([tmp_path / "subdir", tmp_path / "file.txt"])
+
+
+def _push(fs, files, gnw_path="/saves", trust_records=False):
+    """Push ``(local, dst)`` pairs; return the plan that was executed."""
+    plan = _plan_push(fs, [(local, Path(dst)) for local, dst in files], walk_gnw(fs, gnw_path), trust_records)
+    _execute_push(fs, plan)
+    return plan
+
+
+def test_walk_gnw():
+    fs = LittleFS(block_size=512, block_count=64)
+    fs.makedirs("/roms/gb/x")
+    with fs.open("/roms/a.gb", "wb") as f:
+        f.write(b"12")
+    with fs.open("/roms/gb/b.gb", "wb") as f:
+        f.write(b"123")
+    assert walk_gnw(fs, "/roms") == GnWTree({"/roms/a.gb": 2, "/roms/gb/b.gb": 3}, {"/roms", "/roms/gb", "/roms/gb/x"})
+    assert walk_gnw(fs, "/roms/a.gb") == GnWTree({"/roms/a.gb": 2}, set())
+    assert walk_gnw(fs, "/missing") == GnWTree({}, set())
+
+
+def test_resolve_sources(tmp_path):
+    (tmp_path / "saves" / "gb").mkdir(parents=True)
+    (tmp_path / "saves" / "gb" / "a.sav").touch()
+    (tmp_path / "saves" / ".DS_Store").touch()
+    (tmp_path / "b.sav").touch()
+
+    assert _resolve_sources([tmp_path / "saves"], Path("/dst"), True) == [
+        (tmp_path / "saves" / "gb" / "a.sav", Path("/dst/saves/gb/a.sav"))
+    ]
+    assert _resolve_sources([tmp_path / "saves"], Path("/dst"), False) == [
+        (tmp_path / "saves" / "gb" / "a.sav", Path("/dst/gb/a.sav"))
+    ]
+    assert _resolve_sources([tmp_path / "b.sav"], Path("/dst.sav"), False) == [(tmp_path / "b.sav", Path("/dst.sav"))]
+
+
+def test_push_plan(tmp_path, monkeypatch):
+    a, b = tmp_path / "a.sav", tmp_path / "b.sav"
+    a.write_bytes(b"hello")
+    b.write_bytes(b"world!")
+    fs = LittleFS(block_size=512, block_count=64)
+    fs.mkdir("/saves")
+
+    plan = _push(fs, [(a, "/saves/a.sav"), (b, "/saves/gb/x/b.sav")])
+    assert plan.mkdirs == ["/saves/gb", "/saves/gb/x"]
+    assert [item.dst for item in plan.write] == ["/saves/a.sav", "/saves/gb/x/b.sav"]
+    assert plan.skip == []
+    with fs.open("/saves/gb/x/b.sav", "rb") as f:
+        assert f.read() == b"world!"
+    assert get_gnw_sha256(fs, "/saves/a.sav") == sha256(b"hello")
+
+    # With trusted records, unchanged files are skipped using only their recorded hash.
+    def read_back(*_):
+        raise AssertionError("File was read back.")
+
+    monkeypatch.setattr("gnwmanager.filesystem.gnw_sha256", read_back)
+    b.write_bytes(b"WORLD!")
+    plan = _push(fs, [(a, "/saves/a.sav"), (b, "/saves/gb/x/b.sav")], trust_records=True)
+    assert plan.mkdirs == []
+    assert [item.dst for item in plan.write] == ["/saves/gb/x/b.sav"]
+    assert [item.dst for item in plan.skip] == ["/saves/a.sav"]
+    assert get_gnw_sha256(fs, "/saves/gb/x/b.sav") == sha256(b"WORLD!")
+
+    # Destination directory, and its parents, don't exist yet.
+    plan = _push(fs, [(a, "/new/dir/a.sav")], gnw_path="/new/dir")
+    assert plan.mkdirs == ["/new", "/new/dir"]
+    with fs.open("/new/dir/a.sav", "rb") as f:
+        assert f.read() == b"hello"
+
+
+def test_gnw_sha256_stale_record(tmp_path):
+    local = tmp_path / "a.sav"
+    local.write_bytes(b"hello")
+    fs = LittleFS(block_size=512, block_count=64)
+    _push(fs, [(local, "/a.sav")], gnw_path="/")
+
+    # Rewritten on-device without updating the record.
+    with fs.open("/a.sav", "wb") as f:
+        f.write(b"hello world")
+    assert get_gnw_sha256(fs, "/a.sav") is None
+    assert not gnw_file_matches(fs, "/a.sav", sha256(b"hello"), trust_record=True)
+    assert gnw_file_matches(fs, "/a.sav", sha256(b"hello world"), trust_record=True)
+
+    # Same size, but the "t" timestamp moved on past the record.
+    with fs.open("/a.sav", "wb") as f:
+        f.write(b"HELLO")
+    fs.setattr("/a.sav", "t", (0xFFFF_FFFF).to_bytes(4, "little"))
+    assert get_gnw_sha256(fs, "/a.sav") is None
+    assert gnw_file_matches(fs, "/a.sav", sha256(b"HELLO"), trust_record=True)
+
+    with fs.open("/b.sav", "wb") as f:
+        f.write(b"x")
+    assert get_gnw_sha256(fs, "/b.sav") is None
+    assert get_gnw_sha256(fs, "/missing.sav") is None
+    assert gnw_file_matches(fs, "/b.sav", sha256(b"x"))
+
+
+def test_push_same_size_rewrite(tmp_path):
+    local = tmp_path / "a.sav"
+    local.write_bytes(b"hello")
+    fs = LittleFS(block_size=512, block_count=64)
+    _push(fs, [(local, "/a.sav")], gnw_path="/")
+
+    # The device rewrites the save in place at the same size, leaving "t" and the record alone.
+    with fs.open("/a.sav", "wb") as f:
+        f.write(b"HELLO")
+    assert get_gnw_sha256(fs, "/a.sav") == sha256(b"hello")
+
+    # A trusted record misses the rewrite; by default the file is read back and restored.
+    assert _push(fs, [(local, "/a.sav")], gnw_path="/", trust_records=True).write == []
+    plan = _push(fs, [(local, "/a.sav")], gnw_path="/")
+    assert [item.dst for item in plan.write] == ["/a.sav"]
+    with fs.open("/a.sav", "rb") as f:
+        assert f.read() == b"hello"
+
+
+class _CountingContext(UserContext):
+    def __init__(self, buffsize):
+        super().__init__(buffsize)
+        self.n_progs = 0
+
+    def prog(self, cfg, block, off, data):
+        self.n_progs += 1
+        return super().prog(cfg, block, off, data)
+
+
+def test_push_attribute_commits(tmp_path):
+    files = []
+    for i in range(20):
+        local = tmp_path / f"{i}.sav"
+        local.write_bytes(bytes([i]) * 100)
+        files.append((local, f"/saves/{i}.sav"))
+    context = _CountingContext(512 * 256)
+    fs = LittleFS(context, block_size=512, block_count=256)
+    fs.mkdir("/saves")
+    _push(fs, files)
+    assert get_gnw_timestamp(fs, "/saves/0.sav") is not None
+
+    # The records are valid, so a no-op push doesn't write anything.
+    context.n_progs = 0
+    plan = _push(fs, files)
+    assert len(plan.skip) == 20
+    assert context.n_progs == 0
+
+    # An unchanged file without a record costs a single attribute commit.
+    fs.removeattr("/saves/0.sav", "h")
+    context.n_progs = 0
+    plan = _push(fs, files)
+    assert [item.dst for item in plan.record] == ["/saves/0.sav"]
+    assert context.n_progs == 1
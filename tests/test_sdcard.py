@@ -0,0 +1,209 @@
+import io
+import os
+import struct
+from datetime import datetime
+
+import pytest
+
+from gnwmanager.cli._sdcard import sdrm
+from gnwmanager.exceptions import DataError
+from gnwmanager.gnw import _build_contexts
+from gnwmanager.sdcard import (
+    SD_BATCH_RESULT,
+    SDDirEntry,
+    SDFileReader,
+    SDOp,
+    SDOpResult,
+    SDTree,
+    decode_batch_results,
+    encode_batch_op,
+    expand_sd_glob,
+    parse_scandir_page,
+    plan_sync,
+    raise_for_failures,
+    sd_sha256,
+    verify_sd_file,
+    walk_sd,
+)
+from gnwmanager.utils import sha256, sha256_file
+
+
+class _FakeSDGnW:
+    """Serves ``_sd_read_file_chunk`` requests from in-memory files."""
+
+    def __init__(self, files, buffer_size=1024):
+        self.files = files
+        self.contexts = _build_contexts(2, buffer_size)
+        self.requests = []
+        self.n_waits = 0
+
+    def _sd_file_size(self, path):
+        return len(self.files[path])
+
+    def _sd_read_file_chunk(self, path, offset, max_bytes, *, blocking=True):
+        assert max_bytes <= self.contexts[0]["buffer"].size
+        self.requests.append((offset, max_bytes))
+        return self.files[path][offset : offset + max_bytes]
+
+    def wait_for_all_contexts_complete(self):
+        self.n_waits += 1
+
+    def sd_hash_file(self, path):
+        if path not in self.files:
+            raise DataError("BAD_SD_OPEN")
+        return sha256(self.files[path])
+
+    def sd_scandir(self, path):
+        prefix = path.rstrip("/") + "/"
+        if path != "/" and not any(name.startswith(prefix) for name in self.files):
+            raise DataError("BAD_SD_DIR")
+        entries = {}
+        for name, data in self.files.items():
+            if name.startswith(prefix):
+                head, sep, _ = name[len(prefix) :].partition("/")
+                entries[head] = SDDirEntry(head, 0 if sep else len(data), None, bool(sep))
+        yield from entries.values()
+
+
+def test_sd_file_reader_read_and_seek():
+    data = os.urandom(5000)
+    gnw = _FakeSDGnW({"/foo.bin": data})
+    with SDFileReader(gnw, "/foo.bin") as f:  # pyright: ignore[reportArgumentType]
+        assert f.read(10) == data[:10]
+        assert f.seek(-100, io.SEEK_END) == 4900
+        assert f.read() == data[4900:]
+        assert f.read(10) == b""
+        f.seek(1000)
+        assert f.readall() == data[1000:]
+    # Every request was capped at the context buffer size.
+    assert all(n <= 1024 for _, n in gnw.requests)
+    assert gnw.n_waits == 1
+
+
+def test_sd_file_reader_readinto_memoryview():
+    data = bytes(range(256)) * 8
+    gnw = _FakeSDGnW({"/foo.bin": data})
+    reader = SDFileReader(gnw, "/foo.bin")  # pyright: ignore[reportArgumentType]
+    buffer = bytearray(4096)
+    assert reader.readinto(memoryview(buffer)[100:]) == 1024
+    assert buffer[100:1124] == data[:1024]
+
+
+def test_sd_file_reader_buffered():
+    data = os.urandom(3000)
+    gnw = _FakeSDGnW({"/foo.bin": data})
+    raw = SDFileReader(gnw, "/foo.bin")  # pyright: ignore[reportArgumentType]
+    with io.BufferedReader(raw, buffer_size=raw.chunk_size) as f:
+        assert b"".join(iter(lambda: f.read(7), b"")) == data
+    assert len(gnw.requests) == 3
+
+
+def test_sd_file_reader_invalid():
+    gnw = _FakeSDGnW({"/foo.bin": b""})
+    with pytest.raises(ValueError):
+        SDFileReader(gnw, "foo.bin")  # pyright: ignore[reportArgumentType]
+    reader = SDFileReader(gnw, "/foo.bin")  # pyright: ignore[reportArgumentType]
+    with pytest.raises(ValueError):
+        reader.seek(-1)
+    assert reader.read() == b""
+
+
+def test_walk_sd():
+    gnw = _FakeSDGnW({"/roms/a.gb": b"12", "/roms/gb/b.gb": b"123", "/roms/gb/x/c.gb": b"", "/other": b"1"})
+    tree = walk_sd(gnw, "/roms")  # pyright: ignore[reportArgumentType]
+    assert tree == SDTree({"a.gb": 2, "gb/b.gb": 3, "gb/x/c.gb": 0}, {"gb", "gb/x"})
+    assert walk_sd(gnw, "/missing") is None  # pyright: ignore[reportArgumentType]
+
+
+def test_plan_sync():
+    local = SDTree({"a": 1, "d/b": 2, "d/e/c": 3}, {"d", "d/e"})
+    remote = SDTree({"a": 1, "d/b": 5, "old": 1, "x/y/z": 1}, {"d", "x", "x/y"})
+
+    plan = plan_sync(local, remote)
+    assert plan.mkdirs == ["d/e"]
+    assert plan.push == ["d/b", "d/e/c"]
+    assert plan.skip == ["a"]
+    assert plan.delete == []
+
+    plan = plan_sync(local, remote, delete=True)
+    assert plan.delete == ["old", "x/y/z", "x/y", "x"]
+
+    plan = plan_sync(local, None, delete=True)
+    assert plan.mkdirs == ["d", "d/e"]
+    assert plan.push == ["a", "d/b", "d/e/c"]
+    assert plan.delete == []
+
+
+def test_sd_sha256_and_verify(tmp_path):
+    data = os.urandom(3000)
+    local = tmp_path / "foo.bin"
+    local.write_bytes(data)
+    assert sha256_file(local, chunk_size=1000) == sha256(data)
+
+    gnw = _FakeSDGnW({"/foo.bin": data})
+    assert sd_sha256(gnw, "/foo.bin") == sha256(data)  # pyright: ignore[reportArgumentType]
+    assert sd_sha256(gnw, "/missing.bin") is None  # pyright: ignore[reportArgumentType]
+
+    verify_sd_file(gnw, "/foo.bin", sha256_file(local))  # pyright: ignore[reportArgumentType]
+    gnw.files["/foo.bin"] = data[:-1]
+    with pytest.raises(DataError, match="BAD_SD_VERIFY"):
+        verify_sd_file(gnw, "/foo.bin", sha256_file(local))  # pyright: ignore[reportArgumentType]
+
+
+def _scandir_record(name, size, fdate, ftime, fattrib):
+    encoded = name.encode()
+    return struct.pack("<QHHBxH", size, fdate, ftime, fattrib, len(encoded)) + encoded
+
+
+def test_parse_scandir_page():
+    # 2023-06-15 13:45:30
+    fdate = ((2023 - 1980) << 9) | (6 << 5) | 15
+    ftime = (13 << 11) | (45 << 5) | 15
+    data = _scandir_record("Pokémon.gb", 5 << 30, fdate, ftime, 0x20) + _scandir_record("roms", 0, 0, 0, 0x10)
+    assert parse_scandir_page(data) == [
+        SDDirEntry("Pokémon.gb", 5 << 30, datetime(2023, 6, 15, 13, 45, 30), False),
+        SDDirEntry("roms", 0, None, True),
+    ]
+    assert parse_scandir_page(b"") == []
+    with pytest.raises(DataError):
+        parse_scandir_page(data[:-1])
+
+
+def test_encode_batch_op():
+    assert encode_batch_op(SDOp("unlink", "/a.sav")) == b"\x00\x00\x06\x00\x00\x00/a.sav"
+    assert encode_batch_op(SDOp("rename", "/a", "/b")) == b"\x03\x00\x02\x00\x02\x00/a/b"
+    with pytest.raises(ValueError):
+        encode_batch_op(SDOp("chmod", "/a"))  # pyright: ignore[reportArgumentType]
+    with pytest.raises(ValueError):
+        encode_batch_op(SDOp("rename", "/a", "b"))
+    with pytest.raises(ValueError):
+        encode_batch_op(SDOp("mkdir", "/" + "a" * 255))
+
+
+def test_decode_batch_results():
+    ops = [SDOp("stat", "/roms/a.gb"), SDOp("stat", "/missing"), SDOp("unlink", "/x")]
+    fdate = ((2020 - 1980) << 9) | (1 << 5) | 2
+    data = SD_BATCH_RESULT.pack(0, 1234, fdate, 0, 0x20) + SD_BATCH_RESULT.pack(4, 0, 0, 0, 0)
+    data += SD_BATCH_RESULT.pack(0, 0, 0, 0, 0)
+    results = decode_batch_results(ops, data)
+    assert results[0] == SDOpResult(ops[0], 0, SDDirEntry("a.gb", 1234, datetime(2020, 1, 2), False))
+    assert not results[1].ok
+    assert results[1].error == "FR_NO_FILE"
+    assert results[1].entry is None
+    assert results[2].ok
+
+    raise_for_failures(results, "BAD_SD_UNLINK", allowed=["FR_NO_FILE"])
+    with pytest.raises(DataError, match="BAD_SD_UNLINK"):
+        raise_for_failures(results, "BAD_SD_UNLINK")
+
+
+def test_expand_sd_glob():
+    gnw = _FakeSDGnW({"/saves/a.sav": b"", "/saves/b.sav": b"", "/saves/a.gb": b"", "/saves/sub/c.sav": b""})
+    assert expand_sd_glob(gnw, "/saves/*.sav") == ["/saves/a.sav", "/saves/b.sav"]  # pyright: ignore[reportArgumentType]
+    assert expand_sd_glob(gnw, "/saves/[ab].gb") == ["/saves/a.gb"]  # pyright: ignore[reportArgumentType]
+    assert expand_sd_glob(gnw, "/saves/nothing") == ["/saves/nothing"]  # pyright: ignore[reportArgumentType]
+
+
+def test_sdrm_requires_path(gnw):
+    with pytest.raises(ValueError):
+        sdrm(gnw=gnw)